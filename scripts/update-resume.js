@@ -1,5 +1,6 @@
 #!/usr/bin/env node
 
+const childProcess = require('child_process');
 const fs = require('fs');
 const path = require('path');
 
@@ -45,17 +46,36 @@ const resumePdfPath = typeof config.resumePdfPath === 'string' && config.resumeP
     ? config.resumePdfPath.trim()
     : '/resume/Yuri_Braga_Resume.pdf';
 
-const resumeFileName = path.basename(resumePdfPath);
+// tools/fingerprint.py points the config at a content-hashed copy
+// (Yuri_Braga_Resume.<12 hex>.pdf); the canonical file keeps the plain name.
+const resumeFileName = path.basename(resumePdfPath).replace(/\.[0-9a-f]{12}(\.pdf)$/i, '$1');
+const isFingerprinted = resumeFileName !== path.basename(resumePdfPath);
 const staticExportDestination = path.join(repoRoot, 'resume', resumeFileName);
 const sourceTreeDestination = path.join(repoRoot, 'public', 'resume', resumeFileName);
 
-for (const destinationPath of [staticExportDestination, sourceTreeDestination]) {
-    fs.mkdirSync(path.dirname(destinationPath), { recursive: true });
-    fs.copyFileSync(resolvedSourcePath, destinationPath);
+// tools/resume_pdf.py linearizes and recompresses the PDF, writes the canonical
+// copy and its mirror, refreshes the resumeAliases and rewrites links to them.
+// Without Python, fall back to copying the file as is.
+const pipeline = childProcess.spawnSync(
+    process.env.PYTHON || 'python3',
+    [path.join(repoRoot, 'tools', 'resume_pdf.py'), resolvedSourcePath],
+    { stdio: 'inherit' },
+);
+if (pipeline.error) {
+    console.warn(`Could not run tools/resume_pdf.py (${pipeline.error.message}); copying the PDF unoptimised.`);
+    for (const destinationPath of [staticExportDestination, sourceTreeDestination]) {
+        fs.mkdirSync(path.dirname(destinationPath), { recursive: true });
+        fs.copyFileSync(resolvedSourcePath, destinationPath);
+    }
+} else if (pipeline.status !== 0) {
+    fail(`tools/resume_pdf.py failed with exit status ${pipeline.status}`);
 }
 
 console.log(`Updated resume PDF from ${resolvedSourcePath}`);
 console.log(`Static export copy: ${staticExportDestination}`);
 console.log(`Source-tree mirror: ${sourceTreeDestination}`);
 console.log(`Served URL: ${resumePdfPath}`);
+if (isFingerprinted) {
+    console.log('Fingerprint note: the pages link a content-hashed copy; run `python tools/fingerprint.py` to publish the new PDF under its own hash.');
+}
 console.log('Deployment note: commit both resume/Yuri_Braga_Resume.pdf and public/resume/Yuri_Braga_Resume.pdf before pushing, otherwise GitHub Pages or a future Next build can still serve a stale/404 resume.');
@@ -0,0 +1,35 @@
+import sys
+from pathlib import Path
+
+# The tools are scripts that import each other by module name.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'tools'))
+
+# Copies of a few exported pages and RSC payloads, so tests do not depend on
+# the live tree. Refresh them by copying the same paths from the repository root.
+FIXTURES = Path(__file__).resolve().parent / 'fixtures' / 'site'
+
+
+def fixture_text(rel: str) -> str:
+    return (FIXTURES / rel).read_bytes().decode('utf-8')
+
+
+def chunked(data, size):
+    """data (str or bytes) split into size-long pieces, as a stream would deliver it."""
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def write_tree(root: Path, files: dict) -> Path:
+    """Create files (rel -> str or bytes) under root; returns root."""
+    for rel, data in files.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(data, str):
+            path.write_text(data, encoding='utf-8')
+        else:
+            path.write_bytes(data)
+    return root
+
+
+def read_tree(root: Path) -> dict:
+    """rel -> bytes for every file under root."""
+    return {p.relative_to(root).as_posix(): p.read_bytes() for p in sorted(root.rglob('*')) if p.is_file()}
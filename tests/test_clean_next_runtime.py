@@ -0,0 +1,49 @@
+from clean_next_runtime import clean_text, clean_text_legacy
+
+PAGE = """<!DOCTYPE html><html><head>
+<script src="/_next/static/chunks/webpack-0123abcd.js" async=""></script>
+<script src="/_next/static/chunks/main-app-4567.js" async=""></script>
+<script>document.documentElement.classList.add('js')</script>
+</head><body>
+<nav><button id="menu">Menu</button></nav>
+<script>document.getElementById('menu').onclick=function(){document.body.classList.toggle('open')}</script>
+<footer><p>&copy; Yuri Braga</p></footer>
+<script>(self.__next_f=self.__next_f||[]).push([1,"0:[\\"$\\",\\"div\\"]"])</script>
+</body></html>
+"""
+
+
+def test_runtime_scripts_are_removed_and_counted():
+    counts = {}
+    out = clean_text(PAGE, counts)
+    assert counts == {'webpack': 1, 'chunk': 1, 'flight': 1, 'other': 2}
+    assert '_next/static' not in out and '__next_f' not in out
+    assert '<head>\n<script>document.documentElement' in out
+
+
+def test_plain_inline_scripts_and_markup_are_kept():
+    out = clean_text(PAGE)
+    assert "<script>document.getElementById('menu').onclick" in out
+    assert "<script>document.documentElement.classList.add('js')</script>" in out
+    assert '<footer><p>&copy; Yuri Braga</p></footer>\n</body>' in out
+    assert clean_text(out) == out
+
+
+def test_stray_push_outside_scripts_is_swept():
+    text = '<p>a</p>(self.__next_f=self.__next_f||[]).push([1,"x"]);<p>b</p>'
+    assert clean_text(text) == '<p>a</p><p>b</p>'
+
+
+def test_pages_without_artifacts_are_returned_as_is():
+    text = '<script>alert(1)</script>'
+    assert clean_text(text) is text
+
+
+def test_legacy_regex_swallowed_scripts_and_markup_before_the_next_flight_push():
+    # The old `<script[^>]*>.*?__next_f.*?</script>` started at the first inline
+    # script and ran to the end of the flight push, taking the mobile-menu
+    # script, the nav and the footer with it.
+    legacy = clean_text_legacy(PAGE)
+    assert 'documentElement' not in legacy and 'onclick' not in legacy and '<footer>' not in legacy
+    new = clean_text(PAGE)
+    assert 'onclick' in new and '<footer>' in new
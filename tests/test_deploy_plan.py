@@ -0,0 +1,140 @@
+import json
+import os
+
+import pytest
+
+from conftest import read_tree, write_tree
+from deploy_plan import PLAN_NAME, STATE_NAME, main
+
+
+def make_site(root):
+    return write_tree(root, {
+        'index.html': '<p>home</p>',
+        'about/index.html': '<p>about</p>',
+        'images/logo.png': 'PNG',
+        '.nojekyll': '',
+        # Never published:
+        'README.md': '# notes',
+        'tools/x.py': 'print()',
+        'index.html.bak': 'old',
+        'index.html.gz': 'gz',
+        '.env': 'SECRET=1',
+    })
+
+
+def run(site, *args):
+    return main(['--root', str(site), *[str(a) for a in args]])
+
+
+@pytest.fixture
+def published(tmp_path):
+    site = make_site(tmp_path / 'site')
+    remote = tmp_path / 'remote'
+    assert run(site, 'publish', '--target', remote) == 0
+    return site, remote
+
+
+def test_first_publish_copies_only_published_files(published):
+    site, remote = published
+    assert sorted(read_tree(remote)) == ['.nojekyll', 'about/index.html', 'images/logo.png', 'index.html']
+    state = json.loads((site / STATE_NAME).read_text(encoding='utf-8'))
+    assert sorted(state['files']) == sorted(read_tree(remote))
+
+
+def test_bundle_holds_only_the_delta_and_applies(published, tmp_path):
+    site, remote = published
+    (site / 'index.html').write_text('<p>home v2</p>', encoding='utf-8')
+    (site / 'contact').mkdir()
+    (site / 'contact' / 'index.html').write_text('<p>contact</p>', encoding='utf-8')
+    (site / 'about' / 'index.html').unlink()
+    # Same content, new mtime: not re-uploaded.
+    os.utime(site / 'images' / 'logo.png', ns=(1, 1))
+
+    bundle = tmp_path / 'bundle'
+    assert run(site, 'plan', '--out', bundle) == 0
+    plan = json.loads((bundle / PLAN_NAME).read_text(encoding='utf-8'))
+    assert sorted(plan['add']) == ['contact/index.html']
+    assert sorted(plan['update']) == ['index.html']
+    assert sorted(plan['delete']) == ['about/index.html']
+    assert sorted(read_tree(bundle / 'files')) == ['contact/index.html', 'index.html']
+
+    assert run(site, 'apply', bundle, '--target', remote) == 0
+    expected = {rel: data for rel, data in read_tree(site).items()
+                if rel in ('.nojekyll', 'contact/index.html', 'images/logo.png', 'index.html')}
+    assert read_tree(remote) == expected
+    assert not (remote / 'about').exists()
+
+
+def test_tarball_round_trip(published, tmp_path):
+    site, remote = published
+    (site / 'index.html').write_text('<p>home v3</p>', encoding='utf-8')
+    tarball = tmp_path / 'deploy.tar.gz'
+    assert run(site, 'plan', '--tarball', tarball) == 0
+    assert run(site, 'apply', tarball, '--target', remote) == 0
+    assert (remote / 'index.html').read_text(encoding='utf-8') == '<p>home v3</p>'
+
+
+def test_drifted_target_is_refused_unless_forced(published, tmp_path):
+    site, remote = published
+    (site / 'index.html').write_text('<p>home v2</p>', encoding='utf-8')
+    bundle = tmp_path / 'bundle'
+    run(site, 'plan', '--out', bundle)
+    state_before = (site / STATE_NAME).read_bytes()
+
+    (remote / 'index.html').write_text('<p>edited on the host</p>', encoding='utf-8')
+    assert run(site, 'apply', bundle, '--target', remote) == 1
+    assert (remote / 'index.html').read_text(encoding='utf-8') == '<p>edited on the host</p>'
+    assert (site / STATE_NAME).read_bytes() == state_before
+
+    assert run(site, 'apply', bundle, '--target', remote, '--force') == 0
+    assert (remote / 'index.html').read_text(encoding='utf-8') == '<p>home v2</p>'
+
+
+def test_tampered_bundle_is_refused(published, tmp_path):
+    site, remote = published
+    (site / 'index.html').write_text('<p>home v2</p>', encoding='utf-8')
+    bundle = tmp_path / 'bundle'
+    run(site, 'plan', '--out', bundle)
+    (bundle / 'files' / 'index.html').write_text('<p>something else</p>', encoding='utf-8')
+    assert run(site, 'apply', bundle, '--target', remote) == 1
+    assert (remote / 'index.html').read_text(encoding='utf-8') == '<p>home</p>'
+    assert not list(remote.rglob('*.deploy-tmp'))
+
+
+def test_outputs_inside_the_tree_are_rejected(published):
+    site, _ = published
+    for option in ('--out', '--tarball'):
+        with pytest.raises(SystemExit) as exc:
+            run(site, 'plan', option, site / 'bundle')
+        assert exc.value.code == 2
+    with pytest.raises(SystemExit):
+        run(site, 'publish', '--target', site / 'remote')
+
+
+def test_out_directory_with_other_contents_is_not_replaced(published, tmp_path):
+    site, _ = published
+    (site / 'index.html').write_text('<p>home v2</p>', encoding='utf-8')
+    desktop = tmp_path / 'desktop'
+    desktop.mkdir()
+    (desktop / 'notes.txt').write_text('keep me', encoding='utf-8')
+    assert run(site, 'plan', '--out', desktop) == 1
+    assert read_tree(desktop) == {'notes.txt': b'keep me'}
+    # An earlier bundle is replaced.
+    bundle = tmp_path / 'bundle'
+    assert run(site, 'plan', '--out', bundle) == 0
+    assert run(site, 'plan', '--out', bundle) == 0
+    assert (bundle / PLAN_NAME).is_file()
+
+
+@pytest.mark.parametrize('rel', ['../escaped.html', 'about/../../escaped.html', '/tmp/escaped.html'])
+def test_plan_paths_outside_the_target_are_refused(published, tmp_path, rel):
+    site, remote = published
+    (site / 'index.html').write_text('<p>home v2</p>', encoding='utf-8')
+    bundle = tmp_path / 'bundle'
+    run(site, 'plan', '--out', bundle)
+    plan = json.loads((bundle / PLAN_NAME).read_text(encoding='utf-8'))
+    plan['add'][rel] = plan['update']['index.html'][1]
+    (bundle / PLAN_NAME).write_text(json.dumps(plan), encoding='utf-8')
+    before = read_tree(tmp_path)
+    assert run(site, 'apply', bundle, '--target', remote) == 1
+    assert read_tree(tmp_path) == before
@@ -0,0 +1,85 @@
+import pytest
+
+import flight
+from conftest import FIXTURES, chunked
+from flight import FlightError, iter_rows, rewrite_file, rewrite_text
+
+TEXT = 'Résumé: AUC 0.87'
+PAYLOAD = (
+    '1:I[5878,["972","static/chunks/972-e6acae3a74adc8b1.js"],"Image"]\n'
+    f'2:T{len(TEXT.encode()):x},{TEXT}'
+    '0:["b",[["$","p","AUC 0.87",{"children":"AUC 0.87","ref":"$L1","esc":"$$AUC 0.87"}]]]\n'
+    '3:"$2"\n'
+    '\n'
+)
+
+
+def real_payloads():
+    return sorted(flight.payload_files(FIXTURES))
+
+
+def test_untouched_payloads_round_trip_byte_for_byte():
+    for path in real_payloads():
+        data = path.read_bytes()
+        for size in (7, 64, 1 << 16):
+            assert b''.join(flight.rewrite(chunked(data, size))) == data, (path, size)
+
+
+def test_rows_do_not_depend_on_chunk_boundaries():
+    data = PAYLOAD.encode('utf-8')
+    whole = [(r.id, r.tag, r.raw) for r in iter_rows([data])]
+    assert [r[:2] for r in whole] == [('1', 'I'), ('2', 'T'), ('0', ''), ('3', ''), ('', '')]
+    for size in range(1, 16):
+        assert [(r.id, r.tag, r.raw) for r in iter_rows(chunked(data, size))] == whole, size
+
+
+def test_text_row_length_follows_the_edit():
+    new = rewrite_text(PAYLOAD, lambda s: s.replace('0.87', '0.91 (±0.02)'))
+    rows = list(iter_rows([new.encode('utf-8')]))
+    text_row = next(r for r in rows if r.is_text)
+    assert text_row.value == 'Résumé: AUC 0.91 (±0.02)'
+    assert text_row.raw.startswith(f"2:T{len(text_row.value.encode('utf-8')):x},".encode())
+    # The rows after it still parse, so the prefix is right.
+    assert [r.id for r in rows] == ['1', '2', '0', '3', '']
+
+
+def test_only_string_leaves_are_edited():
+    new = rewrite_text(PAYLOAD, lambda s: s.replace('AUC', 'ROC-AUC'))
+    model = next(r for r in iter_rows([new.encode()]) if r.id == '0').value
+    element = model[1][0]
+    # Type and key of an element tuple and "$" references stay as they are.
+    assert element[:3] == ['$', 'p', 'AUC 0.87']
+    assert element[3] == {'children': 'ROC-AUC 0.87', 'ref': '$L1', 'esc': '$$ROC-AUC 0.87'}
+    assert '3:"$2"\n' in new
+
+
+def test_chunk_paths_are_rewritten_in_import_rows():
+    new = rewrite_text(PAYLOAD, chunk_edit=lambda p: p.replace('972-e6acae3a74adc8b1', '972-0123456789abcdef'))
+    row = next(iter_rows([new.encode()]))
+    assert row.chunks == ['static/chunks/972-0123456789abcdef.js']
+    assert new.split('\n', 1)[1] == PAYLOAD.split('\n', 1)[1]
+
+
+def edit(s):
+    return s.replace('0.87', '0.91')
+
+
+def test_rewrite_file_and_dry_run(tmp_path):
+    path = tmp_path / 'index.txt'
+    path.write_bytes(PAYLOAD.encode('utf-8'))
+    assert rewrite_file(path, edit, dry_run=True)
+    assert path.read_bytes() == PAYLOAD.encode('utf-8')
+    assert rewrite_file(path, edit)
+    # Only the element key keeps the old value.
+    assert path.read_text(encoding='utf-8').count('0.87') == 1
+    assert not rewrite_file(path, edit)
+    assert [p.name for p in tmp_path.iterdir()] == ['index.txt']
+
+
+def test_malformed_payloads_are_rejected():
+    with pytest.raises(FlightError):
+        list(iter_rows([b'2:T10,short']))
+    with pytest.raises(FlightError):
+        list(iter_rows([b'not a row\n']))
+    assert flight.is_payload(PAYLOAD)
+    assert not flight.is_payload('<!DOCTYPE html><html>')
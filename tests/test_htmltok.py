@@ -0,0 +1,69 @@
+import pytest
+
+from conftest import chunked, fixture_text
+from htmltok import prettify_chunks, remove_attr, set_attr, tag_attrs, tokenize
+
+SAMPLE = (
+    '<!DOCTYPE html>\r\n<html><head><meta charset="utf-8"/>'
+    '<style>a>b{color:red}</style>'
+    '<script>if (a < b && c > d) { s = "</scr" + "ipt>"; }</script>'
+    '</head><body class="x">\r\n<!-- a > b --><p>1 < 2 and 3 > 2</p>'
+    '<img src="/a.png" alt=\'x>y\'><br/><SCRIPT type="module">x<y</SCRIPT>'
+    '<div data-x=1>tail'
+)
+PAGES = ['index.html', 'carefuse/index.html', 'recommendations/index.html']
+
+
+def coalesce(tokens):
+    """Tokens with text and raw runs that a chunk boundary split joined back together."""
+    out = []
+    for tok in tokens:
+        if out and tok.kind in ('text', 'raw') and out[-1].kind == tok.kind and out[-1].name == tok.name:
+            out[-1] = out[-1]._replace(data=out[-1].data + tok.data)
+        else:
+            out.append(tok)
+    return out
+
+
+@pytest.mark.parametrize('coarse', [False, True])
+def test_round_trip(coarse):
+    for text in [SAMPLE, ''] + [fixture_text(rel) for rel in PAGES]:
+        assert ''.join(tok.data for tok in tokenize(text, coarse=coarse)) == text
+
+
+@pytest.mark.parametrize('coarse', [False, True])
+def test_tokens_do_not_depend_on_chunk_boundaries(coarse):
+    whole = coalesce(tokenize(SAMPLE, coarse=coarse))
+    for size in range(1, 12):
+        assert coalesce(tokenize(chunked(SAMPLE, size), coarse=coarse)) == whole, size
+    for rel in PAGES:
+        text = fixture_text(rel)
+        whole = coalesce(tokenize(text, coarse=coarse))
+        for size in (7, 64, 4096):
+            assert coalesce(tokenize(chunked(text, size), coarse=coarse)) == whole, (rel, size)
+
+
+def test_script_and_style_bodies_are_raw():
+    tokens = list(tokenize(SAMPLE))
+    raw = [tok.data for tok in tokens if tok.kind == 'raw']
+    assert raw == ['a>b{color:red}', 'if (a < b && c > d) { s = "</scr" + "ipt>"; }', 'x<y']
+    assert [tok.name for tok in tokens if tok.kind == 'close_raw'] == ['/style', '/script', '/script']
+    assert ('comment', '<!-- a > b -->') in [(tok.kind, tok.data) for tok in tokens]
+    assert [tok.name for tok in tokens if tok.kind == 'tag'][1:4] == ['html', 'head', 'meta']
+
+
+def test_prettify_is_chunk_independent_and_normalises_crlf():
+    whole = ''.join(prettify_chunks(SAMPLE))
+    assert '\r' not in whole
+    assert whole.startswith('<!DOCTYPE html>\n<html>\n<head>')
+    for size in range(1, 12):
+        assert ''.join(prettify_chunks(chunked(SAMPLE, size))) == whole, size
+
+
+def test_attribute_helpers():
+    tag = '<img src="/a.png" loading=lazy ALT=\'x>y\' hidden>'
+    assert tag_attrs(tag) == {'src': '/a.png', 'loading': 'lazy', 'alt': 'x>y', 'hidden': None}
+    assert set_attr(tag, 'loading', 'eager') == '<img src="/a.png" loading="eager" ALT=\'x>y\' hidden>'
+    assert set_attr('<img src="/a.png" />', 'decoding', 'async') == '<img src="/a.png" decoding="async" />'
+    assert remove_attr(tag, 'loading') == '<img src="/a.png" ALT=\'x>y\' hidden>'
+    assert remove_attr(tag, 'missing') == tag
@@ -0,0 +1,29 @@
+import os
+import re
+from pathlib import Path
+
+import clean_next_runtime
+import treeio
+from instrument import CountingPattern, Recorder, counted_patterns, drain_pattern_stats, install_io_hooks
+
+
+def test_io_hooks_are_removed_again(tmp_path):
+    originals = (Path.read_bytes, Path.write_text, Path.rglob, os.walk, treeio._search, treeio.parallel_map)
+    recorder = Recorder('t')
+    uninstall = install_io_hooks(recorder, tmp_path)
+    (tmp_path / 'a.txt').write_text('abc', encoding='utf-8')
+    assert (tmp_path / 'a.txt').read_bytes() == b'abc'
+    uninstall()
+    assert (Path.read_bytes, Path.write_text, Path.rglob, os.walk, treeio._search, treeio.parallel_map) == originals
+    assert recorder.files['a.txt']['bytes_in'] == 3
+    assert recorder.files['a.txt']['bytes_out'] == 3
+
+
+def test_patterns_are_counted_only_inside_the_block():
+    drain_pattern_stats()
+    with counted_patterns('t'):
+        assert isinstance(clean_next_runtime.PAT_PUSH, CountingPattern)
+        clean_next_runtime.PAT_PUSH.search('self.__next_f.push([1,"x"])')
+        assert re.compile('x') is not None and not isinstance(re.compile('x'), CountingPattern)
+    assert isinstance(clean_next_runtime.PAT_PUSH, re.Pattern)
+    assert drain_pattern_stats()['clean_next_runtime.PAT_PUSH'][0] == 1
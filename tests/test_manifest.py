@@ -0,0 +1,58 @@
+import os
+from pathlib import Path
+
+from manifest import Manifest, sha256_bytes
+
+TRANSFORMS = {'logo': 1, 'pretty-blocks': 1}
+
+
+def recorded(tmp_path, data=b'<p>hi</p>'):
+    page = tmp_path / 'index.html'
+    page.write_bytes(data)
+    manifest = Manifest(tmp_path)
+    manifest.record(page, TRANSFORMS, digest=sha256_bytes(data))
+    manifest.save()
+    return page, Manifest(tmp_path)
+
+
+def test_current_until_content_changes(tmp_path):
+    page, manifest = recorded(tmp_path)
+    assert manifest.is_current(page, TRANSFORMS)
+    page.write_bytes(b'<p>ho</p>')
+    assert not manifest.is_current(page, TRANSFORMS)
+
+
+def test_touched_but_identical_file_is_still_current(tmp_path):
+    page, manifest = recorded(tmp_path)
+    st = page.stat()
+    os.utime(page, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    assert manifest.is_current(page, TRANSFORMS)
+
+
+def test_version_bump_or_new_transform_invalidates(tmp_path):
+    page, manifest = recorded(tmp_path)
+    assert not manifest.is_current(page, {'logo': 2, 'pretty-blocks': 1})
+    assert not manifest.is_current(page, {**TRANSFORMS, 'auc': 1})
+    assert manifest.is_current(page, {'logo': 1})
+
+
+def test_record_without_digest_reuses_the_hash_of_an_untouched_file(tmp_path, monkeypatch):
+    page, manifest = recorded(tmp_path)
+
+    def no_read(self):
+        raise AssertionError(f"{self} read")
+
+    monkeypatch.setattr(Path, 'read_bytes', no_read)
+    manifest.record(page, {'auc': 1}, changed=False)
+    monkeypatch.undo()
+    assert manifest.files['index.html']['sha256'] == sha256_bytes(b'<p>hi</p>')
+    # Unchanged, so the earlier transforms still hold.
+    assert manifest.is_current(page, {**TRANSFORMS, 'auc': 1})
+
+
+def test_record_without_digest_hashes_a_modified_file(tmp_path):
+    page, manifest = recorded(tmp_path)
+    page.write_bytes(b'<p>changed</p>')
+    manifest.record(page, {'auc': 1}, changed=True)
+    assert manifest.files['index.html']['sha256'] == sha256_bytes(b'<p>changed</p>')
+    assert manifest.files['index.html']['transforms'] == {'auc': 1}
@@ -0,0 +1,76 @@
+import random
+import re
+
+import pytest
+
+from multireplace import MultiReplacer, load_rule_sets
+
+
+def reference(pairs, text):
+    """Leftmost-longest replacement via one regex alternation, longest pattern first."""
+    table = dict(pairs)
+    pattern = re.compile('|'.join(re.escape(old) for old in sorted(table, key=len, reverse=True)))
+    return pattern.sub(lambda m: table[m.group(0)], text)
+
+
+def chained(pairs, text):
+    for old, new in pairs:
+        text = text.replace(old, new)
+    return text
+
+
+def test_overlapping_pairs_do_not_depend_on_order():
+    pairs = [('~0.87', '~0.91'), ('0.87 AUC', '0.91 AUC (held-out)')]
+    text = 'AUC ~0.87 here; 0.87 AUC there; ~0.87 AUC'
+    # The leftmost match wins where the two overlap.
+    expected = 'AUC ~0.91 here; 0.91 AUC (held-out) there; ~0.91 AUC'
+    assert MultiReplacer(pairs).sub(text) == expected
+    assert MultiReplacer(pairs[::-1]).sub(text) == expected
+    # Chained str.replace gives a different answer depending on the order.
+    assert chained(pairs, text) != chained(pairs[::-1], text)
+
+
+def test_longest_match_wins_at_the_same_start():
+    r = MultiReplacer([('ab', 'X'), ('abc', 'Y'), ('b', 'Z')])
+    assert r.replace('abcab b') == ('Y' + 'X' + ' Z', {'abc': 1, 'ab': 1, 'b': 1})
+
+
+def test_matches_chained_replace_when_patterns_cannot_interact():
+    pairs = [('alpha', 'ALPHA'), ('beta', 'B'), ('gamma ray', 'γ')]
+    text = 'alpha beta gamma ray, alphabet, beta-gamma ray alpha'
+    assert MultiReplacer(pairs).sub(text) == chained(pairs, text)
+
+
+def test_random_texts_match_the_leftmost_longest_reference():
+    rng = random.Random(4)
+    for _ in range(300):
+        pairs = {}
+        for _ in range(rng.randint(1, 6)):
+            pairs[''.join(rng.choice('abc') for _ in range(rng.randint(1, 4)))] = rng.choice(['', 'x', 'YY', 'abc'])
+        pairs = list(pairs.items())
+        text = ''.join(rng.choice('abcd') for _ in range(rng.randint(0, 40)))
+        assert MultiReplacer(pairs).sub(text) == reference(pairs, text), (pairs, text)
+
+
+def test_replacements_are_not_rescanned():
+    assert MultiReplacer([('a', 'aa')]).sub('aba') == 'aabaa'
+
+
+def test_untouched_text_is_returned_as_is():
+    text = 'nothing to see'
+    new, hits = MultiReplacer([('zzz', 'y')]).replace(text)
+    assert new is text and not hits
+
+
+def test_invalid_rule_lists_are_rejected():
+    with pytest.raises(ValueError):
+        MultiReplacer([('', 'x')])
+    with pytest.raises(ValueError):
+        MultiReplacer([('a', 'x'), ('a', 'y')])
+
+
+@pytest.mark.parametrize('name', sorted(load_rule_sets()))
+def test_shipped_rule_sets_agree_with_the_reference(name):
+    rules = load_rule_sets()[name]
+    text = ' | '.join(old for old, _ in rules.pairs) + ' | ' + ' '.join(old[:-1] for old, _ in rules.pairs)
+    assert rules.replacer.sub(text) == reference(rules.pairs, text)
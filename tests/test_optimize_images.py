@@ -0,0 +1,42 @@
+import pytest
+
+Image = pytest.importorskip('PIL.Image')
+
+from conftest import write_tree
+from optimize_images import main as optimize_main
+
+PAGE = """<!DOCTYPE html>
+<html><head><title>t</title>
+<link rel="preload" as="image" href="/images/hero.jpg" />
+</head><body>
+<img alt="hero" width="400" height="400" class="w-full h-full object-cover" src="/images/hero.jpg" />
+<img alt="logo" width="32" height="32" src="/images/logo.png" />
+</body></html>
+"""
+
+
+def make_site(tmp_path):
+    write_tree(tmp_path, {'index.html': PAGE})
+    (tmp_path / 'images').mkdir()
+    Image.effect_noise((1100, 1100), 64).convert('RGB').save(tmp_path / 'images' / 'hero.jpg', quality=95)
+    Image.effect_noise((256, 256), 64).convert('RGBA').save(tmp_path / 'images' / 'logo.png')
+    return tmp_path
+
+
+def test_webp_candidates_only_behind_a_typed_source(tmp_path):
+    root = make_site(tmp_path)
+    assert optimize_main(['--root', str(root)]) == 0
+    out = (root / 'index.html').read_text(encoding='utf-8')
+    assert out.count('<picture><source type="image/webp" srcset="') == 2
+    assert out.count('</picture>') == 2
+    for tag in out.split('<img')[1:]:
+        tag = tag.split('>')[0]
+        assert '.webp' not in tag
+    # The w-full hero is fluid despite its width attribute; its own srcset keeps the JPEG.
+    hero = out.split('<img alt="hero"')[1].split('>')[0]
+    assert 'srcset="/images/_opt/hero-' in hero and '480w.jpg 480w' in hero and 'sizes="100vw"' in hero
+    preload = out.split('<link rel="preload"')[1].split('>')[0]
+    assert 'type="image/webp"' in preload and '.jpg' not in preload
+    # Reruns leave the page alone.
+    assert optimize_main(['--root', str(root)]) == 0
+    assert (root / 'index.html').read_text(encoding='utf-8') == out
@@ -0,0 +1,40 @@
+import json
+
+from conftest import write_tree
+from page_weight import main, page_requests, pick_candidate
+
+
+def make_site(root):
+    write_tree(root, {
+        'index.html': '<html><body><a href="/about/">About</a></body></html>',
+        'about/index.html': '<html><body>About</body></html>',
+        'budgets.json': json.dumps({'default': {'requests': 5, 'transfer_kib': 10}}),
+    })
+    return root / 'budgets.json'
+
+
+def test_known_route_within_budget_passes(tmp_path):
+    budgets = make_site(tmp_path)
+    assert main(['--root', str(tmp_path), '--budgets', str(budgets), '--route', '/about/']) == 0
+
+
+def test_unknown_route_fails_the_gate(tmp_path, capsys):
+    budgets = make_site(tmp_path)
+    assert main(['--root', str(tmp_path), '--budgets', str(budgets), '--route', '/about']) == 1
+    assert 'UNKNOWN /about (no such route; did you mean /about/?)' in capsys.readouterr().out
+
+
+def test_srcset_candidate_is_counted_instead_of_src():
+    assert pick_candidate('/a-480.jpg 480w, /a-1024.jpg 1024w, /a-1536.jpg 1536w', '100vw') == '/a-1536.jpg'
+    assert pick_candidate('/a-480.jpg 480w, /a-1024.jpg 1024w', '(max-width: 768px) 100vw, 50vw') == '/a-1024.jpg'
+    assert pick_candidate('/a-480.jpg 480w, /a-1024.jpg 1024w', '400px') == '/a-480.jpg'
+    assert pick_candidate('/logo-32.png 1x, /logo-64.png 2x') == '/logo-32.png'
+    text = (
+        '<link rel="preload" as="image" href="/a.webp" imagesrcset="/a-480.webp 480w, /a-1440.webp 1440w" '
+        'imagesizes="100vw" type="image/webp" />'
+        '<picture><source type="image/webp" srcset="/a-480.webp 480w, /a-1440.webp 1440w" sizes="100vw" />'
+        '<img src="/a.jpg" srcset="/a-480.jpg 480w, /a-1440.jpg 1440w" sizes="100vw" /></picture>'
+        '<img src="/b.png" srcset="/b-32.png 1x, /b-64.png 2x" loading="lazy" />'
+    )
+    assert page_requests(text) == [('/a-1440.webp', 'image', True), ('/a-1440.webp', 'image', True),
+                                   ('/b-32.png', 'image', False)]
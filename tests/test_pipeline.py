@@ -0,0 +1,115 @@
+import re
+from pathlib import Path
+
+import pytest
+
+import pipeline
+import watch
+from conftest import write_tree
+from manifest import Manifest
+from pipeline import Stage, process_file, run
+
+
+def html(rel: str) -> bool:
+    return rel.endswith('.html')
+
+
+@pytest.fixture
+def stages(monkeypatch):
+    calls = []
+
+    def stage(name, old, new, probe=None):
+        def transform(text):
+            calls.append(name)
+            return text.replace(old, new)
+        monkeypatch.setitem(pipeline.STAGES, name, Stage(name, transform, html, name, 1, probe))
+
+    stage('x-to-y', 'x', 'y')
+    stage('y-to-z', 'y', 'z')
+    stage('needle', 'needle', 'pin', probe=re.compile(b'needle'))
+    return calls
+
+
+@pytest.fixture
+def io_counts(monkeypatch):
+    counts = {'read': [], 'write': []}
+    read_bytes, write_bytes = Path.read_bytes, Path.write_bytes
+
+    def counted_read(self):
+        counts['read'].append(self.name)
+        return read_bytes(self)
+
+    def counted_write(self, data):
+        counts['write'].append(self.name)
+        return write_bytes(self, data)
+
+    monkeypatch.setattr(Path, 'read_bytes', counted_read)
+    monkeypatch.setattr(Path, 'write_bytes', counted_write)
+    return counts
+
+
+def test_stages_run_in_order_on_one_read_and_one_write(tmp_path, stages, io_counts):
+    page = tmp_path / 'index.html'
+    page.write_bytes(b'<p>x</p>')
+    io_counts['write'].clear()
+    result = process_file(page, tmp_path, ['x-to-y', 'y-to-z'])
+    assert result.status == 'UPDATED' and result.applied == ['x-to-y', 'y-to-z']
+    assert io_counts['read'] == ['index.html']
+    assert io_counts['write'].count('index.html') == 1
+    assert page.read_bytes() == b'<p>z</p>'
+    # Reversed, the second stage has nothing left to do.
+    page.write_bytes(b'<p>x</p>')
+    assert process_file(page, tmp_path, ['y-to-z', 'x-to-y']).applied == ['x-to-y']
+    assert page.read_bytes() == b'<p>y</p>'
+
+
+def test_unchanged_file_is_not_written(tmp_path, stages, io_counts):
+    page = tmp_path / 'index.html'
+    page.write_bytes(b'<p>z</p>')
+    io_counts['write'].clear()
+    assert process_file(page, tmp_path, ['x-to-y', 'y-to-z']).status == 'UNCHANGED'
+    assert io_counts['write'] == []
+
+
+def test_probe_miss_skips_the_read_and_the_stage(tmp_path, stages, io_counts):
+    page = tmp_path / 'index.html'
+    page.write_bytes(b'<p>hay</p>')
+    result = process_file(page, tmp_path, ['needle'])
+    assert result.status == 'UNCHANGED' and not result.decoded and result.bytes_read == 0
+    assert io_counts['read'] == [] and stages == []
+    page.write_bytes(b'<p>needle</p>')
+    assert process_file(page, tmp_path, ['needle']).applied == ['needle']
+    assert page.read_bytes() == b'<p>pin</p>'
+
+
+def test_dry_run_writes_nothing(tmp_path, stages):
+    page = tmp_path / 'index.html'
+    page.write_bytes(b'<p>x</p>')
+    assert run(['x-to-y'], tmp_path, dry_run=True) == 1
+    assert page.read_bytes() == b'<p>x</p>'
+    assert not (tmp_path / 'backups').exists()
+
+
+def test_run_with_jobs_matches_the_serial_run(tmp_path, stages):
+    write_tree(tmp_path, {f"p{i}/index.html": b'x' * i for i in range(12)})
+    assert run(['x-to-y'], tmp_path, jobs=3) == 11
+    assert all((tmp_path / f"p{i}" / 'index.html').read_bytes() == b'y' * i for i in range(12))
+
+
+def test_incremental_run_skips_files_already_processed(tmp_path, stages, capsys):
+    page = tmp_path / 'index.html'
+    page.write_bytes(b'<p>x</p>')
+    run(['x-to-y'], tmp_path, manifest=Manifest(tmp_path))
+    capsys.readouterr()
+    run(['x-to-y'], tmp_path, manifest=Manifest(tmp_path))
+    assert 'Files skipped as up to date: 1' in capsys.readouterr().out
+    assert stages == ['x-to-y']
+
+
+def test_walk_and_watch_daemon_share_the_site_file_predicate(tmp_path, stages):
+    rels = ('index.html', 'tools/brewer_preview.html', 'index.html.tmp', 'about/index.html')
+    write_tree(tmp_path, dict.fromkeys(rels, 'x'))
+    assert run(['x-to-y'], tmp_path) == 2
+    assert (tmp_path / 'tools' / 'brewer_preview.html').read_bytes() == b'x'
+    daemon = watch.Daemon(tmp_path, ['x-to-y'], Manifest(tmp_path))
+    assert [daemon.wanted(tmp_path / rel) for rel in ('index.html', 'tools/brewer_preview.html')] == [True, False]
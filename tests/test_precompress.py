@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+import precompress
+from conftest import write_tree
+from precompress import STATE_NAME, main
+
+
+def make_site(root):
+    return write_tree(root, {'index.html': '<p>hello</p>\n' * 100, 'favicon.ico': os.urandom(4096)})
+
+
+def run(root):
+    return main(['--root', str(root), '--no-brotli', '--jobs', '1'])
+
+
+def test_no_gain_files_are_not_recompressed_on_rerun(tmp_path, monkeypatch):
+    root = make_site(tmp_path)
+    assert run(root) == 0
+    assert (root / 'index.html.gz').is_file() and not (root / 'favicon.ico.gz').exists()
+    assert (root / STATE_NAME).is_file()
+    compressed = []
+    monkeypatch.setattr(precompress, '_gzip', lambda data: compressed.append(data) or b'')
+    assert run(root) == 0
+    assert compressed == []
+    # A changed file is tried again.
+    (root / 'favicon.ico').write_bytes(os.urandom(4096))
+    run(root)
+    assert len(compressed) == 1
+
+
+def test_interrupted_write_leaves_no_sidecar(tmp_path, monkeypatch):
+    root = make_site(tmp_path)
+
+    def fail(src, dst):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(precompress.os, 'replace', fail)
+    with pytest.raises(KeyboardInterrupt):
+        run(root)
+    assert sorted(p.name for p in root.iterdir()) == ['favicon.ico', 'index.html']
@@ -0,0 +1,62 @@
+from conftest import FIXTURES, fixture_text, write_tree
+from page_weight import Sizes, analyze
+from resource_hints import eager_images, hint_page, hint_text
+from treeio import iter_files, rel_path
+
+TEXT = 'Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 40
+
+PAGE = f"""<!DOCTYPE html>
+<html><head><title>t</title>
+<link rel="preload" as="image" href="/images/stale.png" />
+</head><body>
+<nav><img src="/images/logo.png" width="32" height="32" loading="lazy" /></nav>
+<section><h1>Hello</h1>
+<img src="/images/hero.jpg" width="400" height="400" />
+<p>{TEXT}</p>
+<img src="/images/letter.png" width="600" height="400" loading="lazy" />
+<p>{TEXT}</p>
+<img src="/images/photo.png" width="400" height="300" />
+</section>
+</body></html>
+"""
+
+
+def metrics(root):
+    (route,) = analyze(root)
+    return route.metrics(Sizes(root))
+
+
+def make_site(tmp_path, text):
+    sizes = {'logo.png': 1000, 'hero.jpg': 5000, 'letter.png': 900000, 'photo.png': 800000, 'stale.png': 10}
+    return write_tree(tmp_path, {'index.html': text, **{f"images/{name}": b'x' * size for name, size in sizes.items()}})
+
+
+def test_only_hero_is_prioritised_and_lazy_images_stay_lazy():
+    out, report = hint_page(PAGE)
+    assert report['hero'] == '/images/hero.jpg'
+    assert '<img src="/images/hero.jpg" width="400" height="400" fetchpriority="high" decoding="async" />' in out
+    assert 'src="/images/logo.png" width="32" height="32" loading="lazy"' in out
+    assert 'src="/images/letter.png" width="600" height="400" loading="lazy"' in out
+    assert 'src="/images/photo.png" width="400" height="300" loading="lazy"' in out
+    assert 'stale.png' not in out
+    assert out.count('rel="preload"') == 1
+    assert hint_text(out) == out
+
+
+def test_first_visit_image_transfer_does_not_go_up(tmp_path):
+    root = make_site(tmp_path, PAGE)
+    before = metrics(root)
+    (root / 'index.html').write_text(hint_text(PAGE), encoding='utf-8')
+    after = metrics(root)
+    # The page itself grows by a few attributes; what it pulls in must not.
+    assert after['transfer'] - after['html'] <= before['transfer'] - before['html']
+    assert after['requests'] <= before['requests']
+    assert 'images/photo.png' not in analyze(root)[0].assets
+
+
+def test_no_exported_page_gains_eager_images():
+    for path in iter_files(FIXTURES):
+        rel = rel_path(path, FIXTURES)
+        if rel.endswith('.html'):
+            text = fixture_text(rel)
+            assert eager_images(hint_text(text)) <= eager_images(text), rel
@@ -0,0 +1,66 @@
+from conftest import write_tree
+from snapshot import Session, Store, main
+
+
+def make_tree(root):
+    return write_tree(root, {'index.html': '<p>home v1</p>', 'about/index.html': '<p>about v1</p>'})
+
+
+def snapshot_kinds(root):
+    store = Store(root)
+    return [(i, store.load(i)['partial']) for i in store.snapshot_ids()]
+
+
+def test_restore_brings_back_files_and_saves_what_it_overwrites(tmp_path):
+    root = make_tree(tmp_path)
+    assert main(['--root', str(root), 'snapshot', '--label', 'v1']) == 0
+    (root / 'index.html').write_text('<p>home v2</p>', encoding='utf-8')
+    (root / 'about' / 'index.html').unlink()
+    (full_id, _), = snapshot_kinds(root)
+
+    assert main(['--root', str(root), 'restore', full_id]) == 0
+    assert (root / 'index.html').read_text(encoding='utf-8') == '<p>home v1</p>'
+    assert (root / 'about' / 'index.html').read_text(encoding='utf-8') == '<p>about v1</p>'
+
+    # The overwritten v2 page went into a pre-restore snapshot.
+    undo = [i for i, partial in snapshot_kinds(root) if partial]
+    assert len(undo) == 1
+    store = Store(root)
+    assert store.get(store.load(undo[0])['files']['index.html']['sha256']) == b'<p>home v2</p>'
+
+
+def test_restore_subset_into_another_directory(tmp_path):
+    root = make_tree(tmp_path / 'site')
+    main(['--root', str(root), 'snapshot'])
+    (snapshot_id, _), = snapshot_kinds(root)
+    dest = tmp_path / 'out'
+    main(['--root', str(root), 'restore', snapshot_id, 'about', '--dest', str(dest)])
+    assert [p.relative_to(dest).as_posix() for p in dest.rglob('*') if p.is_file()] == ['about/index.html']
+
+
+def test_prune_counts_full_and_partial_snapshots_separately(tmp_path):
+    root = make_tree(tmp_path)
+    main(['--root', str(root), 'snapshot', '--label', 'first'])
+    main(['--root', str(root), 'snapshot', '--label', 'second'])
+    for n in range(3):
+        session = Session(f'tool{n}', root)
+        session.record(root / 'index.html', f'<p>run {n}</p>'.encode())
+        session.close()
+
+    assert main(['--root', str(root), 'prune', '--keep', '1', '--keep-partial', '1']) == 0
+    kept = snapshot_kinds(root)
+    assert [i for i, partial in kept if not partial] == [i for i, _ in kept if i.endswith('-second')]
+    assert [i for i, partial in kept if partial] == [i for i, _ in kept if i.endswith('-tool2')]
+
+    # Blobs of the surviving full snapshot are still there.
+    store = Store(root)
+    full = next(i for i, partial in kept if not partial)
+    for entry in store.load(full)['files'].values():
+        assert store.get(entry['sha256'])
+
+
+def test_prune_never_drops_the_newest_full_snapshot(tmp_path):
+    root = make_tree(tmp_path)
+    main(['--root', str(root), 'snapshot'])
+    main(['--root', str(root), 'prune', '--keep', '0', '--keep-partial', '0'])
+    assert [partial for _, partial in snapshot_kinds(root)] == [False]
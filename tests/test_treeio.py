@@ -0,0 +1,13 @@
+from conftest import write_tree
+from treeio import iter_files, parallel_map, rel_path
+
+
+def test_parallel_map_keeps_input_order():
+    items = list(range(-50, 50))
+    assert list(parallel_map(hex, items, jobs=3, chunksize=4)) == [hex(i) for i in items]
+    assert list(parallel_map(hex, items, jobs=1)) == [hex(i) for i in items]
+
+
+def test_iter_files_skips_backups_and_git(tmp_path):
+    write_tree(tmp_path, dict.fromkeys(('index.html', 'about/index.html', 'backups/x/index.html', '.git/HEAD'), 'x'))
+    assert sorted(rel_path(p, tmp_path) for p in iter_files(tmp_path)) == ['about/index.html', 'index.html']
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""Benchmark the tools/ transforms on a synthetic static export.
+
+A Next.js-like export is generated from a seed (route pages with external
+chunk scripts, inline flight pushes and webpack runtime, plus an index.txt
+flight payload per route). Every registered pipeline stage then runs over the
+files it applies to, in memory, and the end-to-end pipeline runs over a
+scratch copy of the tree. Throughput (MB/s, files/s), peak traced memory and
+a digest of the output are appended to a JSON history, and each result is
+compared with the last run of the same configuration.
+
+Usage:
+    python tools/bench.py                            # all stages, default size
+    python tools/bench.py --pages 200 --payload-kb 64
+    python tools/bench.py --stages pretty-blocks,pretty-stdlib,minify
+    python tools/bench.py --keep /tmp/synthetic      # also write the export out
+    python tools/bench.py --fail-on-regression       # exit 1 if anything slowed down
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import flight
+import pipeline
+from treeio import ROOT, iter_files, rel_path
+
+HISTORY_NAME = '.tools-bench.json'
+DEFAULT_THRESHOLD = 10.0
+
+WORDS = ('machine learning healthcare patient safety calibration model clinical data pipeline '
+         'automation research engineer virginia tech explainable predictive analytics').split()
+CLASSES = ('max-w-7xl mx-auto px-4 sm:px-6 lg:px-8', 'text-4xl font-bold text-carefuse-navy mb-6',
+           'grid grid-cols-1 lg:grid-cols-2 gap-12 items-start', 'text-xl mb-8 text-carefuse-gray',
+           'py-16 bg-white', 'flex items-center space-x-3')
+# Content the rule-set stages look for, so they do real work.
+PHRASES = ('Achieved ~0.87 AUC', 'carefuse_logo.png', 'Ambassador and Mentor', 'AUC ≈ 0.87')
+MENU_JS = ("\n\t\t(function(){\n\t\t\tvar btn = document.getElementById('mobile-menu-button');\n"
+           "\t\t\tvar menu = document.getElementById('mobile-menu');\n"
+           "\t\t\tif(btn&&menu){btn.addEventListener('click',function(){menu.classList.toggle('hidden');});}\n"
+           "\t\t})();\n\t")
+
+
+def _hash(rng: random.Random, n: int = 16) -> str:
+    return ''.join(rng.choice('0123456789abcdef') for _ in range(n))
+
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 24))]
+    if rng.random() < 0.2:
+        words.insert(rng.randrange(len(words)), rng.choice(PHRASES))
+    return ' '.join(words).capitalize() + '.'
+
+
+def _element(rng: random.Random, depth: int):
+    """A React element tuple as it appears in a flight payload."""
+    tag = rng.choice(('div', 'section', 'p', 'span', 'h2'))
+    if depth == 0 or rng.random() < 0.3:
+        children = _sentence(rng)
+    else:
+        children = [_element(rng, depth - 1) for _ in range(rng.randint(1, 4))]
+    return ['$', tag, None, {'className': rng.choice(CLASSES), 'children': children}]
+
+
+def _html(node) -> str:
+    if isinstance(node, str):
+        return node.replace('&', '&amp;').replace('<', '&lt;')
+    if isinstance(node, list) and node and node[0] == '$':
+        props = node[3]
+        return f'<{node[1]} class="{props["className"]}">{_html(props["children"])}</{node[1]}>'
+    return ''.join(_html(n) for n in node)
+
+
+def make_payload(rng: random.Random, chunks: list, size: int):
+    """Return (payload text, element tree rendered into the matching page)."""
+    rows = [f'{i + 2}:I[{rng.randint(1000, 9999)},{json.dumps(["972", c] if i else [], separators=(",", ":"))},"default"]'
+            for i, c in enumerate(chunks[:4])]
+    text = ' '.join(_sentence(rng) for _ in range(12))
+    rows.append(f'9:T{len(text.encode("utf-8")):x},{text}')
+    tree = []
+    while sum(len(r) for r in rows) + len(json.dumps(tree)) < size:
+        tree.append(_element(rng, 4))
+    model = ['buildId' + _hash(rng, 8), [['', {'children': ['__PAGE__', {}]}, '$undefined', '$undefined', True],
+                                         ['', {'children': ['__PAGE__', {}, [['$L1', tree]]]}]]]
+    rows.append('0:' + json.dumps(model, ensure_ascii=False, separators=(',', ':')))
+    rows.append('1:null')
+    # T rows have no terminator; every other row ends with a newline.
+    return ''.join(r if ':T' in r[:4] else r + '\n' for r in rows), tree
+
+
+def make_page(rng: random.Random, title: str, payload: str, tree: list, chunks: list, scripts: int) -> str:
+    head = ['<!DOCTYPE html><html lang="en"><head><meta charSet="utf-8"/>',
+            '<meta name="viewport" content="width=device-width, initial-scale=1"/>',
+            '<link rel="stylesheet" href="/_next/static/css/28d069147ec3b886.css" data-precedence="next"/>']
+    head += [f'<link rel="preload" as="script" fetchPriority="low" href="/_next/static/chunks/{c}"/>' for c in chunks]
+    head.append(f'<title>{title}</title><link rel="icon" href="/images/carefuse_logo.png"/></head>')
+    body = [f'<body class="__className_{_hash(rng, 6)}"><div class="min-h-screen bg-white">',
+            '<nav><img src="/images/carefuse_logo.png" alt="logo" width="40" height="40"/></nav>',
+            _html(tree), '</div>']
+    # External chunks and the webpack runtime, then inline scripts: half flight
+    # pushes carrying the payload, the rest ordinary inline JS.
+    body += [f'<script src="/_next/static/chunks/{c}" async=""></script>' for c in chunks]
+    body.append(f'<script src="/_next/static/chunks/webpack-{_hash(rng)}.js" async=""></script>')
+    pushes = max(1, scripts // 2)
+    step = len(payload) // pushes + 1
+    body.append('<script>(self.__next_f=self.__next_f||[]).push([0]);self.__next_f.push([2,null])</script>')
+    for i in range(pushes):
+        piece = json.dumps(payload[i * step:(i + 1) * step], ensure_ascii=False)
+        body.append(f'<script>self.__next_f.push([1,{piece}])</script>')
+    body += [f'<script>{MENU_JS}</script>' for _ in range(max(0, scripts - pushes))]
+    body.append('</body></html>')
+    return ''.join(head) + ''.join(body)
+
+
+def generate(root: Path, pages: int = 40, scripts: int = 12, payload_kb: int = 24, seed: int = 1):
+    """Write a synthetic export under root: <route>/index.html + index.txt per page."""
+    rng = random.Random(seed)
+    chunks = [f'{rng.randint(100, 999)}-{_hash(rng)}.js' for _ in range(6)]
+    for n in range(pages):
+        route = root if n == 0 else root / f'route-{n:04d}'
+        route.mkdir(parents=True, exist_ok=True)
+        payload, tree = make_payload(rng, rng.sample(chunks, 4), payload_kb * 1024)
+        page = make_page(rng, f'Synthetic page {n}', payload, tree, rng.sample(chunks, 3), scripts)
+        (route / 'index.html').write_text(page, encoding='utf-8')
+        (route / 'index.txt').write_text(payload, encoding='utf-8')
+
+
+def _digest(outputs) -> str:
+    h = hashlib.sha256()
+    for text in outputs:
+        h.update(text.encode('utf-8'))
+    return h.hexdigest()[:16]
+
+
+def bench_transform(transform, inputs: list, repeat: int) -> dict:
+    """Best-of-repeat wall time, then one traced run for peak memory and output checks."""
+    size = sum(len(text.encode('utf-8')) for _, text in inputs)
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _, text in inputs:
+            transform(text)
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    outputs = [transform(text) for _, text in inputs]
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    idempotent = all(transform(out) == out for out in outputs)
+    return {
+        'files': len(inputs),
+        'bytes': size,
+        'seconds': best,
+        'mb_s': size / best / 1e6 if best else 0.0,
+        'files_s': len(inputs) / best if best else 0.0,
+        'peak_kib': peak / 1024,
+        'idempotent': idempotent,
+        'output': _digest(outputs),
+    }
+
+
+def bench_pipeline(source: Path, stage_names, repeat: int) -> dict:
+    """End-to-end pipeline.run over fresh copies of the synthetic tree."""
+    size = sum(p.stat().st_size for p in iter_files(source))
+    files = sum(1 for _ in iter_files(source))
+    best = float('inf')
+    peak = 0
+    with tempfile.TemporaryDirectory() as scratch:
+        for i in range(repeat + 1):
+            work = Path(scratch) / f'run{i}'
+            shutil.copytree(source, work)
+            traced = i == repeat
+            if traced:
+                tracemalloc.start()
+            t0 = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                pipeline.run(stage_names, work)
+            elapsed = time.perf_counter() - t0
+            if traced:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            else:
+                best = min(best, elapsed)
+        outputs = [p.read_text(encoding='utf-8') for p in iter_files(work) if p.suffix in ('.html', '.txt')]
+    return {
+        'files': files,
+        'bytes': size,
+        'seconds': best,
+        'mb_s': size / best / 1e6,
+        'files_s': files / best,
+        'peak_kib': peak / 1024,
+        'output': _digest(outputs),
+    }
+
+
+def _flight_roundtrip(text: str) -> str:
+    """Parse and re-serialize every row: the worst case for a payload edit."""
+    out = []
+    for row in flight.iter_rows([text.encode('utf-8')]):
+        if not row.is_blank:
+            row.value = row.value
+        out.append(row.serialize())
+    return b''.join(out).decode('utf-8')
+
+
+def run_benchmarks(source: Path, stage_names, repeat: int) -> dict:
+    texts = {rel_path(p, source): p.read_text(encoding='utf-8') for p in iter_files(source)}
+    results = {}
+    for name in stage_names:
+        stage = pipeline.STAGES[name]
+        inputs = [(rel, text) for rel, text in texts.items() if stage.applies(rel)]
+        if not inputs:
+            # Rule sets pinned to real paths (e.g. campus-involvement/index.txt).
+            results[name] = {'skipped': 'no matching files in the synthetic export'}
+            continue
+        try:
+            stage.transform(inputs[0][1])
+        except ImportError as e:
+            results[name] = {'skipped': str(e)}
+            continue
+        results[name] = bench_transform(stage.transform, inputs, repeat)
+    payloads = [(rel, text) for rel, text in texts.items() if flight.is_payload(text)]
+    results['flight-roundtrip'] = bench_transform(_flight_roundtrip, payloads, repeat)
+    results['pipeline'] = bench_pipeline(source, pipeline.DEFAULT_STAGES, repeat)
+    return results
+
+
+def load_history(path: Path) -> list:
+    if not path.exists():
+        return []
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+def compare(results: dict, previous: dict, threshold: float) -> list:
+    """Print each result against the previous run; return the names that regressed."""
+    regressed = []
+    print(f"{'benchmark':<18} {'files':>5} {'MB/s':>8} {'files/s':>9} {'peak KiB':>9}  vs last")
+    for name, r in results.items():
+        if 'skipped' in r:
+            print(f"{name:<18} skipped ({r['skipped']})")
+            continue
+        note = ''
+        old = previous.get(name) if previous else None
+        if old and 'mb_s' in old and old['mb_s']:
+            delta = (r['mb_s'] - old['mb_s']) / old['mb_s'] * 100
+            note = f"{delta:+6.1f}%"
+            if delta < -threshold:
+                note += ' REGRESSION'
+                regressed.append(name)
+            if old.get('output') != r['output']:
+                note += ' output changed'
+        if r.get('idempotent') is False:
+            note += ' (not idempotent)'
+        print(f"{name:<18} {r['files']:>5} {r['mb_s']:>8.2f} {r['files_s']:>9.1f} {r['peak_kib']:>9.0f}  {note}")
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=40, help='routes in the synthetic export (default: 40)')
+    parser.add_argument('--scripts', type=int, default=12, help='script blocks per page (default: 12)')
+    parser.add_argument('--payload-kb', type=int, default=24, help='flight payload size per route (default: 24)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per benchmark; the best is kept')
+    parser.add_argument('--stages', help='comma-separated pipeline stages (default: all registered)')
+    parser.add_argument('--keep', type=Path, metavar='DIR', help='write the synthetic export to DIR and keep it')
+    parser.add_argument('--history', type=Path, default=ROOT / HISTORY_NAME,
+                        help=f'JSON history file (default: {HISTORY_NAME} in the repository root)')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f'percent MB/s drop counted as a regression (default: {DEFAULT_THRESHOLD:g})')
+    parser.add_argument('--no-save', action='store_true', help='do not append this run to the history')
+    parser.add_argument('--fail-on-regression', action='store_true', help='exit 1 if any benchmark regressed')
+    args = parser.parse_args(argv)
+
+    names = [n.strip() for n in args.stages.split(',')] if args.stages else list(pipeline.STAGES)
+    unknown = [n for n in names if n not in pipeline.STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)} (see pipeline.py --list)")
+
+    config = {'pages': args.pages, 'scripts': args.scripts, 'payload_kb': args.payload_kb,
+              'seed': args.seed, 'repeat': args.repeat}
+    with tempfile.TemporaryDirectory() as tmp:
+        source = args.keep.resolve() if args.keep else Path(tmp)
+        generate(source, args.pages, args.scripts, args.payload_kb, args.seed)
+        size = sum(p.stat().st_size for p in iter_files(source))
+        print(f"Synthetic export: {args.pages} pages, {size / 1e6:.1f} MB in {source}\n")
+        results = run_benchmarks(source, names, args.repeat)
+
+    history = load_history(args.history)
+    previous = next((run['results'] for run in reversed(history) if run['config'] == config), None)
+    regressed = compare(results, previous, args.threshold)
+    if previous is None:
+        print('\n(no earlier run with this configuration to compare against)')
+
+    if not args.no_save:
+        history.append({
+            'timestamp': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'config': config,
+            'results': results,
+        })
+        args.history.write_text(json.dumps(history, indent=1) + '\n', encoding='utf-8')
+        print(f"\nRecorded in {args.history}")
+
+    if regressed:
+        print(f"Regressed by more than {args.threshold:g}%: {', '.join(regressed)}")
+        return 1 if args.fail_on_regression else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
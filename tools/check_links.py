@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""Check that every page and payload reference resolves to a file in the export.
+
+References are collected from:
+- HTML: href, src, srcset / imagesrcset, poster and data attributes (this
+  covers <link rel="preload">), plus url(...) in <style> blocks;
+- RSC payloads (route index.txt, parsed with flight.py): string props that
+  are site paths ("/images/x.png", "/about/") and I-row chunk paths;
+- CSS files: url(...);
+- JSON site config (site-config.json): string values that are site paths.
+
+Each reference is resolved the way GitHub Pages (and serve.py) would: "/about/"
+and "/about" reach about/index.html, "/x" falls back to x.html, and .bak /
+.orig leftovers or files outside the site do not count. Absolute URLs on the
+site's own host (CNAME) are checked too; other hosts are not.
+
+Reported:
+    MISSING    a reference that resolves to nothing (exit status 1)
+    ORPHAN     an asset (image, PDF, font, stylesheet) no page, payload or
+               stylesheet refers to; chunks are left to prune_chunks.py, which
+               follows the webpack graph, and the originals and older copies
+               fingerprint.py lists in asset-manifest.json and the
+               resumeAliases in site-config.json (see resume_pdf.py) are
+               expected
+    OVERSIZED  a referenced asset larger than its type's limit (--limit)
+
+The references of every source file are cached in .tools-links.json with the
+file's size and mtime, so a re-run only re-parses files that changed.
+
+Usage:
+    python tools/check_links.py
+    python tools/check_links.py --limit .png=300 --json links.json
+"""
+import argparse
+import html
+import json
+import os
+import posixpath
+import re
+import sys
+import time
+from pathlib import Path
+from urllib.parse import unquote, urljoin, urlsplit
+
+import flight
+from htmltok import tag_attrs, tokenize
+from treeio import ROOT, is_artifact, is_site_file, iter_files, rel_path
+
+CACHE_NAME = '.tools-links.json'
+# Bump when reference extraction changes so cached entries are re-parsed.
+INDEX_VERSION = 1
+
+URL_ATTRS = ('href', 'src', 'poster', 'data')
+SRCSET_ATTRS = ('srcset', 'imagesrcset')
+CSS_URL = re.compile(r'''url\(\s*(?:"([^"]*)"|'([^']*)'|([^)\s]*))\s*\)''', re.I)
+# A string leaf in a payload or config that names a site path.
+SITE_PATH = re.compile(r'^/(?!/)[^\s"\'<>\\]*$')
+SOURCE_EXTS = ('.html', '.htm', '.css')
+CONFIG_NAMES = ('site-config.json',)
+# Written by fingerprint.py: originals kept as stable aliases of hashed copies.
+ASSET_MANIFEST = 'asset-manifest.json'
+
+ASSET_EXTS = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif', '.svg', '.ico',
+              '.pdf', '.css', '.woff', '.woff2', '.ttf', '.otf', '.mp4', '.webm'}
+# Served by convention rather than referenced.
+WELL_KNOWN = {'favicon.ico', 'robots.txt', 'sitemap.xml', 'CNAME', '.nojekyll', '404.html'}
+SIDECAR_EXTS = ('.gz', '.br')
+
+# Default per-extension size limits in KiB for OVERSIZED.
+IMAGE_LIMIT_KIB = 500
+LIMITS_KIB = {
+    '.png': IMAGE_LIMIT_KIB, '.jpg': IMAGE_LIMIT_KIB, '.jpeg': IMAGE_LIMIT_KIB,
+    '.gif': IMAGE_LIMIT_KIB, '.webp': IMAGE_LIMIT_KIB, '.avif': IMAGE_LIMIT_KIB,
+    '.svg': 100, '.ico': 100,
+    '.pdf': 1024,
+    '.js': 250, '.css': 100,
+}
+
+
+# --- reference extraction ----------------------------------------------------
+
+def srcset_urls(value: str) -> list:
+    return [part.split()[0] for part in value.split(',') if part.strip()]
+
+
+def css_refs(text: str) -> list:
+    refs = []
+    for m in CSS_URL.finditer(text):
+        url = next(g for g in m.groups() if g is not None)
+        if url:
+            refs.append(url)
+    return refs
+
+
+def html_refs(text: str) -> list:
+    refs = []
+    in_style = False
+    for tok in tokenize(text):
+        if tok.kind in ('tag', 'open_raw') and not tok.name.startswith(('/', '!')):
+            attrs = tag_attrs(tok.data)
+            for name in URL_ATTRS:
+                if attrs.get(name):
+                    refs.append(html.unescape(attrs[name]))
+            for name in SRCSET_ATTRS:
+                if attrs.get(name):
+                    refs.extend(srcset_urls(html.unescape(attrs[name])))
+            if attrs.get('style'):
+                refs.extend(css_refs(html.unescape(attrs['style'])))
+            in_style = tok.kind == 'open_raw' and tok.name == 'style'
+        elif tok.kind == 'raw' and in_style:
+            refs.extend(css_refs(tok.data))
+    return refs
+
+
+def value_paths(value, found: list):
+    """Collect site-path string leaves of a decoded JSON value."""
+    def visit(leaf):
+        if SITE_PATH.match(leaf):
+            found.append(leaf)
+        return leaf
+    flight.map_strings(value, visit)
+    return found
+
+
+def payload_refs(path: Path) -> list:
+    refs = []
+    for row in flight.iter_rows(flight.read_chunks(path)):
+        if row.is_blank or row.is_text:
+            continue
+        refs.extend('/_next/' + c for c in row.chunks)
+        if row.tag != 'I':
+            value_paths(row.value, refs)
+    return refs
+
+
+def extract(path: Path) -> list:
+    """References made by one source file, in document order, deduplicated."""
+    if path.suffix.lower() in ('.html', '.htm'):
+        refs = html_refs(path.read_text(encoding='utf-8', errors='replace'))
+    elif path.suffix.lower() == '.css':
+        refs = css_refs(path.read_text(encoding='utf-8', errors='replace'))
+    elif path.name == 'index.txt':
+        with open(path, encoding='utf-8', errors='replace') as f:
+            head = f.read(64)
+        if flight.is_payload(head):
+            refs = payload_refs(path)
+        elif head.lstrip().startswith('<'):
+            refs = html_refs(path.read_text(encoding='utf-8', errors='replace'))
+        else:
+            refs = []
+    else:
+        refs = value_paths(json.loads(path.read_text(encoding='utf-8')), [])
+    return list(dict.fromkeys(refs))
+
+
+def is_source(rel: str) -> bool:
+    name = rel.rsplit('/', 1)[-1]
+    return (rel.lower().endswith(SOURCE_EXTS) or name == 'index.txt' or rel in CONFIG_NAMES)
+
+
+# --- cached index ------------------------------------------------------------
+
+class LinkIndex:
+    """source file -> references, cached by size and mtime."""
+
+    def __init__(self, root: Path = ROOT, path: Path = None, use_cache: bool = True):
+        self.root = root
+        self.path = path or root / CACHE_NAME
+        self.entries = {}
+        self.parsed = 0
+        self.errors = {}
+        if use_cache and self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding='utf-8'))
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable link index {self.path} ({e})")
+            else:
+                if data.get('version') == INDEX_VERSION:
+                    self.entries = data.get('files', {})
+        self.dirty = False
+
+    def update(self, sources: dict):
+        """Bring the index in line with sources ({rel: os.stat_result})."""
+        for rel in list(self.entries):
+            if rel not in sources:
+                del self.entries[rel]
+                self.dirty = True
+        for rel, st in sources.items():
+            entry = self.entries.get(rel)
+            if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+                continue
+            try:
+                refs = extract(self.root / rel)
+            except (OSError, ValueError) as e:
+                # FlightError and JSON errors are ValueErrors; report, do not cache.
+                self.errors[rel] = str(e)
+                self.entries.pop(rel, None)
+                continue
+            self.entries[rel] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'refs': refs}
+            self.parsed += 1
+            self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        payload = {'version': INDEX_VERSION, 'files': dict(sorted(self.entries.items()))}
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        tmp.write_text(json.dumps(payload, indent=1) + '\n', encoding='utf-8')
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+
+# --- resolution ----------------------------------------------------------------
+
+def site_host(root: Path):
+    cname = root / 'CNAME'
+    if cname.is_file():
+        host = cname.read_text(encoding='utf-8').strip().lower()
+        return host or None
+    return None
+
+
+class Resolver:
+    def __init__(self, files: set, host: str = None):
+        self.files = files
+        self.dirs = {posixpath.dirname(f) for f in files}
+        for d in list(self.dirs):
+            while d:
+                d = posixpath.dirname(d)
+                self.dirs.add(d)
+        self.hosts = {host, 'www.' + host, host.removeprefix('www.')} if host else set()
+
+    def url_path(self, url: str, source: str):
+        """The site path a reference points at, or None if it is not on this site."""
+        url = url.strip()
+        if not url or url.startswith('#'):
+            return None
+        parts = urlsplit(url)
+        if parts.scheme or parts.netloc:
+            if parts.scheme not in ('', 'http', 'https') or parts.netloc.lower() not in self.hosts:
+                return None
+            return parts.path or '/'
+        base = '/' + (source if not source.endswith('index.txt') else source[:-3] + 'html')
+        return urlsplit(urljoin(base, url)).path
+
+    def resolve(self, path: str):
+        """The file serving a site path, or None."""
+        rel = unquote(path).lstrip('/')
+        if rel:
+            rel = posixpath.normpath(rel)
+            if rel.startswith('..'):
+                return None
+        if rel in ('', '.') or rel in self.dirs:
+            target = posixpath.join(rel.strip('.'), 'index.html').lstrip('/')
+        elif path.endswith('/'):
+            return None
+        elif rel in self.files:
+            target = rel
+        else:
+            target = rel + '.html'
+        return target if target in self.files else None
+
+
+def fingerprint_aliases(root: Path) -> set:
+    """Files fingerprint.py keeps on purpose although pages link their hashed copies."""
+    path = root / ASSET_MANIFEST
+    if not path.is_file():
+        return set()
+    data = json.loads(path.read_text(encoding='utf-8'))
+    return set(data.get('assets', {})) | set(data.get('history', {}))
+
+
+def resume_aliases(root: Path) -> set:
+    """Old resume URLs resume_pdf.py keeps serving the current PDF at."""
+    path = root / CONFIG_NAMES[0]
+    if not path.is_file():
+        return set()
+    return {a.lstrip('/') for a in json.loads(path.read_text(encoding='utf-8')).get('resumeAliases', [])}
+
+
+def is_served(rel: str) -> bool:
+    return is_site_file(rel) and not is_artifact(rel) and not rel.endswith(SIDECAR_EXTS)
+
+
+def scan(root: Path):
+    """(served files, {source rel: stat}) from one walk of the tree."""
+    files, sources = set(), {}
+    for path in iter_files(root):
+        rel = rel_path(path, root)
+        if not is_served(rel):
+            continue
+        files.add(rel)
+        if is_source(rel):
+            sources[rel] = path.stat()
+    return files, sources
+
+
+def parse_limits(specs) -> dict:
+    limits = dict(LIMITS_KIB)
+    for spec in specs or ():
+        ext, _, kib = spec.partition('=')
+        if not ext or not kib:
+            raise ValueError(f"bad --limit {spec!r} (expected .ext=KiB)")
+        limits['.' + ext.lower().lstrip('.')] = float(kib)
+    return limits
+
+
+def check(root: Path, index: LinkIndex, limits: dict):
+    files, sources = scan(root)
+    index.update(sources)
+    resolver = Resolver(files, site_host(root))
+
+    missing = {}       # url path -> [source, ...]
+    referenced = {}    # target -> first source
+    for source, entry in sorted(index.entries.items()):
+        for url in entry['refs']:
+            path = resolver.url_path(url, source)
+            if path is None:
+                continue
+            target = resolver.resolve(path)
+            if target is None:
+                missing.setdefault(path, []).append(source)
+            else:
+                referenced.setdefault(target, source)
+
+    expected = WELL_KNOWN | fingerprint_aliases(root) | resume_aliases(root)
+    orphans = sorted(f for f in files
+                     if posixpath.splitext(f)[1].lower() in ASSET_EXTS
+                     and f not in referenced and f not in expected)
+    oversized = []
+    for target in sorted(referenced):
+        limit = limits.get(posixpath.splitext(target)[1].lower())
+        if limit is None:
+            continue
+        size = (root / target).stat().st_size
+        if size > limit * 1024:
+            oversized.append((target, size, limit))
+    return missing, referenced, orphans, oversized
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--root', type=Path, default=ROOT, help='tree to check (default: repository root)')
+    parser.add_argument('--limit', action='append', metavar='.EXT=KiB',
+                        help='size limit for OVERSIZED, repeatable (e.g. --limit .png=300)')
+    parser.add_argument('--no-cache', action='store_true', help=f'ignore and do not update {CACHE_NAME}')
+    parser.add_argument('--no-orphans', action='store_true', help='do not report orphaned assets')
+    parser.add_argument('--json', type=Path, metavar='FILE', help='write the report as JSON')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    root = args.root.resolve()
+    try:
+        limits = parse_limits(args.limit)
+    except ValueError as e:
+        parser.error(str(e))
+    index = LinkIndex(root, use_cache=not args.no_cache)
+    missing, referenced, orphans, oversized = check(root, index, limits)
+    if not args.no_cache:
+        index.save()
+    if args.no_orphans:
+        orphans = []
+
+    for rel, error in sorted(index.errors.items()):
+        print(f"ERROR {rel} ({error})")
+    for path, sources in sorted(missing.items()):
+        more = f" and {len(sources) - 1} more" if len(sources) > 1 else ''
+        print(f"MISSING {path} (referenced from {sources[0]}{more})")
+    for rel in orphans:
+        print(f"ORPHAN {rel} ({(root / rel).stat().st_size / 1024:.1f} KiB)")
+    for rel, size, limit in oversized:
+        print(f"OVERSIZED {rel} ({size / 1024:.1f} KiB > {limit:g} KiB, referenced from {referenced[rel]})")
+
+    elapsed = (time.perf_counter() - started) * 1000
+    print('\nSummary:')
+    print(f"Sources: {len(index.entries)} ({index.parsed} re-parsed), "
+          f"references: {sum(len(e['refs']) for e in index.entries.values())}, targets: {len(referenced)}")
+    print(f"Missing: {len(missing)}, orphaned: {len(orphans)}, oversized: {len(oversized)} ({elapsed:.0f} ms)")
+
+    if args.json:
+        report = {
+            'missing': {path: sources for path, sources in sorted(missing.items())},
+            'orphaned': {rel: (root / rel).stat().st_size for rel in orphans},
+            'oversized': {rel: size for rel, size, _ in oversized},
+            'errors': index.errors,
+        }
+        args.json.write_text(json.dumps(report, indent=1) + '\n', encoding='utf-8')
+    return 1 if missing or index.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
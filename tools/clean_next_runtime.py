@@ -5,74 +5,238 @@ Clean Next.js client runtime artifacts from exported static HTML files.
 What it does:
 - Scans the workspace for .html and .txt files.
 - If a file contains Next runtime artifacts (self.__next_f or /_next/static/chunks/),
-  it creates a backup (<filename>.next-runtime.bak) if not present, then removes:
-    * <script ... src="/_next/static/chunks/...">...</script>
-    * <script ...>...__next_f... </script> (inline payloads)
-    * Any <script src="/_next/static/chunks/webpack-...js" ...></script>
+  it walks the script blocks once (htmltok.py), classifies each one and removes:
+    * external chunk:  <script src="/_next/static/chunks/..."></script>
+    * webpack runtime: <script src="/_next/static/chunks/webpack-...js"></script>
+    * flight push:     <script>...__next_f...</script> (inline payloads)
+  together with the whitespace that follows, then sweeps stray
+  (self.__next_f=self.__next_f||[]).push(...) calls left outside script tags.
 - Writes cleaned file and reports summary.
 
+The scan is linear in the page size. It replaced a set of DOTALL regexes
+whose `<script[^>]*>.*?__next_f.*?</script>` could run from every <script to
+the end of the page, and could swallow unrelated scripts and markup before
+the next __next_f; `--verify` compares both on the current tree.
+
 Safety:
-- Makes a one-time backup per file before modification.
+- Records the original of every modified file in one backup snapshot
+  (see snapshot.py; restore with `python tools/snapshot.py restore <id>`).
 - Only removes script tags that match the patterns; leaves other inline scripts (like mobile-menu) intact.
+
+The cleaning itself lives in clean_text() so tools/pipeline.py can run it as a stage.
 """
 
+import argparse
 import re
 import sys
 from pathlib import Path
 
+from htmltok import tag_attrs, tokenize
+from manifest import Manifest, add_incremental_arguments, sha256_bytes
+from snapshot import Session, Store
+from treeio import add_jobs_argument, byte_probe, iter_files, parallel_map, read_text_if, rel_path, resolve_jobs
+
 ROOT = Path(__file__).resolve().parents[1]
-PAT_CHUNK_SRC = re.compile(r"<script[^>]+src=[\"']/?_next/static/chunks/[^\"']+[\"'][^>]*>\s*</script>\s*", re.IGNORECASE)
-PAT_INLINE_NEXT = re.compile(r"<script[^>]*>.*?__next_f.*?</script>\s*", re.IGNORECASE | re.DOTALL)
-PAT_WEBPACK_SRC = re.compile(r"<script[^>]+src=[\"']/?_next/static/chunks/webpack-[^\"']+[\"'][^>]*>\s*</script>\s*", re.IGNORECASE)
+CHUNK_SRC = re.compile(r"/?_next/static/chunks/[^\"']", re.IGNORECASE)
+WEBPACK_SRC = re.compile(r"/?_next/static/chunks/webpack-[^\"']", re.IGNORECASE)
+FLIGHT = re.compile(r"__next_f", re.IGNORECASE)
+# [^)]* stops at the first ')', so this sweep stays linear.
+PAT_PUSH = re.compile(r"\(self\.__next_f=self\.__next_f\|\|\[\]\)\.push\([^)]*\);?", re.IGNORECASE | re.DOTALL)
+
+# The regexes clean_text() replaced; only used by --verify.
+LEGACY_CHUNK_SRC = re.compile(r"<script[^>]+src=[\"']/?_next/static/chunks/[^\"']+[\"'][^>]*>\s*</script>\s*", re.IGNORECASE)
+LEGACY_INLINE_NEXT = re.compile(r"<script[^>]*>.*?__next_f.*?</script>\s*", re.IGNORECASE | re.DOTALL)
+LEGACY_WEBPACK_SRC = re.compile(r"<script[^>]+src=[\"']/?_next/static/chunks/webpack-[^\"']+[\"'][^>]*>\s*</script>\s*", re.IGNORECASE)
 
 EXTS = {'.html', '.htm', '.txt'}
 
-files_processed = 0
-files_modified = 0
+# Manifest key for --incremental; bump the version whenever the output changes.
+TRANSFORM_NAME = 'next-runtime'
+TRANSFORM_VERSION = 1
+
+
+ARTIFACT_MARKERS = ('self.__next_f', '/_next/static/chunks', 'webpack-')
+# has_artifacts() on raw bytes, so files without markers are never decoded.
+PROBE = byte_probe(m.encode('ascii') for m in ARTIFACT_MARKERS)
+
+
+def has_artifacts(text: str) -> bool:
+    return any(m in text for m in ARTIFACT_MARKERS)
+
+
+REMOVED_KINDS = ('chunk', 'webpack', 'flight')
+
+
+def classify_script(open_tag: str, body: str) -> str:
+    """'webpack', 'chunk', 'flight' (inline __next_f payload) or 'other'."""
+    if not body.strip():
+        src = tag_attrs(open_tag).get('src') or ''
+        if WEBPACK_SRC.match(src):
+            return 'webpack'
+        if CHUNK_SRC.match(src):
+            return 'chunk'
+    if FLIGHT.search(body):
+        return 'flight'
+    return 'other'
+
+
+def clean_text(text: str, counts: dict = None) -> str:
+    """Drop runtime script blocks in one pass; counts, if given, gets blocks per kind."""
+    if not has_artifacts(text):
+        return text
+
+    out = []
+    open_tag = None     # start tag of the script being collected
+    body = []
+    strip = False       # eat whitespace after a removed block
+    for tok in tokenize(text, coarse=True):
+        if tok.kind == 'open_raw' and tok.name == 'script':
+            open_tag, body = tok.data, []
+            continue
+        if open_tag is not None:
+            if tok.kind == 'raw':
+                body.append(tok.data)
+                continue
+            if tok.kind == 'close_raw':
+                content = ''.join(body)
+                kind = classify_script(open_tag, content)
+                if counts is not None:
+                    counts[kind] = counts.get(kind, 0) + 1
+                if kind in REMOVED_KINDS:
+                    strip = True
+                else:
+                    out += (open_tag, content, tok.data)
+                    strip = False
+                open_tag = None
+                continue
+        data = tok.data
+        if strip:
+            data = data.lstrip()
+            if not data:
+                continue
+            strip = False
+        out.append(data)
+    if open_tag is not None:
+        # Unterminated script: kept as-is.
+        out.append(open_tag)
+        out += body
 
-for p in ROOT.rglob('*'):
-    if p.suffix.lower() not in EXTS:
-        continue
+    # Also remove any standalone occurrences of (self.__next_f=self.__next_f||[]).push... left outside script tags
+    return PAT_PUSH.sub('', ''.join(out))
+
+
+def clean_text_legacy(text: str) -> str:
+    """The previous regex implementation, kept as the reference for --verify."""
+    if not has_artifacts(text):
+        return text
+    cleaned = LEGACY_CHUNK_SRC.sub('', text)
+    cleaned = LEGACY_WEBPACK_SRC.sub('', cleaned)
+    cleaned = LEGACY_INLINE_NEXT.sub('', cleaned)
+    return PAT_PUSH.sub('', cleaned)
+
+
+def verify(paths) -> int:
+    """Compare clean_text() with clean_text_legacy() on paths; returns the number that differ."""
+    differ = 0
+    for p in paths:
+        try:
+            text = read_text_if(p, PROBE)
+        except OSError:
+            continue
+        if text is None:
+            continue
+        counts = {}
+        new, old = clean_text(text, counts), clean_text_legacy(text)
+        kinds = ', '.join(f"{k}={n}" for k, n in sorted(counts.items())) or 'no scripts'
+        if new == old:
+            print(f"SAME {rel_path(p, ROOT)} ({kinds})")
+        else:
+            differ += 1
+            at = next((i for i, (a, b) in enumerate(zip(new, old)) if a != b), min(len(new), len(old)))
+            print(f"DIFF {rel_path(p, ROOT)} ({kinds}; first difference at offset {at})")
+    return differ
+
+
+def clean_file(p: Path):
+    """Clean one file; returns None if it has no artifacts, else (modified, report_line, backup, sha256)."""
     try:
-        text = p.read_text(encoding='utf-8')
-    except Exception:
-        # skip binary or unreadable files
-        continue
+        text = read_text_if(p, PROBE)
+    except OSError:
+        return None
+    if text is None:
+        # no artifacts, or not UTF-8 text
+        return None
 
-    if 'self.__next_f' not in text and '/_next/static/chunks' not in text and 'webpack-' not in text:
-        continue
-
-    files_processed += 1
     original = text
-
-    # Create backup
-    backup = p.with_suffix(p.suffix + '.next-runtime.bak')
-    if not backup.exists():
-        backup.write_text(original, encoding='utf-8')
-
-    # Remove patterns
-    cleaned = PAT_CHUNK_SRC.sub('', original)
-    cleaned = PAT_WEBPACK_SRC.sub('', cleaned)
-    cleaned = PAT_INLINE_NEXT.sub('', cleaned)
-
-    # Also remove any standalone occurrences of (self.__next_f=self.__next_f||[]).push... left outside script tags
-    cleaned = re.sub(r"\(self\.__next_f=self\.__next_f\|\|\[\]\)\.push\([^)]*\);?", '', cleaned, flags=re.IGNORECASE | re.DOTALL)
+    cleaned = clean_text(original)
 
     # Trim trailing spaces/newlines introduced
     if cleaned != original:
-        p.write_text(cleaned, encoding='utf-8')
-        files_modified += 1
-        print(f"Cleaned: {p.relative_to(ROOT)} (backup: {backup.name})")
+        # Back up into the shared store; the parent records it in the run's snapshot.
+        raw = original.encode('utf-8')
+        backup = Store(ROOT).put(raw), len(raw)
+        data = cleaned.encode('utf-8')
+        p.write_bytes(data)
+        return True, f"Cleaned: {p.relative_to(ROOT)}", backup, sha256_bytes(data)
+    return False, f"No change needed for: {p.relative_to(ROOT)}", None, sha256_bytes(original.encode('utf-8'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Clean Next.js client runtime artifacts from exported static HTML files.')
+    parser.add_argument('--verify', action='store_true',
+                        help='compare the output with the previous regex implementation; writes nothing')
+    add_jobs_argument(parser)
+    add_incremental_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.verify:
+        differ = verify(p for p in sorted(iter_files(ROOT)) if p.suffix.lower() in EXTS)
+        print(f"\n{differ} file(s) differ")
+        sys.exit(1 if differ else 0)
+
+    files_processed = 0
+    files_modified = 0
+    files_current = 0
+
+    transforms = {TRANSFORM_NAME: TRANSFORM_VERSION}
+    manifest = Manifest(ROOT, args.manifest) if args.incremental else None
+    session = Session('clean_next_runtime', ROOT)
+    paths = [p for p in sorted(iter_files(ROOT)) if p.suffix.lower() in EXTS]
+    if manifest is not None:
+        todo = [p for p in paths if not manifest.is_current(p, transforms)]
+        files_current = len(paths) - len(todo)
+        paths = todo
+    for p, result in zip(paths, parallel_map(clean_file, paths, resolve_jobs(args.jobs), chunksize=8)):
+        if manifest is not None:
+            # Files the probe skipped unread carry no hash; the manifest keeps theirs.
+            manifest.record(p, transforms, changed=bool(result and result[0]), digest=result and result[3])
+        if result is None:
+            continue
+        modified, line, backup, _ = result
+        if backup:
+            session.record_digest(rel_path(p, ROOT), *backup)
+        files_processed += 1
+        files_modified += modified
+        print(line)
+
+    print('\nSummary:')
+    print(f'  Files scanned with artifacts: {files_processed}')
+    print(f'  Files modified: {files_modified}')
+    if manifest is not None:
+        manifest.save()
+        print(f'  Files skipped as up to date: {files_current}')
+
+    snapshot_id = session.close()
+    if snapshot_id:
+        print(f'  Backup snapshot: {snapshot_id}')
+
+    if files_modified == 0:
+        print('No files needed modification.')
     else:
-        print(f"No change needed for: {p.relative_to(ROOT)}")
+        print('Next: re-run a grep for self.__next_f to verify.')
 
-print('\nSummary:')
-print(f'  Files scanned with artifacts: {files_processed}')
-print(f'  Files modified: {files_modified}')
+    sys.exit(0)
 
-if files_modified == 0:
-    print('No files needed modification.')
-else:
-    print('Next: re-run a grep for self.__next_f to verify.')
 
-sys.exit(0)
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""Plan and ship the minimal set of changes between the tree and the last published state.
+
+The published state is a manifest of every file the host serves, with its
+size and SHA-256 (.tools-published.json, see --state). A plan compares the
+tree with it and lists what to add, update and delete, so a publish carries
+only what changed instead of the whole export:
+
+- Only the site is published: tools/, scripts/, public/, backups/, dotfiles
+  (except .nojekyll), .bak / .orig / .fixed / .tmp leftovers, the .gz / .br
+  sidecars (GitHub Pages compresses on its own; --sidecars keeps them) and
+  the repository's Markdown notes are left out.
+- Files whose size and mtime match the manifest are not re-hashed, so
+  planning reads only what was touched since the last publish.
+- Whatever the host has that the tree no longer publishes is deleted,
+  including backups and leftovers that an earlier full-tree push uploaded.
+
+A plan is shipped as a bundle: a directory (--out) or a tarball (--tarball)
+with deploy-plan.json and only the added and updated files under files/,
+written outside the published tree so the next plan does not pick it up.
+`apply` plays a bundle onto a directory standing in for the remote, after
+checking that the directory still holds the state the plan was made
+against, and records the new published state. `publish` does both in one
+step for a local target.
+
+Usage:
+    python tools/deploy_plan.py adopt --target /srv/site     # record what a target holds now
+    python tools/deploy_plan.py plan                         # list changes since the last publish
+    python tools/deploy_plan.py plan --tarball /tmp/deploy.tar.gz
+    python tools/deploy_plan.py apply /tmp/deploy.tar.gz --target /srv/site
+    python tools/deploy_plan.py publish --target /srv/site   # plan + apply
+    python tools/deploy_plan.py --source deploy publish --target /srv/site   # the minified copy
+"""
+import argparse
+import fnmatch
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import tarfile
+import time
+from pathlib import Path, PurePosixPath, PureWindowsPath
+
+from treeio import ROOT, is_artifact, is_site_file, iter_files, rel_path
+
+STATE_NAME = '.tools-published.json'
+STATE_VERSION = 1
+PLAN_NAME = 'deploy-plan.json'
+FILES_DIR = 'files'
+# Dotfiles the host needs; every other dotfile stays private.
+PUBLISHED_DOTFILES = {'.nojekyll'}
+SIDECAR_EXTS = ('.gz', '.br')
+DEFAULT_EXCLUDES = ('*.md',)
+
+
+class PlanError(Exception):
+    """A bundle that cannot be written, or applied to the target as it is."""
+
+
+def file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def is_published(rel: str, excludes=DEFAULT_EXCLUDES, sidecars: bool = False) -> bool:
+    if not (rel in PUBLISHED_DOTFILES or is_site_file(rel)) or is_artifact(rel):
+        return False
+    if not sidecars and rel.endswith(SIDECAR_EXTS):
+        return False
+    return not any(fnmatch.fnmatchcase(rel, pattern) for pattern in excludes)
+
+
+# --- published state -----------------------------------------------------------
+
+def load_state(path: Path) -> dict:
+    """{rel: {size, sha256[, mtime_ns]}} of the last publish; empty if there was none."""
+    if not path.exists():
+        return {}
+    data = json.loads(path.read_text(encoding='utf-8'))
+    if data.get('version') != STATE_VERSION:
+        raise SystemExit(f"{path}: unsupported state version {data.get('version')!r}")
+    return data.get('files', {})
+
+
+def save_state(path: Path, files: dict):
+    payload = {'version': STATE_VERSION,
+               'published': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+               'files': dict(sorted(files.items()))}
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(json.dumps(payload, indent=1) + '\n', encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def tree_state(source: Path, previous: dict, excludes, sidecars: bool):
+    """(state of the publishable tree, files hashed); unchanged size+mtime reuse the old hash."""
+    files, hashed = {}, 0
+    for path in iter_files(source):
+        rel = rel_path(path, source)
+        if not is_published(rel, excludes, sidecars):
+            continue
+        st = path.stat()
+        old = previous.get(rel)
+        if old and old['size'] == st.st_size and old.get('mtime_ns') == st.st_mtime_ns:
+            digest = old['sha256']
+        else:
+            digest = file_digest(path)
+            hashed += 1
+        files[rel] = {'size': st.st_size, 'sha256': digest, 'mtime_ns': st.st_mtime_ns}
+    return files, hashed
+
+
+def target_state(target: Path) -> dict:
+    """Everything a target directory holds, backups and leftovers included."""
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(target):
+        dirnames[:] = sorted(d for d in dirnames if d != '.git')
+        for fn in sorted(filenames):
+            path = Path(dirpath) / fn
+            files[rel_path(path, target)] = {'size': path.stat().st_size, 'sha256': file_digest(path)}
+    return files
+
+
+# --- plans -------------------------------------------------------------------
+
+class Plan:
+    def __init__(self, previous: dict, current: dict):
+        self.previous = previous
+        self.current = current
+        self.add = sorted(set(current) - set(previous))
+        self.update = sorted(rel for rel in set(current) & set(previous)
+                             if current[rel]['sha256'] != previous[rel]['sha256'])
+        self.delete = sorted(set(previous) - set(current))
+
+    @property
+    def upload(self):
+        return self.add + self.update
+
+    @property
+    def empty(self) -> bool:
+        return not (self.add or self.update or self.delete)
+
+    def upload_bytes(self) -> int:
+        return sum(self.current[rel]['size'] for rel in self.upload)
+
+    def to_json(self) -> dict:
+        return {
+            'version': STATE_VERSION,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'add': {rel: self.current[rel]['sha256'] for rel in self.add},
+            'update': {rel: [self.previous[rel]['sha256'], self.current[rel]['sha256']] for rel in self.update},
+            'delete': {rel: self.previous[rel]['sha256'] for rel in self.delete},
+            # mtime_ns is the source tree's, so the next plan can skip hashing unchanged files.
+            'state': dict(sorted(self.current.items())),
+        }
+
+
+def write_bundle(plan: Plan, source: Path, out: Path):
+    """Replace out with the bundle; only an empty directory or an earlier bundle is replaced."""
+    if out.exists():
+        if not out.is_dir() or (any(out.iterdir()) and not (out / PLAN_NAME).is_file()):
+            raise PlanError(f"{out} is not empty and holds no {PLAN_NAME}; refusing to replace it")
+        shutil.rmtree(out)
+    for rel in plan.upload:
+        dest = out / FILES_DIR / rel
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(source / rel, dest)
+    out.mkdir(parents=True, exist_ok=True)
+    (out / PLAN_NAME).write_text(json.dumps(plan.to_json(), indent=1) + '\n', encoding='utf-8')
+
+
+def write_tarball(plan: Plan, source: Path, out: Path):
+    """The bundle as a .tar.gz; entries carry no owner or timestamp."""
+    def info(name, size):
+        ti = tarfile.TarInfo(name)
+        ti.size, ti.mtime, ti.mode = size, 0, 0o644
+        return ti
+
+    tmp = out.with_name(out.name + '.tmp')
+    with tarfile.open(tmp, 'w:gz', format=tarfile.PAX_FORMAT) as tar:
+        data = (json.dumps(plan.to_json(), indent=1) + '\n').encode('utf-8')
+        tar.addfile(info(PLAN_NAME, len(data)), io.BytesIO(data))
+        for rel in plan.upload:
+            with open(source / rel, 'rb') as f:
+                tar.addfile(info(f"{FILES_DIR}/{rel}", plan.current[rel]['size']), f)
+    os.replace(tmp, out)
+
+
+class Bundle:
+    """A plan read back from a bundle directory or tarball."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.tar = None
+        if path.is_dir():
+            self.plan = json.loads((path / PLAN_NAME).read_text(encoding='utf-8'))
+        else:
+            self.tar = tarfile.open(path, 'r:*')
+            self.plan = json.loads(self.tar.extractfile(PLAN_NAME).read().decode('utf-8'))
+
+    def open(self, rel: str):
+        if self.tar is None:
+            return open(self.path / FILES_DIR / rel, 'rb')
+        return self.tar.extractfile(f"{FILES_DIR}/{rel}")
+
+    def close(self):
+        if self.tar is not None:
+            self.tar.close()
+
+
+def check_base(plan: dict, target: Path):
+    """Refuse to apply if the target does not hold what the plan expects to replace or delete."""
+    expected = {rel: old for rel, (old, _) in plan['update'].items()}
+    expected.update(plan['delete'])
+    drift = []
+    for rel, digest in sorted(expected.items()):
+        path = target / rel
+        if not path.is_file():
+            drift.append(f"{rel} (missing)")
+        elif file_digest(path) != digest:
+            drift.append(f"{rel} (changed)")
+    for rel in sorted(plan['add']):
+        path = target / rel
+        if path.is_file() and file_digest(path) != plan['add'][rel]:
+            drift.append(f"{rel} (unexpected)")
+    if drift:
+        raise PlanError('target does not match the published state:\n  ' + '\n  '.join(drift))
+
+
+def check_paths(plan: dict):
+    """Refuse paths that would reach outside the target: absolute ones and '..' parts."""
+    bad = []
+    for rel in sorted(set(plan['add']) | set(plan['update']) | set(plan['delete'])):
+        parts = PurePosixPath(rel.replace('\\', '/')).parts
+        if not parts or PureWindowsPath(rel).anchor or parts[0] == '/' or '..' in parts:
+            bad.append(rel)
+    if bad:
+        raise PlanError('plan paths outside the target:\n  ' + '\n  '.join(bad))
+
+
+def apply_plan(plan: dict, open_file, target: Path, verify: bool = True):
+    """Write uploads through temporary files, then delete, then drop emptied directories."""
+    check_paths(plan)
+    if verify:
+        check_base(plan, target)
+    expected = dict(plan['add'])
+    expected.update({rel: new for rel, (_, new) in plan['update'].items()})
+    for rel in sorted(expected):
+        dest = target / rel
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(dest.name + '.deploy-tmp')
+        h = hashlib.sha256()
+        with open_file(rel) as src, open(tmp, 'wb') as dst:
+            for block in iter(lambda: src.read(1 << 20), b''):
+                h.update(block)
+                dst.write(block)
+        if h.hexdigest() != expected[rel]:
+            tmp.unlink()
+            raise PlanError(f"{rel}: bundle contents do not match the plan")
+        os.replace(tmp, dest)
+    for rel in sorted(plan['delete']):
+        (target / rel).unlink(missing_ok=True)
+        parent = (target / rel).parent
+        while parent != target and not any(parent.iterdir()):
+            parent.rmdir()
+            parent = parent.parent
+
+
+# --- commands ----------------------------------------------------------------
+
+def print_plan(plan: Plan):
+    for label, rels in (('ADD', plan.add), ('UPDATE', plan.update), ('DELETE', plan.delete)):
+        for rel in rels:
+            size = (plan.current if label != 'DELETE' else plan.previous)[rel]['size']
+            print(f"{label} {rel} ({size / 1024:.1f} KiB)")
+
+
+def print_summary(plan: Plan, hashed: int, elapsed: float):
+    total = sum(e['size'] for e in plan.current.values())
+    upload = plan.upload_bytes()
+    print('\nSummary:')
+    print(f"Add: {len(plan.add)}, update: {len(plan.update)}, delete: {len(plan.delete)}, "
+          f"unchanged: {len(plan.current) - len(plan.add) - len(plan.update)} "
+          f"({hashed} file(s) hashed, {elapsed * 1000:.0f} ms)")
+    share = f" ({upload / total * 100:.1f}%)" if total else ''
+    print(f"Upload: {upload / 1024:.1f} KiB of {total / 1024:.1f} KiB published{share}")
+
+
+def make_plan(args):
+    started = time.perf_counter()
+    previous = load_state(args.state)
+    if not previous:
+        print(f"No published state in {args.state}; planning a full publish (see `adopt`)")
+    current, hashed = tree_state(args.source, previous, args.excludes, args.sidecars)
+    plan = Plan(previous, current)
+    print_plan(plan)
+    print_summary(plan, hashed, time.perf_counter() - started)
+    return plan
+
+
+def cmd_plan(args) -> int:
+    plan = make_plan(args)
+    if args.out:
+        try:
+            write_bundle(plan, args.source, args.out)
+        except PlanError as e:
+            print(f"ERROR {e}")
+            return 1
+        print(f"Bundle written to {args.out}")
+    if args.tarball:
+        write_tarball(plan, args.source, args.tarball)
+        print(f"Bundle written to {args.tarball} ({args.tarball.stat().st_size / 1024:.1f} KiB)")
+    return 0
+
+
+def cmd_apply(args) -> int:
+    bundle = Bundle(args.bundle)
+    try:
+        args.target.mkdir(parents=True, exist_ok=True)
+        apply_plan(bundle.plan, bundle.open, args.target, verify=not args.force)
+    except PlanError as e:
+        print(f"ERROR {e}")
+        return 1
+    finally:
+        bundle.close()
+    save_state(args.state, bundle.plan['state'])
+    plan = bundle.plan
+    print(f"Applied {args.bundle} to {args.target}: {len(plan['add'])} added, "
+          f"{len(plan['update'])} updated, {len(plan['delete'])} deleted")
+    return 0
+
+
+def cmd_publish(args) -> int:
+    plan = make_plan(args)
+    if plan.empty:
+        print('Nothing to publish.')
+        return 0
+    args.target.mkdir(parents=True, exist_ok=True)
+    try:
+        apply_plan(plan.to_json(), lambda rel: open(args.source / rel, 'rb'), args.target, verify=not args.force)
+    except PlanError as e:
+        print(f"ERROR {e}")
+        return 1
+    save_state(args.state, plan.current)
+    print(f"Published to {args.target}")
+    return 0
+
+
+def cmd_adopt(args) -> int:
+    files = target_state(args.target)
+    save_state(args.state, files)
+    print(f"Recorded {len(files)} file(s) ({sum(e['size'] for e in files.values()) / 1024:.1f} KiB) "
+          f"from {args.target} as the published state in {args.state}")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--root', type=Path, default=ROOT, help='repository root (default: this repository)')
+    parser.add_argument('--source', type=Path, default=None,
+                        help='tree to publish, relative to the root (default: the root; e.g. deploy)')
+    parser.add_argument('--state', type=Path, default=None,
+                        help=f'published-state manifest (default: <root>/{STATE_NAME})')
+    parser.add_argument('--exclude', action='append', default=[], metavar='GLOB',
+                        help=f"also leave out paths matching GLOB (always: {', '.join(DEFAULT_EXCLUDES)})")
+    parser.add_argument('--sidecars', action='store_true', help='publish .gz / .br sidecars too')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('plan', help='list the changes since the last publish and optionally bundle them')
+    p.add_argument('--out', type=Path, help='write the bundle as a directory')
+    p.add_argument('--tarball', type=Path, help='write the bundle as a .tar.gz')
+    p.set_defaults(func=cmd_plan)
+
+    p = sub.add_parser('apply', help='apply a bundle to a directory standing in for the host')
+    p.add_argument('bundle', type=Path)
+    p.add_argument('--target', type=Path, required=True)
+    p.add_argument('--force', action='store_true', help='apply even if the target drifted from the published state')
+    p.set_defaults(func=cmd_apply)
+
+    p = sub.add_parser('publish', help='plan and apply directly to a local target directory')
+    p.add_argument('--target', type=Path, required=True)
+    p.add_argument('--force', action='store_true', help='apply even if the target drifted from the published state')
+    p.set_defaults(func=cmd_publish)
+
+    p = sub.add_parser('adopt', help="record a target directory's current contents as the published state")
+    p.add_argument('--target', type=Path, required=True)
+    p.set_defaults(func=cmd_adopt)
+
+    args = parser.parse_args(argv)
+    root = args.root.resolve()
+    args.source = (root / args.source).resolve() if args.source else root
+    args.state = args.state or root / STATE_NAME
+    args.excludes = DEFAULT_EXCLUDES + tuple(args.exclude)
+    for option in ('target', 'out', 'tarball'):
+        # Anything written inside the tree would be published by the next plan.
+        path = getattr(args, option, None)
+        if path is not None:
+            path = path.resolve()
+            setattr(args, option, path)
+            if path == args.source or args.source in path.parents:
+                parser.error(f'--{option} must be outside the published tree')
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""Copy referenced images and PDFs to content-hashed names and point every reference at them.
+
+What it does:
+- Collects references the way check_links.py does (same cached index, same
+  GitHub Pages resolution) and keeps the ones that reach an asset under
+  images/ or a PDF anywhere on the site.
+- Copies each such asset to <stem>.<sha256[:12]><ext> next to the original.
+  serve.py and the deploy headers treat that name as immutable, so browsers
+  keep it for a year without revalidating. The original stays in place as a
+  stable alias for links from outside the site.
+- Rewrites, in one pass per file, every page (HTML), every RSC payload
+  (index.txt, through flight.py so T-row lengths stay right), stylesheet
+  url()s and site-config.json.
+
+asset-manifest.json at the site root records the current hashed name of each
+source and every hashed name ever produced. The hash depends only on the
+bytes, so an asset that did not change keeps its name (and returning visitors
+their cached copy) across builds. References to an older hashed name are
+followed back to the source and moved to the current one; outdated copies
+are deleted once nothing points at them, or kept with --keep-previous.
+
+Variants already under a hashed name (images/_opt/, _next/static/) are left
+alone, so run this after optimize_images.py.
+
+Usage:
+    python tools/fingerprint.py --dry-run
+    python tools/fingerprint.py
+"""
+import argparse
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+import sys
+from pathlib import Path
+
+import flight
+from check_links import CONFIG_NAMES, LinkIndex, Resolver, scan, site_host
+from snapshot import Session
+from treeio import ROOT
+
+MANIFEST_NAME = 'asset-manifest.json'
+MANIFEST_VERSION = 1
+HASH_LENGTH = 12
+# Names that already carry a content hash (see serve.HASHED_RE).
+PRE_HASHED = re.compile(r'^(?:_next/static/|images/_opt/)|[.-][0-9a-f]{8,}\.\w+$')
+TEXT_EXTS = ('.html', '.htm', '.css')
+
+
+def is_fingerprinted(rel: str) -> bool:
+    """Assets this tool hashes: images under images/ and PDFs, not already hashed."""
+    if PRE_HASHED.search(rel):
+        return False
+    return rel.startswith('images/') or rel.lower().endswith('.pdf')
+
+
+def hashed_name(rel: str, digest: str) -> str:
+    stem, ext = posixpath.splitext(rel)
+    return f"{stem}.{digest[:HASH_LENGTH]}{ext}"
+
+
+def file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+class AssetManifest:
+    """source -> current hashed name, plus every hashed name ever produced -> source."""
+
+    def __init__(self, root: Path):
+        self.path = root / MANIFEST_NAME
+        self.assets = {}
+        self.history = {}
+        if self.path.exists():
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+            if data.get('version') == MANIFEST_VERSION:
+                self.assets = data.get('assets', {})
+                self.history = data.get('history', {})
+
+    def source_of(self, rel: str):
+        return self.history.get(rel)
+
+    def record(self, source: str, hashed: str):
+        self.assets[source] = hashed
+        self.history[hashed] = source
+
+    def save(self):
+        data = {'version': MANIFEST_VERSION,
+                'assets': dict(sorted(self.assets.items())),
+                'history': dict(sorted(self.history.items()))}
+        self.path.write_text(json.dumps(data, indent=1) + '\n', encoding='utf-8')
+
+
+def collect(root: Path, index: LinkIndex, manifest: AssetManifest):
+    """({asset: [referencing source files]}, served files)."""
+    files, sources = scan(root)
+    index.update(sources)
+    resolver = Resolver(files, site_host(root))
+    assets = {}
+    for source, entry in sorted(index.entries.items()):
+        for url in entry['refs']:
+            path = resolver.url_path(url, source)
+            if path is None:
+                continue
+            rel = posixpath.normpath(path.lstrip('/')) if path.strip('/') else ''
+            # An older hashed name may already be gone; follow it back to its source.
+            asset = manifest.source_of(rel) or resolver.resolve(path)
+            if asset and is_fingerprinted(asset) and asset in files:
+                assets.setdefault(asset, []).append(source)
+    return assets, files
+
+
+def url_pattern(paths, host: str = None):
+    """One alternation over site paths, as root-relative or own-host absolute URLs."""
+    alternation = '|'.join(re.escape(p) for p in sorted(paths, key=len, reverse=True))
+    origin = ''
+    if host:
+        bare = re.escape(host.removeprefix('www.'))
+        origin = rf'(?P<origin>https?://(?:www\.)?{bare})?'
+    # The path must not continue a longer path or name ("/images/a.png.bak").
+    return re.compile(rf'(?<![\w.:/-]){origin}(?P<path>{alternation})(?=[^\w.-]|$)')
+
+
+class Rewriter:
+    def __init__(self, mapping: dict, host: str = None):
+        """mapping: old site path ("/images/a.png") -> new site path."""
+        self.mapping = mapping
+        self.pattern = url_pattern(mapping, host) if mapping else None
+        self.count = 0
+
+    def _sub(self, m):
+        new = self.mapping[m.group('path')]
+        if new == m.group('path'):
+            return m.group(0)
+        self.count += 1
+        return (m.groupdict().get('origin') or '') + new
+
+    def text(self, text: str) -> str:
+        return self.pattern.sub(self._sub, text)
+
+    def probe(self, raw: str) -> bool:
+        return self.pattern.search(raw) is not None
+
+
+def rewrite_file(path: Path, rel: str, rewriter: Rewriter, session: Session, dry_run: bool) -> int:
+    """Rewrite one source file; returns the number of references moved."""
+    before = rewriter.count
+    if rel.endswith('index.txt'):
+        with open(path, encoding='utf-8', errors='replace') as f:
+            payload = flight.is_payload(f.read(64))
+        if payload:
+            original = path.read_bytes()
+            if flight.rewrite_file(path, edit=rewriter.text, probe=rewriter.probe, dry_run=dry_run) and not dry_run:
+                session.record(path, original)
+            return rewriter.count - before
+    original = path.read_bytes()
+    text = original.decode('utf-8')
+    new = rewriter.text(text)
+    if new != text and not dry_run:
+        session.record(path, original)
+        path.write_bytes(new.encode('utf-8'))
+    return rewriter.count - before
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--root', type=Path, default=ROOT, help='tree to process (default: repository root)')
+    parser.add_argument('--dry-run', action='store_true', help='report what would change without writing')
+    parser.add_argument('--keep-previous', action='store_true',
+                        help='keep outdated hashed copies instead of deleting them')
+    args = parser.parse_args(argv)
+
+    root = args.root.resolve()
+    manifest = AssetManifest(root)
+    index = LinkIndex(root)
+    assets, files = collect(root, index, manifest)
+    index.save()
+
+    mapping = {}
+    current = set()
+    created = 0
+    for source in sorted(assets):
+        digest = file_digest(root / source)
+        hashed = hashed_name(source, digest)
+        current.add(hashed)
+        exists = (root / hashed).exists()
+        if not exists and not args.dry_run:
+            shutil.copy2(root / source, root / hashed)
+        created += not exists
+        print(f"{'FINGERPRINT' if not exists else 'UNCHANGED'} {source} -> {hashed} "
+              f"({len(assets[source])} referencing file(s))")
+        old = [name for name, src in manifest.history.items() if src == source]
+        for name in [source, hashed, *old]:
+            mapping['/' + name] = '/' + hashed
+        if not args.dry_run:
+            manifest.record(source, hashed)
+    for source in set(manifest.assets) - set(assets):
+        if not args.dry_run:
+            del manifest.assets[source]
+
+    rewriter = Rewriter(mapping, site_host(root))
+    session = Session('fingerprint', root)
+    print()
+    updated = 0
+    for rel in sorted(index.entries):
+        if not (rel.lower().endswith(TEXT_EXTS) or rel.endswith('index.txt') or rel in CONFIG_NAMES):
+            continue
+        moved = rewrite_file(root / rel, rel, rewriter, session, args.dry_run) if mapping else 0
+        if moved:
+            updated += 1
+            print(f"{'WOULD UPDATE' if args.dry_run else 'UPDATED'} {rel} ({moved} reference(s))")
+
+    removed = []
+    if not args.keep_previous:
+        for name, source in sorted(manifest.history.items()):
+            if name not in current and name in files:
+                removed.append(name)
+                if not args.dry_run:
+                    os.remove(root / name)
+                print(f"{'WOULD REMOVE' if args.dry_run else 'REMOVED'} {name} (outdated copy of {source})")
+
+    if not args.dry_run:
+        manifest.save()
+    snapshot_id = session.close()
+
+    print('\nSummary:')
+    print(f"Assets: {len(assets)} ({created} new hashed cop{'y' if created == 1 else 'ies'}), "
+          f"references moved: {rewriter.count} in {updated} file(s), outdated copies removed: {len(removed)}")
+    if snapshot_id:
+        print(f"Originals saved in backup snapshot {snapshot_id}")
+    if args.dry_run:
+        print('Dry run: nothing was written.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
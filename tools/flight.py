@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""Parser and rewriter for the Next.js RSC flight payloads (route index.txt).
+
+A payload is a sequence of rows, each `<hex id>:<tag><body>`:
+
+    2:I[5878,["972","static/chunks/972-e6acae3a74adc8b1.js"],"Image"]   client module import
+    0:["TvnfXHU6nbvB6OIZi7NfN",[...]]                                   JSON model row
+    2:T48b,<0x48b bytes of UTF-8 text>                                  text row, no terminator
+
+JSON rows end at a newline; text rows are length-prefixed, so editing one as
+raw text without fixing the length corrupts everything after it. Rows are
+parsed incrementally from byte chunks, JSON is only decoded for rows a
+transform might touch, and unchanged rows are written back byte for byte.
+
+Usage:
+    python tools/flight.py --check            # verify every payload round-trips
+    python tools/flight.py --dump index.txt   # one line per row: id, tag, size, chunks
+"""
+import argparse
+import json
+import re
+import sys
+from pathlib import Path
+
+from treeio import ROOT, iter_files, rel_path
+
+CHUNK_SIZE = 1 << 16
+HEAD_RE = re.compile(rb'([0-9a-fA-F]+):([A-Z]*)')
+PARTIAL_HEAD_RE = re.compile(rb'[0-9a-fA-F]+(?::[A-Z]*)?')
+# First row of a payload; HTML saved as index.txt (some routes) does not match.
+PAYLOAD_RE = re.compile(r'\s*[0-9a-fA-F]+:(?:T[0-9a-fA-F]+,|[A-Z]*[\[{"\dtfn-])')
+
+
+class FlightError(ValueError):
+    pass
+
+
+class Row:
+    """One payload row; `raw` is written back unless the row was edited."""
+
+    __slots__ = ('id', 'tag', 'body', 'end', 'raw', '_value', 'dirty')
+
+    def __init__(self, id: str, tag: str, body: bytes, end: bytes, raw: bytes):
+        self.id = id
+        self.tag = tag
+        self.body = body
+        self.end = end
+        self.raw = raw
+        self._value = None
+        self.dirty = False
+
+    @property
+    def is_text(self) -> bool:
+        return self.tag == 'T'
+
+    @property
+    def is_blank(self) -> bool:
+        return not self.id
+
+    @property
+    def value(self):
+        """Decoded JSON body (the text itself for T rows)."""
+        if self._value is None:
+            body = self.body.decode('utf-8')
+            self._value = body if self.is_text else json.loads(body)
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self._value = value
+        self.dirty = True
+
+    @property
+    def chunks(self) -> list:
+        """Chunk paths referenced by an I (client module import) row."""
+        if self.tag != 'I':
+            return []
+        pairs = self._chunk_list()
+        return pairs[1::2] if pairs is not None else []
+
+    def _chunk_list(self):
+        value = self.value
+        if isinstance(value, dict):
+            return value.get('chunks')
+        if isinstance(value, list) and len(value) > 1 and isinstance(value[1], list):
+            return value[1]
+        return None
+
+    def map_chunks(self, func) -> bool:
+        """Apply func to every chunk path of an I row; returns True if any changed."""
+        if self.tag != 'I':
+            return False
+        pairs = self._chunk_list()
+        if not pairs:
+            return False
+        changed = False
+        for i in range(1, len(pairs), 2):
+            new = func(pairs[i])
+            if new != pairs[i]:
+                pairs[i] = new
+                changed = True
+        self.dirty |= changed
+        return changed
+
+    def serialize(self) -> bytes:
+        if not self.dirty:
+            return self.raw
+        head = f"{self.id}:{self.tag}".encode('ascii')
+        if self.is_text:
+            text = self._value.encode('utf-8')
+            return head + f"{len(text):x},".encode('ascii') + text
+        # Matches JSON.stringify, which produced the payload.
+        body = json.dumps(self._value, ensure_ascii=False, separators=(',', ':'))
+        return head + body.encode('utf-8') + self.end
+
+
+class Parser:
+    """Incremental row parser: feed() byte chunks, collect the complete rows."""
+
+    def __init__(self):
+        self.buf = b''
+
+    def feed(self, data: bytes) -> list:
+        self.buf += data
+        rows = []
+        while True:
+            row = self._next_row(final=False)
+            if row is None:
+                break
+            rows.append(row)
+        return rows
+
+    def close(self) -> list:
+        rows = []
+        while self.buf:
+            rows.append(self._next_row(final=True))
+        return rows
+
+    def _next_row(self, final: bool):
+        buf = self.buf
+        if not buf:
+            return None
+        if buf[:1] in (b'\n', b'\r'):
+            # Blank line (the export ends with one); kept as-is.
+            end = 2 if buf[:2] == b'\r\n' else 1
+            if end == 1 and buf[:1] == b'\r' and len(buf) == 1 and not final:
+                return None
+            self.buf = buf[end:]
+            return Row('', '', b'', buf[:end], buf[:end])
+        m = HEAD_RE.match(buf)
+        if m is None or m.end() == len(buf):
+            if not final and PARTIAL_HEAD_RE.fullmatch(buf):
+                return None  # the head continues in the next chunk
+            if m is None:
+                raise FlightError(f"malformed row at {buf[:40]!r}")
+        id, tag = m.group(1).decode('ascii'), m.group(2).decode('ascii')
+        if tag == 'T':
+            comma = buf.find(b',', m.end())
+            if comma < 0:
+                if final:
+                    raise FlightError(f"unterminated text row {id}")
+                return None
+            try:
+                size = int(buf[m.end():comma], 16)
+            except ValueError:
+                raise FlightError(f"bad text length in row {id}")
+            stop = comma + 1 + size
+            if stop > len(buf):
+                if final:
+                    raise FlightError(f"text row {id} is truncated")
+                return None
+            self.buf = buf[stop:]
+            return Row(id, tag, buf[comma + 1:stop], b'', buf[:stop])
+        nl = buf.find(b'\n', m.end())
+        if nl < 0:
+            if not final:
+                return None
+            stop = body_end = len(buf)
+        else:
+            stop = nl + 1
+            body_end = nl - 1 if buf[nl - 1:nl] == b'\r' else nl
+        self.buf = buf[stop:]
+        return Row(id, tag, buf[m.end():body_end], buf[body_end:stop], buf[:stop])
+
+
+def iter_rows(chunks):
+    """Yield rows from an iterable of byte chunks."""
+    parser = Parser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+def is_payload(text: str) -> bool:
+    return PAYLOAD_RE.match(text[:64]) is not None
+
+
+def map_strings(value, edit):
+    """Return value with edit applied to every string leaf (not keys or references).
+
+    Strings starting with "$" are references ("$L1", "$undefined", "$2") and
+    are left alone, except "$$...", which is an escaped literal. In element
+    tuples ["$", type, key, props] only the props are visited.
+    """
+    if isinstance(value, str):
+        if value.startswith('$'):
+            if value.startswith('$$'):
+                return '$' + edit(value[1:])
+            return value
+        return edit(value)
+    if isinstance(value, list):
+        if len(value) == 4 and value[0] == '$' and isinstance(value[1], str):
+            return value[:3] + [map_strings(value[3], edit)]
+        return [map_strings(v, edit) for v in value]
+    if isinstance(value, dict):
+        return {k: map_strings(v, edit) for k, v in value.items()}
+    return value
+
+
+def edit_row(row: Row, edit, probe=None) -> bool:
+    """Apply a str -> str edit to the string leaves of one row.
+
+    probe, if given, is a cheap test on the raw row text that is true whenever
+    edit could change a leaf contained in it; rows it rejects are not decoded.
+    """
+    if row.is_blank:
+        return False
+    if row.is_text:
+        new = edit(row.value)
+        if new != row.value:
+            row.value = new
+            return True
+        return False
+    if probe is not None:
+        raw = row.body.decode('utf-8')
+        # A leaf without escapes appears verbatim in the row text.
+        if '\\' not in raw and not probe(raw):
+            return False
+    value = row.value
+    new = map_strings(value, edit)
+    if new != value:
+        row.value = new
+        return True
+    return False
+
+
+def rewrite(chunks, edit=None, chunk_edit=None, probe=None):
+    """Stream a payload, yielding output bytes; only edited rows are re-serialized."""
+    for row in iter_rows(chunks):
+        if edit is not None:
+            edit_row(row, edit, probe)
+        if chunk_edit is not None:
+            row.map_chunks(chunk_edit)
+        yield row.serialize()
+
+
+def rewrite_text(text: str, edit=None, chunk_edit=None, probe=None) -> str:
+    """rewrite() over a whole payload held as text."""
+    return b''.join(rewrite([text.encode('utf-8')], edit, chunk_edit, probe)).decode('utf-8')
+
+
+def read_chunks(path: Path, size: int = CHUNK_SIZE):
+    with open(path, 'rb') as f:
+        yield from iter(lambda: f.read(size), b'')
+
+
+def rewrite_file(path: Path, edit=None, chunk_edit=None, probe=None, dry_run: bool = False) -> bool:
+    """Rewrite one payload file in a single streaming pass; returns True if it changed."""
+    tmp = path.with_name(path.name + '.tmp')
+    changed = False
+    try:
+        with open(tmp, 'wb') as dst:
+            for row in iter_rows(read_chunks(path)):
+                if edit is not None:
+                    edit_row(row, edit, probe)
+                if chunk_edit is not None:
+                    row.map_chunks(chunk_edit)
+                data = row.serialize()
+                changed |= data != row.raw
+                dst.write(data)
+    except Exception:
+        tmp.unlink(missing_ok=True)
+        raise
+    if changed and not dry_run:
+        tmp.replace(path)
+    else:
+        tmp.unlink()
+    return changed
+
+
+def payload_files(root: Path = ROOT):
+    for path in iter_files(root):
+        if path.name != 'index.txt':
+            continue
+        with open(path, encoding='utf-8', errors='replace') as f:
+            if is_payload(f.read(64)):
+                yield path
+
+
+def check(root: Path = ROOT) -> int:
+    """Parse every payload and re-serialize every row; report any that differ."""
+    bad = 0
+    for path in payload_files(root):
+        data = path.read_bytes()
+        try:
+            rows = list(iter_rows([data]))
+            for row in rows:
+                if not row.is_blank:
+                    row.value = row.value
+            out = b''.join(row.serialize() for row in rows)
+        except (FlightError, ValueError) as e:
+            print(f"ERROR {rel_path(path, root)} ({e})")
+            bad += 1
+            continue
+        if out != data:
+            print(f"DIFF {rel_path(path, root)}")
+            bad += 1
+        else:
+            print(f"OK {rel_path(path, root)} ({len(rows)} rows)")
+    return bad
+
+
+def dump(path: Path):
+    for row in iter_rows(read_chunks(path)):
+        if row.is_blank:
+            continue
+        line = f"{row.id:>4}:{row.tag or '-':<2} {len(row.body):>7} B"
+        if row.chunks:
+            line += '  ' + ' '.join(row.chunks)
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--root', type=Path, default=ROOT, help='tree to scan (default: repository root)')
+    parser.add_argument('--check', action='store_true', help='verify every payload re-serializes byte for byte')
+    parser.add_argument('--dump', type=Path, metavar='PAYLOAD', help='list the rows of one payload')
+    args = parser.parse_args(argv)
+
+    if args.dump:
+        dump(args.dump)
+        return 0
+    if args.check:
+        return 1 if check(args.root.resolve()) else 0
+    parser.print_help()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
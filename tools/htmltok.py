@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""Incremental HTML tokenizer shared by the index.html formatters.
+
+Input is fed in chunks and tokens are yielded as soon as they are complete,
+so memory stays bounded by the chunk size (plus the longest single tag) and
+a page is processed in one linear pass. script/style bodies are passed
+through as 'raw' tokens without being lowercased or re-scanned.
+
+Token kinds:
+    text        character data outside tags
+    tag         <...> start/end tags, doctype and other declarations
+    comment     <!-- ... -->
+    open_raw    the <script ...> / <style ...> start tag
+    raw         script/style body (may arrive in several pieces)
+    close_raw   the matching </script> / </style>
+
+For tag-like tokens, name is the lowercased tag name ('/div' for end tags).
+
+With coarse=True only script/style elements are split out and everything in
+between comes back as large 'text' tokens. That is all the '><' formatters
+need, and it lets the C regex engine do the scanning.
+"""
+import re
+from collections import namedtuple
+
+Token = namedtuple('Token', 'kind data name')
+
+RAW_TEXT_ELEMENTS = ('script', 'style')
+RAW_KINDS = ('open_raw', 'raw', 'close_raw')
+CHUNK_SIZE = 1 << 16
+
+_TAG_NAME = re.compile(r'</?([A-Za-z][^\s/>]*)')
+_OPEN_RAW = re.compile(r'<(' + '|'.join(RAW_TEXT_ELEMENTS) + r')\b', re.IGNORECASE)
+_CLOSE_RAW = {name: re.compile(r'</' + name + r'\s*>', re.IGNORECASE) for name in RAW_TEXT_ELEMENTS}
+
+
+class Tokenizer:
+    def __init__(self, coarse: bool = False):
+        self.coarse = coarse
+        self.buf = ''
+        self.pos = 0
+        self.raw_tag = None
+        # Where to resume searching for a terminator when a token is split across chunks.
+        self.search_from = 0
+
+    def feed(self, chunk: str):
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.search_from = max(self.search_from - self.pos, 0)
+            self.pos = 0
+        self.buf += chunk
+        yield from self._drain(final=False)
+
+    def close(self):
+        yield from self._drain(final=True)
+        self.buf = ''
+        self.pos = 0
+
+    def _drain(self, final: bool):
+        buf = self.buf
+        n = len(buf)
+        while self.pos < n:
+            pos = self.pos
+            if self.raw_tag is not None:
+                m = _CLOSE_RAW[self.raw_tag].search(buf, max(pos, self.search_from))
+                if m is None:
+                    # Hold back from the last '<' in case it starts the closing tag.
+                    cut = n if final else buf.rfind('<', pos)
+                    if cut == -1:
+                        cut = n
+                    if cut > pos:
+                        yield Token('raw', buf[pos:cut], self.raw_tag)
+                        self.pos = cut
+                    self.search_from = self.pos
+                    if not final:
+                        return
+                    self.raw_tag = None
+                    continue
+                if m.start() > pos:
+                    yield Token('raw', buf[pos:m.start()], self.raw_tag)
+                yield Token('close_raw', m.group(0), '/' + self.raw_tag)
+                self.raw_tag = None
+                self.pos = self.search_from = m.end()
+                continue
+
+            if self.coarse:
+                m = _OPEN_RAW.search(buf, max(pos, self.search_from))
+                end = buf.find('>', m.end()) if m else -1
+                if m is None or end == -1:
+                    # Hold back from the last '<' in case a start tag is split across chunks.
+                    cut = n if final else buf.rfind('<', pos)
+                    if cut == -1:
+                        cut = n
+                    if cut > pos:
+                        yield Token('text', buf[pos:cut], None)
+                        self.pos = cut
+                    self.search_from = self.pos
+                    if not final:
+                        return
+                    continue
+                if m.start() > pos:
+                    yield Token('text', buf[pos:m.start()], None)
+                data = buf[m.start():end + 1]
+                name = m.group(1).lower()
+                self.pos = self.search_from = end + 1
+                if data.endswith('/>'):
+                    yield Token('tag', data, name)
+                else:
+                    self.raw_tag = name
+                    yield Token('open_raw', data, name)
+                continue
+
+            if buf[pos] != '<':
+                j = buf.find('<', pos)
+                if j == -1:
+                    j = n
+                yield Token('text', buf[pos:j], None)
+                self.pos = j
+                continue
+
+            if n - pos < 4 and not final:
+                return
+            if buf.startswith('<!--', pos):
+                end = buf.find('-->', max(pos + 4, self.search_from))
+                if end == -1:
+                    if not final:
+                        self.search_from = max(n - 2, pos + 4)
+                        return
+                    end = n - 3
+                yield Token('comment', buf[pos:end + 3], '!--')
+                self.pos = self.search_from = end + 3
+                continue
+
+            nxt = buf[pos + 1] if pos + 1 < n else ''
+            if not (nxt.isalpha() or nxt in '/!?'):
+                # A bare '<' in character data.
+                yield Token('text', '<', None)
+                self.pos = pos + 1
+                continue
+
+            end = buf.find('>', max(pos + 1, self.search_from))
+            if end == -1:
+                if not final:
+                    self.search_from = n
+                    return
+                yield Token('text', buf[pos:], None)
+                self.pos = n
+                continue
+            data = buf[pos:end + 1]
+            m = _TAG_NAME.match(data)
+            name = m.group(0)[1:].lower() if m else data[1:2]
+            self.pos = self.search_from = end + 1
+            if name in RAW_TEXT_ELEMENTS and not data.endswith('/>'):
+                self.raw_tag = name
+                yield Token('open_raw', data, name)
+            else:
+                yield Token('tag', data, name)
+
+
+def tokenize(chunks, coarse: bool = False):
+    """Yield tokens for an iterable of text chunks (a str is treated as a single chunk)."""
+    if isinstance(chunks, str):
+        chunks = (chunks,)
+    tok = Tokenizer(coarse)
+    for chunk in chunks:
+        yield from tok.feed(chunk)
+    yield from tok.close()
+
+
+def iter_chunks(f, size: int = CHUNK_SIZE):
+    return iter(lambda: f.read(size), '')
+
+
+def normalize_newlines(pieces):
+    """Streaming equivalent of ''.join(pieces).replace('\\r\\n', '\\n')."""
+    pending = ''
+    for piece in pieces:
+        piece = pending + piece
+        pending = ''
+        if piece.endswith('\r'):
+            piece, pending = piece[:-1], '\r'
+        if piece:
+            yield piece.replace('\r\n', '\n')
+    if pending:
+        yield pending
+
+
+def split_doctype(chunks):
+    """Pull a leading <!DOCTYPE ...> line off a chunk stream.
+
+    Returns (prefix, remaining_chunks) where prefix is the stripped doctype
+    line plus '\\n' (or '' if the document has none), mirroring the
+    lstrip()/partition('\\n') handling the formatters have always used.
+    """
+    if isinstance(chunks, str):
+        chunks = (chunks,)
+    chunks = iter(chunks)
+    head = ''
+    for chunk in chunks:
+        head += chunk
+        stripped = head.lstrip()
+        # Stop once the first line is complete or it clearly is not a doctype.
+        if '\n' in stripped or (len(stripped) >= 9 and stripped[:9].lower() != '<!doctype'):
+            break
+    stripped = head.lstrip()
+    if not stripped.lower().startswith('<!doctype'):
+        return '', _prepend(head, chunks)
+    first_line, sep, rest = stripped.partition('\n')
+    if not sep:
+        # Doctype line runs to the end of the document.
+        for chunk in chunks:
+            first_line += chunk
+        return first_line.strip() + '\n', iter(())
+    return first_line.strip() + '\n', _prepend(rest, chunks)
+
+
+def _prepend(first, chunks):
+    if first:
+        yield first
+    yield from chunks
+
+
+def break_between_tags(tokens):
+    """Yield output with '><' turned into '>\\n<' everywhere outside script/style blocks.
+
+    Newlines are never inserted at the edges of a script/style element, which
+    matches the placeholder and span based formatters this replaces.
+    """
+    prev_gt = False
+    for tok in tokens:
+        if tok.kind in RAW_KINDS:
+            prev_gt = False
+            yield tok.data
+            continue
+        s = tok.data.replace('><', '>\n<')
+        if not s:
+            continue
+        if prev_gt and s[0] == '<':
+            s = '\n' + s
+        prev_gt = s[-1] == '>'
+        yield s
+
+
+def prettify_chunks(chunks):
+    """Doctype-preserving '><' line breaking over a chunk stream, CRLF normalized."""
+    prefix, body = split_doctype(chunks)
+    if prefix:
+        yield prefix
+    yield from normalize_newlines(break_between_tags(tokenize(body, coarse=True)))
+
+
+# --- attribute helpers for single start tags --------------------------------
+
+_ATTR = re.compile(r'''([^\s"'<>/=]+)(?:\s*=\s*("[^"]*"|'[^']*'|[^\s"'>]+))?''')
+_TAG_END = re.compile(r'\s*/?>$')
+
+
+def _attr_spans(tag: str):
+    m = _TAG_NAME.match(tag)
+    pos = m.end() if m else 1
+    end = _TAG_END.search(tag)
+    stop = end.start() if end else len(tag)
+    for am in _ATTR.finditer(tag, pos, stop):
+        value = am.group(2)
+        if value is not None and value[:1] in '"\'':
+            value = value[1:-1]
+        yield am.group(1).lower(), value, am.start(), am.end()
+
+
+def tag_attrs(tag: str) -> dict:
+    """Attributes of a start tag as {lowercased name: raw value (None if bare)}; first one wins."""
+    attrs = {}
+    for name, value, _, _ in _attr_spans(tag):
+        attrs.setdefault(name, value)
+    return attrs
+
+
+def set_attr(tag: str, name: str, value) -> str:
+    """Return tag with attribute name set to value (None for a bare attribute), added if missing."""
+    text = name if value is None else f'{name}="{value}"'
+    for attr, _, start, end in _attr_spans(tag):
+        if attr == name.lower():
+            return tag[:start] + text + tag[end:]
+    end = _TAG_END.search(tag)
+    at = end.start() if end else len(tag)
+    return tag[:at] + ' ' + text + tag[at:]
+
+
+def remove_attr(tag: str, name: str) -> str:
+    for attr, _, start, end in _attr_spans(tag):
+        if attr == name.lower():
+            while start > 0 and tag[start - 1].isspace():
+                start -= 1
+            return tag[:start] + tag[end:]
+    return tag
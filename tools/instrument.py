@@ -0,0 +1,539 @@
+#!/usr/bin/env python3
+"""Shared timing, byte and regex-match instrumentation for the tools.
+
+A Recorder collects:
+- phases: named wall-clock buckets (walk, read, decode, stage:<name>, write, ...)
+  with call counts;
+- files: per-file bytes in/out and seconds per phase;
+- patterns: per compiled regex, calls, matches and seconds spent in the
+  regex engine. Module-level patterns of the tools (e.g.
+  clean_next_runtime.PAT_INLINE_NEXT) are swapped for counting proxies, only
+  while instrumentation is on. Worker processes forked by parallel_map
+  inherit the proxies; their counts travel back with each result.
+
+Outputs, all optional:
+    --report FILE    machine-readable JSON of the above
+    --flame FILE     collapsed stacks ("tool;stage:logo;about/index.html 1234",
+                     weights in microseconds), the format `py-spy record
+                     --format raw` writes; open in speedscope or flamegraph.pl
+    --profile FILE   cProfile stats of the whole run (python -m pstats FILE,
+                     snakeviz, ...)
+
+pipeline.py records natively. Any other tool can be run under the generic
+hooks, which time the tree walk (os.walk / Path.rglob), pathlib reads and
+writes and treeio's probed reads (scan_file / read_text_if: read, then
+decode) per file. The hooks are in place before the tool's script runs (as
+__main__, so tools that work at module level are covered too) and are
+removed afterwards. Per-file work that the tool would fan out with
+parallel_map runs in-process, so every file's numbers reach the report:
+
+    python tools/instrument.py --report clean.json clean_next_runtime.py
+    python tools/instrument.py --report links.json check_links.py
+    python tools/pipeline.py --report pipeline.json --flame pipeline.folded
+"""
+import argparse
+import cProfile
+import json
+import os
+import re
+import runpy
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import treeio
+from treeio import ROOT
+
+TOOLS_DIR = Path(__file__).resolve().parent
+REPORT_VERSION = 1
+
+# name -> [calls, matches, seconds]; per process, see drain_pattern_stats().
+_pattern_stats = {}
+
+
+class CountingPattern:
+    """Stands in for a compiled pattern, counting calls, matches and time."""
+
+    def __init__(self, name: str, pattern):
+        self._name = name
+        self._pattern = pattern
+        self._stats = _pattern_stats.setdefault(name, [0, 0, 0.0])
+
+    def __getattr__(self, attr):
+        return getattr(self._pattern, attr)
+
+    def __repr__(self):
+        return f"CountingPattern({self._name}, {self._pattern!r})"
+
+    def _record(self, matches: int, seconds: float):
+        stats = self._stats
+        stats[0] += 1
+        stats[1] += matches
+        stats[2] += seconds
+
+    def _call(self, method, *args, **kwargs):
+        t0 = time.perf_counter()
+        m = getattr(self._pattern, method)(*args, **kwargs)
+        self._record(m is not None, time.perf_counter() - t0)
+        return m
+
+    def search(self, *args, **kwargs):
+        return self._call('search', *args, **kwargs)
+
+    def match(self, *args, **kwargs):
+        return self._call('match', *args, **kwargs)
+
+    def fullmatch(self, *args, **kwargs):
+        return self._call('fullmatch', *args, **kwargs)
+
+    def subn(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        result = self._pattern.subn(*args, **kwargs)
+        self._record(result[1], time.perf_counter() - t0)
+        return result
+
+    def sub(self, *args, **kwargs):
+        return self.subn(*args, **kwargs)[0]
+
+    def findall(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        result = self._pattern.findall(*args, **kwargs)
+        self._record(len(result), time.perf_counter() - t0)
+        return result
+
+    def split(self, *args, **kwargs):
+        t0 = time.perf_counter()
+        result = self._pattern.split(*args, **kwargs)
+        self._record(len(result) - 1, time.perf_counter() - t0)
+        return result
+
+    def finditer(self, *args, **kwargs):
+        # Only time spent producing matches is counted, not the caller's loop body.
+        it = self._pattern.finditer(*args, **kwargs)
+        matches = 0
+        seconds = 0.0
+        try:
+            while True:
+                t0 = time.perf_counter()
+                try:
+                    m = next(it)
+                except StopIteration:
+                    seconds += time.perf_counter() - t0
+                    return
+                seconds += time.perf_counter() - t0
+                matches += 1
+                yield m
+        finally:
+            self._record(matches, seconds)
+
+
+def count(name: str, pattern):
+    """Wrap one pattern (e.g. a stage probe) in a CountingPattern."""
+    if pattern is None or isinstance(pattern, CountingPattern):
+        return pattern
+    return CountingPattern(name, pattern)
+
+
+def instrument_patterns(modules=None, undo: list = None) -> int:
+    """Swap the module-level compiled patterns of the tools for counting proxies.
+
+    Covers Pattern globals and Patterns held in module-level dicts. Returns
+    how many were wrapped; with undo, (container, key, pattern) is appended
+    for each so the swap can be reverted.
+    """
+    if modules is None:
+        modules = [m for m in list(sys.modules.values())
+                   if getattr(m, '__file__', None) and Path(m.__file__).resolve().parent == TOOLS_DIR]
+    wrapped = 0
+    for mod in modules:
+        namespace = vars(mod)
+        for attr, value in list(namespace.items()):
+            if isinstance(value, re.Pattern):
+                namespace[attr] = CountingPattern(f"{mod.__name__}.{attr}", value)
+                if undo is not None:
+                    undo.append((namespace, attr, value))
+                wrapped += 1
+            elif isinstance(value, dict) and value and all(isinstance(v, re.Pattern) for v in value.values()):
+                for key, pattern in value.items():
+                    value[key] = CountingPattern(f"{mod.__name__}.{attr}[{key!r}]", pattern)
+                    if undo is not None:
+                        undo.append((value, key, pattern))
+                    wrapped += 1
+    return wrapped
+
+
+_COMPREHENSIONS = ('<listcomp>', '<dictcomp>', '<setcomp>', '<genexpr>')
+
+
+def _name_proxy(namespace: dict, proxy: CountingPattern, module: str, undo: list):
+    """Rename proxy after the global (or module-level dict entry) holding it and queue its unwrapping."""
+    for attr, value in namespace.items():
+        if value is proxy:
+            container, key, name = namespace, attr, f"{module}.{attr}"
+            break
+        if isinstance(value, dict) and any(v is proxy for v in value.values()):
+            key = next(k for k, v in value.items() if v is proxy)
+            container, name = value, f"{module}.{attr}[{key!r}]"
+            break
+    else:
+        return
+    stats = _pattern_stats.pop(proxy._name)
+    if name in _pattern_stats:
+        # The same pattern compiled twice, e.g. the tool also imported under its own name.
+        for i, value in enumerate(stats):
+            _pattern_stats[name][i] += value
+    else:
+        _pattern_stats[name] = stats
+    proxy._name = name
+    undo.append((container, key, proxy._pattern))
+
+
+@contextmanager
+def counted_patterns(main_name: str):
+    """Count the tools' module-level patterns while the block runs, then swap them back.
+
+    Tools already loaded are handled by instrument_patterns(). Patterns that
+    module-level code of a tool compiles inside the block (the tool's script
+    running as __main__ and the tools it imports) are wrapped as they are
+    created, and named after the global holding them once the block is done.
+    """
+    undo = []
+    instrument_patterns(undo=undo)
+    compile_ = re.compile
+    created = []
+
+    def hook_compile(pattern, flags=0):
+        compiled = compile_(pattern, flags)
+        frame = sys._getframe(1)
+        if frame.f_code.co_name in _COMPREHENSIONS:
+            frame = frame.f_back
+        if frame.f_code.co_name != '<module>' or Path(frame.f_code.co_filename).resolve().parent != TOOLS_DIR:
+            return compiled
+        module = frame.f_globals.get('__name__')
+        module = main_name if module == '__main__' else module
+        name = f"{module}:{frame.f_lineno}"
+        if name in _pattern_stats:
+            name += f"#{len(created)}"
+        proxy = CountingPattern(name, compiled)
+        created.append((frame.f_globals, proxy, module))
+        return proxy
+
+    re.compile = hook_compile
+    try:
+        yield
+    finally:
+        re.compile = compile_
+        for namespace, proxy, module in created:
+            _name_proxy(namespace, proxy, module, undo)
+        for container, key, pattern in reversed(undo):
+            container[key] = pattern
+
+
+def drain_pattern_stats() -> dict:
+    """This process's pattern counts since the last call, then reset them."""
+    stats = {name: list(s) for name, s in _pattern_stats.items() if s[0]}
+    for s in _pattern_stats.values():
+        s[:] = [0, 0, 0.0]
+    return stats
+
+
+class Recorder:
+    def __init__(self, tool: str):
+        self.tool = tool
+        self.started = time.time()
+        self.t0 = time.perf_counter()
+        self.phases = {}     # phase -> [calls, seconds]
+        self.files = {}      # rel -> {'bytes_in', 'bytes_out', 'status', 'seconds': {phase: s}}
+        self.patterns = {}   # name -> [calls, matches, seconds]
+        self.meta = {}
+
+    def add(self, phase: str, seconds: float, rel: str = None, calls: int = 1):
+        entry = self.phases.setdefault(phase, [0, 0.0])
+        entry[0] += calls
+        entry[1] += seconds
+        if rel is not None:
+            times = self.file(rel)['seconds']
+            times[phase] = times.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name: str, rel: str = None):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t0, rel)
+
+    def file(self, rel: str) -> dict:
+        entry = self.files.get(rel)
+        if entry is None:
+            entry = self.files[rel] = {'bytes_in': 0, 'bytes_out': 0, 'status': '', 'seconds': {}}
+        return entry
+
+    def merge_patterns(self, stats: dict):
+        for name, (calls, matches, seconds) in stats.items():
+            entry = self.patterns.setdefault(name, [0, 0, 0.0])
+            entry[0] += calls
+            entry[1] += matches
+            entry[2] += seconds
+
+    def report(self) -> dict:
+        self.merge_patterns(drain_pattern_stats())
+        return {
+            'version': REPORT_VERSION,
+            'tool': self.tool,
+            'started': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self.started)),
+            'wall_seconds': round(time.perf_counter() - self.t0, 6),
+            'meta': self.meta,
+            'totals': {
+                'files': len(self.files),
+                'bytes_in': sum(f['bytes_in'] for f in self.files.values()),
+                'bytes_out': sum(f['bytes_out'] for f in self.files.values()),
+            },
+            'phases': {name: {'calls': c, 'seconds': round(s, 6)}
+                       for name, (c, s) in sorted(self.phases.items(), key=lambda kv: -kv[1][1])},
+            'patterns': {name: {'calls': c, 'matches': m, 'seconds': round(s, 6)}
+                         for name, (c, m, s) in sorted(self.patterns.items(), key=lambda kv: -kv[1][2])},
+            'files': {rel: dict(f, seconds={k: round(v, 6) for k, v in f['seconds'].items()})
+                      for rel, f in sorted(self.files.items())},
+        }
+
+    def folded(self) -> list:
+        """Collapsed-stack lines; per-file time where known, the rest per phase."""
+        lines = []
+        per_file = {}
+        for rel, f in self.files.items():
+            for phase, seconds in f['seconds'].items():
+                per_file[phase] = per_file.get(phase, 0.0) + seconds
+                if seconds > 0:
+                    lines.append(f"{self.tool};{phase};{rel} {max(1, round(seconds * 1e6))}")
+        for phase, (_, seconds) in self.phases.items():
+            rest = seconds - per_file.get(phase, 0.0)
+            if rest > 1e-6:
+                lines.append(f"{self.tool};{phase} {round(rest * 1e6)}")
+        for name, (_, _, seconds) in self.patterns.items():
+            if seconds > 1e-6:
+                lines.append(f"{self.tool};regex;{name} {round(seconds * 1e6)}")
+        return sorted(lines)
+
+    def print_summary(self, top: int = 5):
+        report = self.report()
+        print(f"Instrumentation ({report['wall_seconds'] * 1000:.1f} ms wall):")
+        for name, p in list(report['phases'].items())[:top * 2]:
+            print(f"  {name:<24} calls={p['calls']:<6} {p['seconds'] * 1000:9.1f} ms")
+        if report['patterns']:
+            print('  Slowest patterns:')
+            for name, p in list(report['patterns'].items())[:top]:
+                print(f"  {name:<48} calls={p['calls']:<6} matches={p['matches']:<6} {p['seconds'] * 1000:8.1f} ms")
+
+
+def add_instrument_arguments(parser):
+    parser.add_argument('--report', type=Path, metavar='FILE', help='write timings, bytes and regex counts as JSON')
+    parser.add_argument('--flame', type=Path, metavar='FILE', help='write collapsed stacks (py-spy raw format)')
+    parser.add_argument('--profile', type=Path, metavar='FILE', help='write cProfile stats of the run')
+
+
+def start(args, tool: str):
+    """A Recorder if any instrumentation output was requested (patterns wrapped), else None."""
+    if not (args.report or args.flame or args.profile):
+        return None
+    instrument_patterns()
+    return Recorder(tool)
+
+
+def finish(recorder, args):
+    if recorder is None:
+        return
+    recorder.print_summary()
+    if args.report:
+        args.report.write_text(json.dumps(recorder.report(), indent=1) + '\n', encoding='utf-8')
+        print(f"Report written to {args.report}")
+    if args.flame:
+        args.flame.write_text('\n'.join(recorder.folded()) + '\n', encoding='utf-8')
+        print(f"Collapsed stacks written to {args.flame}")
+
+
+@contextmanager
+def profiled(path: Path = None):
+    """Run the block under cProfile and dump its stats to path (no-op without one)."""
+    if path is None:
+        yield
+        return
+    prof = cProfile.Profile()
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        prof.dump_stats(str(path))
+        print(f"cProfile stats written to {path}")
+
+
+# --- generic hooks for tools without native recording -----------------------
+
+def _rel(path, root: Path) -> str:
+    try:
+        return Path(path).resolve().relative_to(root).as_posix()
+    except ValueError:
+        return str(path)
+
+
+def _timed_iter(recorder: Recorder, phase: str, it):
+    while True:
+        t0 = time.perf_counter()
+        try:
+            item = next(it)
+        except StopIteration:
+            recorder.add(phase, time.perf_counter() - t0, calls=0)
+            return
+        recorder.add(phase, time.perf_counter() - t0, calls=0)
+        yield item
+
+
+def install_io_hooks(recorder: Recorder, root: Path = ROOT):
+    """Time tree walks, pathlib reads/writes and treeio rewrites, attributing bytes to files.
+
+    Must run before the tool module is imported, since tools bind treeio's
+    rewrite helpers by name. Returns a function that removes the hooks.
+    """
+    saved_treeio = {name: getattr(treeio, name) for name in
+                    ('rewrite_text_file', 'rewrite_text_file_streaming', '_search', 'read_text_if', 'parallel_map')}
+    saved_path = {name: getattr(Path, name) for name in
+                  ('read_bytes', 'read_text', 'write_bytes', 'write_text', 'rglob')}
+    read_bytes, read_text = Path.read_bytes, Path.read_text
+    write_bytes, write_text = Path.write_bytes, Path.write_text
+    rglob, walk = Path.rglob, os.walk
+    search = treeio._search
+
+    def hook_read(func, phase):
+        def wrapper(self, *args, **kwargs):
+            t0 = time.perf_counter()
+            data = func(self, *args, **kwargs)
+            rel = _rel(self, root)
+            recorder.add(phase, time.perf_counter() - t0, rel)
+            recorder.file(rel)['bytes_in'] += len(data)
+            return data
+        return wrapper
+
+    def hook_write(func, phase):
+        def wrapper(self, data, *args, **kwargs):
+            t0 = time.perf_counter()
+            result = func(self, data, *args, **kwargs)
+            rel = _rel(self, root)
+            if rel.startswith('backups/'):
+                # Blobs written to the snapshot store, not files of the tree.
+                recorder.add('backup', time.perf_counter() - t0)
+                return result
+            recorder.add(phase, time.perf_counter() - t0, rel)
+            recorder.file(rel)['bytes_out'] += len(data)
+            return result
+        return wrapper
+
+    def hook_rglob(self, pattern):
+        recorder.add('walk', 0.0)
+        return _timed_iter(recorder, 'walk', rglob(self, pattern))
+
+    def hook_walk(top, *args, **kwargs):
+        recorder.add('walk', 0.0)
+        return _timed_iter(recorder, 'walk', walk(top, *args, **kwargs))
+
+    def hook_search(path, probe, keep):
+        # Probed reads open the file themselves (plain read or mmap).
+        t0 = time.perf_counter()
+        matched, data = search(path, probe, keep)
+        rel = _rel(path, root)
+        recorder.add('read', time.perf_counter() - t0, rel)
+        recorder.file(rel)['bytes_in'] += len(data) if data is not None else os.stat(path).st_size
+        return matched, data
+
+    def hook_read_text_if(path, probe):
+        matched, data = treeio._search(path, probe, keep=True)
+        if not matched:
+            return None
+        t0 = time.perf_counter()
+        try:
+            return data.decode('utf-8')
+        except UnicodeDecodeError:
+            return None
+        finally:
+            recorder.add('decode', time.perf_counter() - t0, _rel(path, root))
+
+    def hook_parallel_map(func, items, jobs=1, chunksize=1):
+        return map(func, items)
+
+    def hook_rewrite(func):
+        # treeio's whole-file rewriters open files themselves; time them per file.
+        def wrapper(transform, path, *args, **kwargs):
+            rel = _rel(path, root)
+            entry = recorder.file(rel)
+            size = path.stat().st_size
+            t0 = time.perf_counter()
+            result = func(transform, path, *args, **kwargs)
+            recorder.add('rewrite', time.perf_counter() - t0, rel)
+            entry['bytes_in'] += size
+            entry['bytes_out'] += path.stat().st_size
+            entry['status'] = result[1].split(' ', 1)[0]
+            return result
+        return wrapper
+
+    treeio.rewrite_text_file = hook_rewrite(treeio.rewrite_text_file)
+    treeio.rewrite_text_file_streaming = hook_rewrite(treeio.rewrite_text_file_streaming)
+    treeio._search = hook_search
+    treeio.read_text_if = hook_read_text_if
+    treeio.parallel_map = hook_parallel_map
+    Path.read_bytes = hook_read(read_bytes, 'read')
+    Path.read_text = hook_read(read_text, 'read')
+    Path.write_bytes = hook_write(write_bytes, 'write')
+    Path.write_text = hook_write(write_text, 'write')
+    Path.rglob = hook_rglob
+    os.walk = hook_walk
+
+    def uninstall():
+        for name, func in saved_treeio.items():
+            setattr(treeio, name, func)
+        for name, func in saved_path.items():
+            setattr(Path, name, func)
+        os.walk = walk
+    return uninstall
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run one of the tools with instrumentation.')
+    add_instrument_arguments(parser)
+    parser.add_argument('tool', help='script in tools/, e.g. clean_next_runtime.py')
+    parser.add_argument('tool_args', nargs=argparse.REMAINDER, help='arguments passed to the tool')
+    args = parser.parse_args(argv)
+
+    name = Path(args.tool).stem
+    script = TOOLS_DIR / f"{name}.py"
+    if not script.is_file():
+        parser.error(f"no such tool: {args.tool}")
+    if args.report is None and args.flame is None and args.profile is None:
+        args.report = Path(f"{name}-report.json")
+    recorder = Recorder(name)
+    recorder.meta['argv'] = args.tool_args
+
+    # Hooks first: the script runs as __main__, and some tools do their work at module level.
+    argv = sys.argv
+    sys.argv = [str(script)] + args.tool_args
+    status = 0
+    uninstall = install_io_hooks(recorder)
+    try:
+        with counted_patterns(name), profiled(args.profile), recorder.phase('total'):
+            try:
+                runpy.run_path(str(script), run_name='__main__')
+            except SystemExit as e:
+                status = e.code or 0
+    finally:
+        uninstall()
+        sys.argv = argv
+    if status and not recorder.files:
+        # Usually a usage error: the tool did no work, so there is nothing to report.
+        print(f"{name} exited with status {status}; no report written")
+        return status
+    finish(recorder, args)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
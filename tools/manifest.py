@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Persistent content-hash manifest for incremental runs of the tools.
+
+For every file a tool has processed the manifest records its size, mtime,
+SHA-256 and the versions of the transforms that produced it:
+
+    {"version": 1,
+     "files": {"carefuse/index.html": {"size": 1234, "mtime_ns": ..., "sha256": "...",
+                                       "transforms": {"next-runtime": 1, "pretty-blocks": 1}}}}
+
+A file is skipped when its size and mtime still match (no read at all) or,
+failing that, when its hash still matches, and every requested transform was
+already applied at the same version. Tools pass the hash of the bytes they
+already hold to record(), so recording a run reads nothing more. Bump a tool's TRANSFORM_VERSION whenever
+its output changes so the next incremental run re-processes everything.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from treeio import ROOT, rel_path
+
+MANIFEST_NAME = '.tools-manifest.json'
+FORMAT_VERSION = 1
+
+
+def sha256_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class Manifest:
+    def __init__(self, root: Path = ROOT, path: Path = None):
+        self.root = root
+        self.path = path or root / MANIFEST_NAME
+        self.files = {}
+        self.dirty = False
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding='utf-8'))
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable manifest {self.path} ({e})")
+            else:
+                if data.get('version') == FORMAT_VERSION:
+                    self.files = data.get('files', {})
+
+    def is_current(self, path: Path, transforms: dict) -> bool:
+        """True if path is unchanged since it was recorded with these transform versions."""
+        entry = self.files.get(rel_path(path, self.root))
+        if entry is None:
+            return False
+        applied = entry.get('transforms', {})
+        if any(applied.get(name) != version for name, version in transforms.items()):
+            return False
+        try:
+            st = path.stat()
+        except OSError:
+            return False
+        if st.st_size != entry['size']:
+            return False
+        if st.st_mtime_ns == entry['mtime_ns']:
+            return True
+        # Touched but maybe not edited: fall back to the content hash.
+        if sha256_bytes(path.read_bytes()) != entry['sha256']:
+            return False
+        entry['mtime_ns'] = st.st_mtime_ns
+        self.dirty = True
+        return True
+
+    def record(self, path: Path, transforms: dict, changed: bool = True, digest: str = None):
+        """Record path's current state as the output of transforms.
+
+        digest is the SHA-256 of the file's current bytes if the caller has
+        them. Without it, an unchanged file whose size and mtime still match
+        its entry (e.g. one a probe skipped unread) keeps the recorded hash;
+        anything else is read and hashed here. When the file was left
+        unchanged the previously recorded transforms still hold, so they are
+        kept alongside the new ones.
+        """
+        rel = rel_path(path, self.root)
+        st = path.stat()
+        old = self.files.get(rel)
+        if digest is None:
+            if not changed and old and (old['size'], old['mtime_ns']) == (st.st_size, st.st_mtime_ns):
+                digest = old['sha256']
+            else:
+                digest = sha256_bytes(path.read_bytes())
+        applied = {}
+        if not changed and old and old.get('sha256') == digest:
+            applied.update(old.get('transforms', {}))
+        applied.update(transforms)
+        self.files[rel] = {
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'sha256': digest,
+            'transforms': dict(sorted(applied.items())),
+        }
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        payload = {'version': FORMAT_VERSION, 'files': dict(sorted(self.files.items()))}
+        tmp = self.path.with_name(self.path.name + '.tmp')
+        tmp.write_text(json.dumps(payload, indent=1) + '\n', encoding='utf-8')
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+
+def add_incremental_arguments(parser):
+    parser.add_argument('--incremental', action='store_true',
+                        help=f'skip files unchanged since the last run (tracked in {MANIFEST_NAME})')
+    parser.add_argument('--manifest', type=Path, default=None,
+                        help=f'manifest location (default: <root>/{MANIFEST_NAME})')
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""Write a minified copy of the export to a deploy directory.
+
+The prettifiers keep the checked-in pages readable for review; this is the
+other direction, for what actually ships. Pages are tokenized with htmltok.py,
+so script/style bodies are never touched by the HTML rules:
+
+- whitespace between tags is dropped next to block-level elements (unless a
+  Tailwind inline* class makes them flow inline) and collapsed to one space
+  between inline ones, where it renders; runs inside text become one space;
+  <pre>, <textarea> and elements with a whitespace-pre* class are left alone;
+- comments are dropped, except conditional comments and React's <!--$-->,
+  <!--/$--> and <!-- --> hydration markers;
+- boolean attributes lose their value (async="" -> async) and whitespace
+  inside tags is collapsed;
+- with --inline, <style> bodies and style="" attributes are minified, JSON
+  scripts are re-serialized compactly and JS scripts lose indentation and
+  blank lines (rcssmin / rjsmin are used when installed).
+
+Every other site file is copied as-is; files that no longer exist in the
+tree are removed from the deploy directory, and unchanged outputs are not
+rewritten. The same transform is available as the pipeline stage 'minify'
+for in-place use.
+
+Usage:
+    python tools/minify_html.py                   # -> deploy/
+    python tools/minify_html.py --inline --out /tmp/site
+    python tools/minify_html.py --dry-run         # bytes saved per page
+"""
+import argparse
+import json
+import re
+import shutil
+import sys
+from pathlib import Path
+
+from htmltok import set_attr, tag_attrs, tokenize
+from treeio import DEPLOY_DIR, ROOT, is_artifact, is_site_file, iter_files, rel_path
+
+try:
+    import rcssmin
+except ImportError:  # optional dependency
+    rcssmin = None
+try:
+    import rjsmin
+except ImportError:  # optional dependency
+    rjsmin = None
+
+# Manifest key for --incremental; bump the version whenever the output changes.
+TRANSFORM_NAME = 'minify'
+TRANSFORM_VERSION = 1
+
+HTML_EXTS = ('.html', '.htm')
+SIDECAR_EXTS = ('.gz', '.br')
+
+# Whitespace next to these (start or end tag) never renders.
+BLOCK_ELEMENTS = frozenset('''
+    ! html head body title meta link base script style noscript template
+    address article aside blockquote dd details dialog div dl dt fieldset figcaption figure
+    footer form h1 h2 h3 h4 h5 h6 header hgroup hr li main nav ol p pre section summary
+    table caption colgroup col thead tbody tfoot tr td th ul option optgroup select
+'''.split())
+PRESERVE_ELEMENTS = ('pre', 'textarea')
+PRESERVE_CLASS = re.compile(r'(?:^|\s)whitespace-(?:pre|break-spaces)')
+# Tailwind display utilities that make a block-level element flow inline.
+INLINE_CLASS = re.compile(r'(?:^|[\s:])inline(?:-block|-flex|-grid|-table)?(?:\s|$)')
+VOID_ELEMENTS = frozenset('area base br col embed hr img input link meta source track wbr'.split())
+BOOLEAN_ATTRS = frozenset('''
+    allowfullscreen async autofocus autoplay checked controls default defer disabled
+    formnovalidate hidden inert ismap itemscope loop multiple muted nomodule novalidate
+    open playsinline readonly required reversed selected
+'''.split())
+JSON_TYPES = ('application/json', 'application/ld+json', 'importmap')
+JS_TYPES = ('', 'text/javascript', 'application/javascript', 'module')
+
+KEEP_COMMENT = re.compile(r'<!--(?:\[if|<!\[endif|\s*-->|/?\$[?!]?-->)')
+# HTML whitespace; \s would also eat U+00A0, which renders.
+WS = re.compile(r'[ \t\n\r\f]+')
+TAG_WS = re.compile(r'''("[^"]*"|'[^']*')|[ \t\n\r\f]+''')
+TAG_TAIL = re.compile(r'''(?<=["'])[ \t\n\r\f]*(/?>)$|[ \t\n\r\f]+(>)$''')
+CSS_TOKEN = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|(/\*(?!!).*?\*/)|[ \t\n\r\f]+''', re.S)
+CSS_PUNCT = re.compile(r' ?([{};,>]) ?')
+
+
+# --- inline style / script -------------------------------------------------
+
+def minify_css(css: str) -> str:
+    if rcssmin is not None:
+        return rcssmin.cssmin(css)
+
+    def repl(m):
+        if m.group(1):
+            return m.group(1)
+        return '' if m.group(2) else ' '
+
+    # Strings survive as-is; the punctuation pass then only sees code.
+    parts = re.split(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''', WS.sub(' ', CSS_TOKEN.sub(repl, css)))
+    out = []
+    for i, part in enumerate(parts):
+        out.append(part if i % 2 else CSS_PUNCT.sub(r'\1', part).replace(': ', ':').replace(';}', '}'))
+    return ''.join(out).strip()
+
+
+def minify_js(js: str) -> str:
+    if rjsmin is not None:
+        return rjsmin.jsmin(js)
+    if '`' in js:
+        # Template literals may span lines; their whitespace is content.
+        return js.strip()
+    return '\n'.join(line.strip() for line in js.splitlines() if line.strip())
+
+
+def minify_script(open_tag: str, body: str) -> str:
+    kind = (tag_attrs(open_tag).get('type') or '').strip().lower()
+    if kind in JSON_TYPES:
+        try:
+            value = json.loads(body)
+        except ValueError:
+            return body
+        # Keep "</script" impossible inside the element.
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+    if kind in JS_TYPES:
+        return minify_js(body)
+    return body
+
+
+# --- tags -----------------------------------------------------------------
+
+def minify_tag(tag: str, inline: bool = False) -> str:
+    if tag.startswith(('</', '<!')):
+        return WS.sub(' ', tag) if tag.startswith('<!') else WS.sub('', tag)
+    tag = TAG_WS.sub(lambda m: m.group(1) or ' ', tag)
+    tag = TAG_TAIL.sub(lambda m: m.group(1) or m.group(2), tag)
+    if '=' not in tag:
+        return tag
+    attrs = tag_attrs(tag)
+    for name, value in attrs.items():
+        if name in BOOLEAN_ATTRS and value is not None and value.lower() in ('', name):
+            tag = set_attr(tag, name, None)
+    if inline and attrs.get('style') and '"' not in attrs['style']:
+        tag = set_attr(tag, 'style', minify_css(attrs['style']).rstrip(';'))
+    return tag
+
+
+class _Display:
+    """Tracks whether each tag starts/ends a block box, for whitespace decisions.
+
+    Block-level elements styled inline (Tailwind inline, inline-block,
+    inline-flex, ...) keep the whitespace around them, so the class of each
+    open block element is remembered until its end tag.
+    """
+
+    def __init__(self):
+        self.open = {}   # element name -> stack of "is block" flags
+
+    def is_block(self, name: str, tag: str) -> bool:
+        if name.startswith('/'):
+            stack = self.open.get(name[1:])
+            if stack:
+                return stack.pop()
+            return name[1:] in BLOCK_ELEMENTS
+        block = name in BLOCK_ELEMENTS and not ('inline' in tag and INLINE_CLASS.search(tag_attrs(tag).get('class') or ''))
+        if name not in VOID_ELEMENTS and not tag.endswith('/>') and not name.startswith(('!', '?')):
+            self.open.setdefault(name, []).append(block)
+        return block
+
+
+def _preserves(name: str, tag: str, preserve: list) -> bool:
+    if name in VOID_ELEMENTS or tag.endswith('/>') or name.startswith(('!', '?')):
+        return False
+    return ((preserve and name == preserve[-1]) or name in PRESERVE_ELEMENTS
+            or ('whitespace-' in tag and PRESERVE_CLASS.search(tag_attrs(tag).get('class') or '') is not None))
+
+
+# --- pages ----------------------------------------------------------------
+
+def minify_tokens(tokens, inline: bool = False):
+    """Yield minified output for an htmltok token stream."""
+    text = []          # character data since the last tag; dropped comments do not split it
+    prev_block = True  # whether the last tag emitted was a block boundary (true at the start)
+    preserve = []      # open elements whose whitespace is content (<pre> etc.), innermost last
+    raw = None         # (open tag, body pieces) of the current script/style
+    display = _Display()
+
+    def flush(next_block: bool):
+        data = ''.join(text)
+        text.clear()
+        if not data:
+            return ''
+        if preserve:
+            return data
+        if not WS.sub('', data):
+            return '' if prev_block or next_block else ' '
+        data = WS.sub(' ', data)
+        if prev_block:
+            data = data.lstrip(' ')
+        if next_block:
+            data = data.rstrip(' ')
+        return data
+
+    for tok in tokens:
+        kind = tok.kind
+        if kind == 'text':
+            text.append(tok.data)
+            continue
+        if kind == 'comment':
+            if KEEP_COMMENT.match(tok.data) or preserve:
+                yield flush(False) + tok.data
+                prev_block = False
+            continue
+        if kind == 'raw':
+            raw[1].append(tok.data)
+            continue
+        if kind == 'close_raw':
+            open_tag, body = raw[0], ''.join(raw[1])
+            if inline:
+                body = minify_css(body) if tok.name == '/style' else minify_script(open_tag, body)
+            raw = None
+            yield body + tok.data
+            prev_block = display.is_block(tok.name, tok.data)
+            continue
+        block = display.is_block(tok.name, tok.data)
+        yield flush(block)
+        prev_block = block
+        if kind == 'open_raw':
+            raw = (tok.data, [])
+        elif tok.name.startswith('/'):
+            if preserve and tok.name[1:] == preserve[-1]:
+                preserve.pop()
+        elif _preserves(tok.name, tok.data, preserve):
+            preserve.append(tok.name)
+        yield minify_tag(tok.data, inline)
+    if raw is not None:
+        # Unterminated script/style: pass it through.
+        yield raw[0] + ''.join(raw[1])
+    yield flush(True)
+
+
+def minify_text(text: str, inline: bool = False) -> str:
+    return ''.join(minify_tokens(tokenize(text), inline))
+
+
+def minify_inline(text: str) -> str:
+    return minify_text(text, inline=True)
+
+
+# --- deploy directory -------------------------------------------------------
+
+def site_files(root: Path):
+    for path in iter_files(root):
+        rel = rel_path(path, root)
+        if is_site_file(rel) and not is_artifact(rel) and not rel.endswith(SIDECAR_EXTS):
+            yield rel, path
+
+
+def copy_if_changed(src: Path, dst: Path) -> bool:
+    try:
+        sst, dst_st = src.stat(), dst.stat()
+        if sst.st_size == dst_st.st_size and sst.st_mtime_ns <= dst_st.st_mtime_ns:
+            return False
+    except OSError:
+        pass
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy2(src, dst)
+    return True
+
+
+def write_if_different(dst: Path, data: bytes) -> bool:
+    try:
+        if dst.read_bytes() == data:
+            return False
+    except OSError:
+        pass
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    dst.write_bytes(data)
+    return True
+
+
+def build(root: Path, out: Path, inline: bool = False, dry_run: bool = False) -> dict:
+    totals = {'pages': 0, 'before': 0, 'after': 0, 'written': 0, 'copied': 0, 'removed': 0}
+    seen = set()
+    for rel, path in site_files(root):
+        seen.add(rel)
+        dst = out / rel
+        if not rel.lower().endswith(HTML_EXTS):
+            if not dry_run and copy_if_changed(path, dst):
+                totals['copied'] += 1
+            continue
+        raw = path.read_bytes()
+        try:
+            data = minify_text(raw.decode('utf-8'), inline).encode('utf-8')
+        except UnicodeDecodeError as e:
+            print(f"SKIP {rel} (read error: {e})")
+            data = raw
+        saved = len(raw) - len(data)
+        print(f"MINIFIED {rel} ({len(raw)} -> {len(data)} B, -{saved / max(len(raw), 1) * 100:.1f}%)")
+        totals['pages'] += 1
+        totals['before'] += len(raw)
+        totals['after'] += len(data)
+        if not dry_run and write_if_different(dst, data):
+            totals['written'] += 1
+
+    if not dry_run and out.exists():
+        for path in iter_files(out):
+            rel = rel_path(path, out)
+            base = rel[:-3] if rel.endswith(SIDECAR_EXTS) else rel
+            if base not in seen:
+                path.unlink()
+                totals['removed'] += 1
+                print(f"REMOVED {rel}")
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--root', type=Path, default=ROOT, help='tree to read (default: repository root)')
+    parser.add_argument('--out', type=Path, default=None, help=f'deploy directory (default: <root>/{DEPLOY_DIR})')
+    parser.add_argument('--inline', action='store_true', help='also minify inline <style>/<script> and style=""')
+    parser.add_argument('--dry-run', action='store_true', help='report bytes saved without writing')
+    args = parser.parse_args(argv)
+
+    root = args.root.resolve()
+    out = (args.out or root / DEPLOY_DIR).resolve()
+    if out == root:
+        parser.error('--out must not be the tree itself (use pipeline.py --stages minify for in-place)')
+    totals = build(root, out, args.inline, args.dry_run)
+
+    saved = totals['before'] - totals['after']
+    print('\nSummary:')
+    print(f"Pages: {totals['pages']}, {totals['before'] / 1024:.1f} KiB -> {totals['after'] / 1024:.1f} KiB "
+          f"(saved {saved / 1024:.1f} KiB, {saved / max(totals['before'], 1) * 100:.1f}%)")
+    if not args.dry_run:
+        print(f"Deploy directory {out}: {totals['written']} page(s) written, {totals['copied']} file(s) copied, "
+              f"{totals['removed']} removed")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
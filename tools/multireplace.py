@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""Multi-pattern literal replacement with an Aho-Corasick automaton.
+
+All (old, new) pairs of a rule set are compiled into one automaton and the
+text is scanned once, left to right. At each position the leftmost match wins
+and, among matches starting there, the longest one, so overlapping pairs such
+as '~0.87' and '0.87 AUC' no longer depend on list order. Per-pattern hit
+counts are returned with the result. RSC flight payloads (route index.txt)
+are edited per string leaf through flight.py, so text rows keep valid lengths.
+
+Rule sets live in tools/replace_rules.json:
+
+    {"auc": {"description": "...", "version": 1,
+             "files": ["carefuse/index.html", ...],          # explicit targets, or
+             "exts": [".html"], "exclude_dirs": ["carefuse"], # a tree-wide filter
+             "replacements": [["old", "new"], ...]}}
+
+Usage:
+    python tools/multireplace.py auc ece-role
+    python tools/multireplace.py --dry-run logo
+    python tools/multireplace.py --list
+"""
+import argparse
+import json
+import re
+import sys
+from collections import Counter
+from pathlib import Path
+
+import flight
+from treeio import ROOT, byte_probe, iter_files, read_text_if, rel_path
+
+RULES_PATH = Path(__file__).resolve().parent / 'replace_rules.json'
+
+# Length of the pattern prefixes used to skip text that cannot start a match.
+PREFIX_LEN = 4
+
+
+class MultiReplacer:
+    def __init__(self, pairs):
+        self.patterns = []
+        self.replacements = []
+        seen = {}
+        for old, new in pairs:
+            if not old:
+                raise ValueError('empty pattern in replacement list')
+            if old in seen:
+                if seen[old] != new:
+                    raise ValueError(f'conflicting replacements for {old!r}')
+                continue
+            seen[old] = new
+            self.patterns.append(old)
+            self.replacements.append(new)
+        self._build()
+
+    def _build(self):
+        # goto[state] maps a character to the next state; out[state] holds the
+        # pattern indices ending at state (own match plus those reached via fail links).
+        goto = [{}]
+        depth = [0]
+        out = [[]]
+        for idx, pat in enumerate(self.patterns):
+            state = 0
+            for ch in pat:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    depth.append(depth[state] + 1)
+                    out.append([])
+                state = nxt
+            out[state].append(idx)
+
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] = out[nxt] + out[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._depth = depth
+        self._out = out
+        # While idle, jump straight to the next place where some pattern's
+        # first few characters occur; the C regex engine does the skipping.
+        prefixes = sorted({p[:PREFIX_LEN] for p in self.patterns}, key=len, reverse=True)
+        self._starts = re.compile('|'.join(re.escape(p) for p in prefixes))
+
+    def replace(self, text: str):
+        """Return (new_text, Counter of pattern -> hits)."""
+        goto, fail, depth, out = self._goto, self._fail, self._depth, self._out
+        patterns = self.patterns
+        hits = Counter()
+        parts = []
+        last = 0
+        n = len(text)
+        i = 0
+        state = 0
+        best = None  # (start, end, pattern index) of the leftmost-longest candidate
+
+        while True:
+            if state == 0 and best is None:
+                m = self._starts.search(text, i)
+                if m is None:
+                    break
+                i = m.start()
+            if i >= n:
+                if best is None:
+                    break
+            else:
+                ch = text[i]
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(ch, 0)
+                for idx in out[state]:
+                    start = i + 1 - len(patterns[idx])
+                    if best is None or start < best[0] or (start == best[0] and i + 1 > best[1]):
+                        best = (start, i + 1, idx)
+                i += 1
+            if best is not None and (i >= n or i - depth[state] > best[0]):
+                # No partial match still in progress can start at or before the
+                # candidate, so it is final.
+                start, end, idx = best
+                parts.append(text[last:start])
+                parts.append(self.replacements[idx])
+                hits[patterns[idx]] += 1
+                last = i = end
+                state = 0
+                best = None
+
+        if not hits:
+            return text, hits
+        parts.append(text[last:])
+        return ''.join(parts), hits
+
+    def sub(self, text: str) -> str:
+        return self.replace(text)[0]
+
+    def may_match(self, text: str) -> bool:
+        """Cheap necessary condition for replace() to change text."""
+        return self._starts.search(text) is not None
+
+
+class RuleSet:
+    def __init__(self, name: str, spec: dict):
+        self.name = name
+        self.description = spec.get('description', '')
+        self.version = spec.get('version', 1)
+        self.files = list(spec.get('files', []))
+        self.exts = tuple(e.lower() for e in spec.get('exts', []))
+        self.exclude_dirs = {d.lower() for d in spec.get('exclude_dirs', [])}
+        self.pairs = [tuple(pair) for pair in spec['replacements']]
+        self.replacer = MultiReplacer(self.pairs)
+        self._probe = None
+
+    @property
+    def probe(self):
+        """Bytes pattern matching wherever a replacement could apply (see treeio.read_text_if)."""
+        if self._probe is None:
+            needles = []
+            for old in self.replacer.patterns:
+                needles.append(old.encode('utf-8'))
+                # Inside a flight payload string the pattern may be JSON-escaped.
+                needles.append(json.dumps(old, ensure_ascii=False)[1:-1].encode('utf-8'))
+            self._probe = byte_probe(needles)
+        return self._probe
+
+    def applies(self, rel: str) -> bool:
+        if self.files:
+            return rel in self.files
+        parts = rel.lower().split('/')
+        if set(parts[:-1]) & self.exclude_dirs:
+            return False
+        return not self.exts or parts[-1].endswith(self.exts)
+
+    def targets(self, root: Path = ROOT):
+        if self.files:
+            return [root / f for f in self.files]
+        return [p for p in iter_files(root) if self.applies(rel_path(p, root))]
+
+    def replace(self, text: str):
+        """Like MultiReplacer.replace, but payload-aware (see flight.py)."""
+        if not flight.is_payload(text):
+            return self.replacer.replace(text)
+        hits = Counter()
+
+        def edit(leaf: str) -> str:
+            new, leaf_hits = self.replacer.replace(leaf)
+            hits.update(leaf_hits)
+            return new
+
+        return flight.rewrite_text(text, edit, probe=self.replacer.may_match), hits
+
+    def sub(self, text: str) -> str:
+        if flight.is_payload(text):
+            return flight.rewrite_text(text, self.replacer.sub, probe=self.replacer.may_match)
+        return self.replacer.sub(text)
+
+
+def load_rule_sets(path: Path = RULES_PATH) -> dict:
+    data = json.loads(path.read_text(encoding='utf-8'))
+    return {name: RuleSet(name, spec) for name, spec in data.items()}
+
+
+def load_rule_set(name: str, path: Path = RULES_PATH) -> RuleSet:
+    return load_rule_sets(path)[name]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('names', nargs='*', help='rule sets to apply (default: all)')
+    parser.add_argument('--rules', type=Path, default=RULES_PATH, help='rule set file')
+    parser.add_argument('--root', type=Path, default=ROOT, help='tree to process (default: repository root)')
+    parser.add_argument('--dry-run', action='store_true', help='report hits without writing')
+    parser.add_argument('--list', action='store_true', help='list rule sets and exit')
+    args = parser.parse_args(argv)
+
+    rule_sets = load_rule_sets(args.rules)
+    if args.list:
+        for rs in rule_sets.values():
+            print(f"{rs.name:<18} {len(rs.pairs):>3} pairs  {rs.description}")
+        return 0
+    unknown = [n for n in args.names if n not in rule_sets]
+    if unknown:
+        parser.error(f"unknown rule set(s): {', '.join(unknown)} (see --list)")
+
+    root = args.root.resolve()
+    changed = []
+    for rs in (rule_sets[n] for n in args.names or rule_sets):
+        totals = Counter()
+        for path in rs.targets(root):
+            if not path.exists():
+                print(f"Missing: {path}")
+                continue
+            # Files without any pattern in their bytes (or not UTF-8) are not decoded.
+            text = read_text_if(path, rs.probe)
+            if text is None:
+                continue
+            new_text, hits = rs.replace(text)
+            totals.update(hits)
+            if new_text != text:
+                if not args.dry_run:
+                    path.write_bytes(new_text.encode('utf-8'))
+                changed.append(str(path))
+                print(f"{'WOULD UPDATE' if args.dry_run else 'UPDATED'} {rel_path(path, root)} ({sum(hits.values())} hits)")
+        print(f"\n[{rs.name}] hits per pattern:")
+        for old, _ in rs.pairs:
+            print(f"  {totals[old]:>5}  {old!r}")
+
+    print('\nSummary:')
+    print(f"Files changed: {len(changed)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""Generate resized, recompressed image variants at their rendered sizes and point the pages at them.
+
+What it does:
+- Scans every .html page for <img>, <link rel="preload" as="image"> and
+  <link rel="icon"> references into images/.
+- Works out the rendered width from the width attribute or a Tailwind w-N/h-N
+  class (e.g. the 32x32 nav logo). Images with a w-full class or a sizes
+  attribute, and images without any width, are treated as fluid.
+- Writes variants to images/_opt/ named <stem>-<source hash>-<width>w.<ext>,
+  in the original format (recompressed) and in WebP: 1x and 2x for
+  fixed-size images, a width ladder for fluid ones.
+- Rewrites each <img> to the original-format variants (src/srcset/sizes) and
+  wraps it in a <picture> whose <source type="image/webp"> lists the WebP
+  ones, so browsers without WebP never pick a candidate they cannot decode.
+  Image preloads get the WebP candidates with type="image/webp" (browsers
+  without WebP skip them). The same paths are rewritten in the route's
+  index.txt RSC payload.
+
+Variants are keyed by the source's content hash, so reruns only encode images
+that changed. images/_opt/manifest.json remembers source hashes and which
+variant came from which original, so pages that already point at variants are
+re-targeted when the original is replaced.
+
+Requires Pillow (pip install Pillow).
+
+Usage:
+    python tools/optimize_images.py --dry-run
+    python tools/optimize_images.py
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+from htmltok import remove_attr, set_attr, tag_attrs, tokenize
+import flight
+from manifest import sha256_bytes
+from treeio import ROOT, is_artifact, is_site_file, iter_files, rel_path
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # optional dependency, checked in main()
+    Image = ImageOps = None
+
+IMAGES_URL = '/images/'
+OPT_DIRNAME = '_opt'
+SOURCE_EXTS = {'.png': 'PNG', '.jpg': 'JPEG', '.jpeg': 'JPEG'}
+FLUID_WIDTHS = (480, 768, 1024, 1536)
+MAX_FLUID_WIDTH = 2048
+ICON_WIDTH = 32
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+DEFAULT_SIZES = '100vw'
+
+# Tailwind spacing scale: w-8 / h-8 is 2rem = 32px.
+TAILWIND_SIZE = re.compile(r'(?:^|\s)([wh])-(\d+(?:\.5)?)(?=\s|$)')
+FLUID_CLASS = re.compile(r'(?:^|\s)w-full(?=\s|$)')
+WEBP_TYPE = 'image/webp'
+
+
+class Reference:
+    """One image use on one page."""
+
+    def __init__(self, kind: str, url: str, source: Path, width=None, height_px=None, fluid=False, sizes=None):
+        self.kind = kind  # 'img', 'preload' or 'icon'
+        self.url = url
+        self.source = source
+        self.width = width
+        self.height_px = height_px
+        self.fluid = fluid
+        self.sizes = sizes
+
+
+class VariantStore:
+    def __init__(self, root: Path):
+        self.root = root
+        self.out_dir = root / 'images' / OPT_DIRNAME
+        self.manifest_path = self.out_dir / 'manifest.json'
+        self.sources = {}
+        self.variants = {}
+        if self.manifest_path.exists():
+            data = json.loads(self.manifest_path.read_text(encoding='utf-8'))
+            self.sources = data.get('sources', {})
+            self.variants = data.get('variants', {})
+        self.encoded = 0
+        self.reused = 0
+
+    def original_url(self, url: str) -> str:
+        return self.variants.get(url, url)
+
+    def source_hash(self, path: Path) -> str:
+        rel = rel_path(path, self.root)
+        st = path.stat()
+        entry = self.sources.get(rel)
+        if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+            return entry['sha256']
+        digest = sha256_bytes(path.read_bytes())
+        self.sources[rel] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest}
+        return digest
+
+    def variant(self, source: Path, width: int, fmt: str, dry_run: bool) -> str:
+        """URL of source resized to width in fmt, encoding it unless already cached.
+
+        Falls back to the original URL when the encoded variant turned out no
+        smaller than the source file (already well-compressed images).
+        """
+        ext = '.webp' if fmt == 'WEBP' else source.suffix.lower()
+        source_url = '/' + rel_path(source, self.root)
+        digest = self.source_hash(source)
+        entry = self.sources[rel_path(source, self.root)]
+        name = f"{source.stem}-{digest[:10]}-{width}w{ext}"
+        if name in entry.get('no_gain', ()):
+            self.reused += 1
+            return source_url
+        dest = self.out_dir / name
+        url = IMAGES_URL + OPT_DIRNAME + '/' + name
+        if dest.exists():
+            self.reused += 1
+            self.variants[url] = source_url
+            return url
+        self.encoded += 1
+        if dry_run:
+            return url
+        encode(source, dest, width, fmt)
+        if dest.stat().st_size >= source.stat().st_size:
+            dest.unlink()
+            entry.setdefault('no_gain', []).append(name)
+            return source_url
+        self.variants[url] = source_url
+        return url
+
+    def save(self):
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        data = {'sources': dict(sorted(self.sources.items())), 'variants': dict(sorted(self.variants.items()))}
+        self.manifest_path.write_text(json.dumps(data, indent=1) + '\n', encoding='utf-8')
+
+
+def encode(source: Path, dest: Path, width: int, fmt: str):
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(dest.name + '.tmp')
+    with Image.open(source) as im:
+        im = ImageOps.exif_transpose(im)
+        if im.width > width:
+            im = im.resize((width, max(1, round(im.height * width / im.width))), Image.LANCZOS)
+        if fmt == 'JPEG':
+            im.convert('RGB').save(tmp, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+        elif fmt == 'PNG':
+            im.save(tmp, 'PNG', optimize=True)
+        else:
+            im.save(tmp, 'WEBP', quality=WEBP_QUALITY, method=6)
+    os.replace(tmp, dest)
+
+
+def intrinsic_size(path: Path):
+    with Image.open(path) as im:
+        return im.size
+
+
+def rendered_size(attrs: dict):
+    """(width_px, height_px) from width/height attributes or Tailwind classes; None where unknown."""
+    width = height = None
+    for key in ('width', 'height'):
+        value = attrs.get(key) or ''
+        if value.isdigit():
+            if key == 'width':
+                width = int(value)
+            else:
+                height = int(value)
+    for axis, units in TAILWIND_SIZE.findall(attrs.get('class') or ''):
+        px = round(float(units) * 4)
+        if axis == 'w' and width is None:
+            width = px
+        elif axis == 'h' and height is None:
+            height = px
+    return width, height
+
+
+def resolve(url: str, page: Path, root: Path):
+    """Local file for an image URL on page, or None if it is not a source image under images/."""
+    if not url or url.startswith(('http:', 'https:', 'data:', '//')):
+        return None
+    path_part = url.split('?', 1)[0].split('#', 1)[0]
+    target = (root / path_part.lstrip('/')) if path_part.startswith('/') else (page.parent / path_part)
+    target = Path(os.path.normpath(target))
+    try:
+        rel = rel_path(target, root)
+    except ValueError:
+        return None
+    if not rel.startswith('images/') or rel.startswith(f'images/{OPT_DIRNAME}/'):
+        return None
+    if target.suffix.lower() not in SOURCE_EXTS or not target.is_file():
+        return None
+    return target
+
+
+def image_reference(tok, page: Path, root: Path, store: VariantStore):
+    if tok.kind != 'tag' or tok.name not in ('img', 'link'):
+        return None
+    attrs = tag_attrs(tok.data)
+    if tok.name == 'img':
+        kind, url = 'img', attrs.get('src') or ''
+    else:
+        rel = (attrs.get('rel') or '').lower().split()
+        if 'preload' in rel and (attrs.get('as') or '').lower() == 'image':
+            kind = 'preload'
+        elif 'icon' in rel:
+            kind = 'icon'
+        else:
+            return None
+        url = attrs.get('href') or ''
+    source = resolve(store.original_url(url), page, root)
+    if source is None:
+        return None
+    width, height = rendered_size(attrs)
+    if kind == 'icon':
+        width = width or ICON_WIDTH
+    sizes = attrs.get('sizes') if kind == 'img' else attrs.get('imagesizes')
+    # A width attribute on a w-full image is its intrinsic size, not the rendered one.
+    fluid = kind != 'icon' and (bool(sizes) or FLUID_CLASS.search(attrs.get('class') or '') is not None)
+    return Reference(kind, url, source, width, height, fluid, sizes)
+
+
+def plan_widths(ref: Reference, intrinsic):
+    iw, ih = intrinsic
+    width = None if ref.fluid else ref.width
+    if width is None and not ref.fluid and ref.height_px and ih:
+        width = round(ref.height_px * iw / ih)
+    if width is not None:
+        if ref.kind == 'icon':
+            return [min(width, iw)], False
+        return sorted({min(width, iw), min(2 * width, iw)}), False
+    widths = [w for w in FLUID_WIDTHS if w < iw]
+    widths.append(min(iw, MAX_FLUID_WIDTH))
+    return sorted(set(widths)), True
+
+
+class RenderPlan:
+    """Attribute values for one reference: original-format and WebP candidates."""
+
+    def __init__(self, fallback, srcset, webp_fallback, webp_srcset, sizes, widths):
+        self.fallback = fallback
+        self.srcset = srcset
+        self.webp_fallback = webp_fallback
+        self.webp_srcset = webp_srcset
+        self.sizes = sizes
+        self.widths = widths
+
+
+def candidates(store: VariantStore, ref: Reference, widths, fluid: bool, fmt: str, iw: int, dry_run: bool):
+    """srcset for widths in fmt; a width whose variant gave no gain uses the source once."""
+    seen = {}
+    for w in widths:
+        url = store.variant(ref.source, w, fmt, dry_run)
+        if url not in seen:
+            width = iw if url == '/' + rel_path(ref.source, store.root) else w
+            seen[url] = f"{width}w" if fluid else f"{w / widths[0]:g}x"
+    return ', '.join(f"{url} {descriptor}" for url, descriptor in seen.items())
+
+
+def render_plan(ref: Reference, store: VariantStore, args) -> RenderPlan:
+    iw, ih = intrinsic_size(ref.source)
+    widths, fluid = plan_widths(ref, (iw, ih))
+    fallback_width = widths[-1] if fluid else widths[0]
+    fmt = SOURCE_EXTS[ref.source.suffix.lower()]
+    fallback = store.variant(ref.source, fallback_width, fmt, args.dry_run)
+    if ref.kind == 'icon':
+        return RenderPlan(fallback, '', None, '', None, widths)
+    srcset = candidates(store, ref, widths, fluid, fmt, iw, args.dry_run) if len(widths) > 1 else ''
+    webp_fallback = webp_srcset = None
+    if not args.no_webp:
+        webp_fallback = store.variant(ref.source, fallback_width, 'WEBP', args.dry_run)
+        webp_srcset = candidates(store, ref, widths, fluid, 'WEBP', iw, args.dry_run)
+    sizes = (ref.sizes or args.sizes) if fluid else None
+    return RenderPlan(fallback, srcset, webp_fallback, webp_srcset, sizes, widths)
+
+
+def set_or_remove(tag: str, name: str, value) -> str:
+    return set_attr(tag, name, value) if value else remove_attr(tag, name)
+
+
+def webp_source(plan: RenderPlan, tag: str = '<source />') -> str:
+    tag = set_attr(tag, 'type', WEBP_TYPE)
+    tag = set_attr(tag, 'srcset', plan.webp_srcset)
+    return set_or_remove(tag, 'sizes', plan.sizes)
+
+
+def rewrite_page(page: Path, root: Path, store: VariantStore, args, report) -> dict:
+    """Rewrite image tags on one page; returns {old url: new src} for the RSC payload."""
+    # Bytes in, bytes out: CRLF pages keep their line endings.
+    text = page.read_bytes().decode('utf-8')
+    tokens = list(tokenize(text))
+    refs = [image_reference(tok, page, root, store) for tok in tokens]
+
+    # A preload must request exactly what the matching <img> will use, so it
+    # borrows the plan of the first <img> on the page showing the same source.
+    first_img = {}
+    for ref in refs:
+        if ref is not None and ref.kind == 'img':
+            first_img.setdefault(ref.source, ref)
+
+    plans = {}
+    out = []
+    url_map = {}
+    # One entry per open <picture>: the out index of its WebP <source>, if any.
+    pictures = []
+    for tok, ref in zip(tokens, refs):
+        if tok.kind == 'tag' and tok.name == 'picture' and not tok.data.endswith('/>'):
+            pictures.append(None)
+        elif tok.kind == 'tag' and tok.name == '/picture' and pictures:
+            pictures.pop()
+        elif (tok.kind == 'tag' and tok.name == 'source' and pictures
+              and (tag_attrs(tok.data).get('type') or '').lower() == WEBP_TYPE):
+            pictures[-1] = len(out)
+        if ref is None:
+            out.append(tok.data)
+            continue
+        target = first_img.get(ref.source, ref) if ref.kind == 'preload' else ref
+        if id(target) not in plans:
+            plans[id(target)] = render_plan(target, store, args)
+        plan = plans[id(target)]
+        tag = tok.data
+        if ref.kind == 'icon':
+            out.append(set_attr(tag, 'href', plan.fallback))
+        elif ref.kind == 'preload':
+            # Only browsers that can decode WebP act on a type="image/webp" preload.
+            webp = plan.webp_srcset is not None
+            tag = set_attr(tag, 'href', plan.webp_fallback if webp else plan.fallback)
+            tag = set_or_remove(tag, 'imagesrcset', plan.webp_srcset if webp else plan.srcset)
+            tag = set_or_remove(tag, 'imagesizes', plan.sizes)
+            out.append(set_or_remove(tag, 'type', WEBP_TYPE if webp else None))
+        else:
+            tag = set_attr(tag, 'src', plan.fallback)
+            tag = set_or_remove(tag, 'srcset', plan.srcset)
+            tag = set_or_remove(tag, 'sizes', plan.sizes)
+            if plan.webp_srcset is None:
+                out.append(tag)
+            elif not pictures:
+                out.append('<picture>' + webp_source(plan) + tag + '</picture>')
+            elif pictures[-1] is not None:
+                out[pictures[-1]] = webp_source(plan, out[pictures[-1]])
+                out.append(tag)
+            else:
+                out.append(webp_source(plan) + tag)
+        if ref.kind == 'img' or ref.url not in url_map:
+            url_map[ref.url] = plan.fallback
+            url_map[store.original_url(ref.url)] = plan.fallback
+        report.setdefault(rel_path(ref.source, root), set()).update(plan.widths)
+
+    new_text = ''.join(out)
+    if new_text != text:
+        if not args.dry_run:
+            page.write_bytes(new_text.encode('utf-8'))
+        print(f"{'WOULD UPDATE' if args.dry_run else 'UPDATED'} {rel_path(page, root)}")
+    return url_map
+
+
+def rewrite_payload(payload: Path, url_map: dict, root: Path, dry_run: bool):
+    """Point string leaves in the route's index.txt at the same variants as its HTML."""
+    url_map = {old: new for old, new in url_map.items() if old != new}
+    if not url_map or not payload.exists():
+        return
+    with open(payload, encoding='utf-8', errors='replace') as f:
+        if not flight.is_payload(f.read(64)):
+            return
+    if flight.rewrite_file(payload, lambda s: url_map.get(s, s), dry_run=dry_run):
+        print(f"{'WOULD UPDATE' if dry_run else 'UPDATED'} {rel_path(payload, root)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--root', type=Path, default=ROOT, help='tree to process (default: repository root)')
+    parser.add_argument('--dry-run', action='store_true', help='plan variants and rewrites without writing anything')
+    parser.add_argument('--no-webp', action='store_true', help='only emit recompressed originals, no WebP srcset')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f'sizes attribute for fluid images (default: {DEFAULT_SIZES})')
+    args = parser.parse_args(argv)
+
+    if Image is None:
+        print('Pillow is required: pip install Pillow')
+        return 1
+
+    root = args.root.resolve()
+    store = VariantStore(root)
+    report = {}
+    for page in iter_files(root):
+        rel = rel_path(page, root)
+        if page.suffix.lower() != '.html' or not is_site_file(rel) or is_artifact(rel):
+            continue
+        url_map = rewrite_page(page, root, store, args, report)
+        if page.name == 'index.html':
+            rewrite_payload(page.with_name('index.txt'), url_map, root, args.dry_run)
+
+    if not args.dry_run:
+        store.save()
+
+    print('\nSummary:')
+    for rel, widths in sorted(report.items()):
+        size = (root / rel).stat().st_size
+        print(f"  {rel:<45} {size / 1024:8.1f} KiB -> widths {', '.join(str(w) for w in sorted(widths))}")
+    print(f"Variants encoded: {store.encoded}{' (planned)' if args.dry_run else ''}, reused from cache: {store.reused}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
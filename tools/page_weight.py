@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""Measure what each route costs a first-time visitor and check it against budgets.
+
+For every page the analyzer follows what a browser fetches before the page
+is complete:
+- the HTML document itself;
+- stylesheets (<link rel="stylesheet">, preloads as="style") and, through
+  them, every url() they reference (fonts, background images, @import);
+- scripts (<script src>, preload / modulepreload as="script");
+- images that load eagerly: <img> without loading="lazy", <link
+  rel="preload" as="image">, icons, video posters and url()s in inline
+  styles. Where there is a srcset (on the image, on the first <source> of
+  its <picture>, or imagesrcset on a preload), the candidate a browser would
+  pick at REFERENCE_VIEWPORT CSS pixels and a device pixel ratio of 1 is
+  counted, not src.
+
+Lazy images are listed as deferred and not counted. An asset used twice on
+a page is fetched once. External URLs (Google Fonts) count as requests of
+unknown size; references that resolve to nothing are reported as missing
+(and still count as a request).
+
+Every asset is measured raw and compressed: text types the way the host
+sends them (gzip -9, plus Brotli with `pip install brotli`), images and
+fonts as they are. Budgets live in tools/page_budgets.json ("default" plus
+per-route overrides) and cover requests, raw and transfer size, and transfer
+size per type (html, css, script, image, font). Any route over budget makes
+the exit status 1; --json and --html write a report that ranks each route's
+assets by transfer size.
+
+Usage:
+    python tools/page_weight.py
+    python tools/page_weight.py --route /projects/ --html weight.html
+    python tools/page_weight.py --budgets my-budgets.json --json weight.json
+"""
+import argparse
+import gzip
+import html
+import json
+import posixpath
+import re
+import sys
+from pathlib import Path
+
+from check_links import Resolver, css_refs, scan, site_host
+from htmltok import tag_attrs, tokenize
+from precompress import is_compressible
+from treeio import ROOT, is_artifact, is_site_file
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+BUDGETS_PATH = Path(__file__).resolve().parent / 'page_budgets.json'
+KINDS = ('html', 'css', 'script', 'image', 'font', 'other')
+KIND_EXTS = {
+    'html': ('.html', '.htm'),
+    'css': ('.css',),
+    'script': ('.js', '.mjs'),
+    'image': ('.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif', '.svg', '.ico'),
+    'font': ('.woff', '.woff2', '.ttf', '.otf', '.eot'),
+}
+PRELOAD_KINDS = {'style': 'css', 'script': 'script', 'image': 'image', 'font': 'font'}
+ICON_RELS = {'icon', 'apple-touch-icon', 'mask-icon'}
+TOP_ASSETS = 5
+# The visitor srcset candidates are chosen for: a desktop viewport at 1x.
+REFERENCE_VIEWPORT = 1280
+# <source type>s that browser decodes; others are passed over.
+SOURCE_TYPES = {'', 'image/webp', 'image/avif', 'image/png', 'image/jpeg', 'image/gif', 'image/svg+xml'}
+SIZES_MEDIA = re.compile(r'^\(\s*(min|max)-width\s*:\s*(\d+(?:\.\d+)?)px\s*\)\s*(.+)$')
+SIZES_LENGTH = re.compile(r'^(\d+(?:\.\d+)?)(px|vw)$')
+
+
+def kind_of(rel: str, hint: str = None) -> str:
+    ext = posixpath.splitext(rel)[1].lower()
+    for kind, exts in KIND_EXTS.items():
+        if ext in exts:
+            return kind
+    return hint or 'other'
+
+
+# --- measuring ---------------------------------------------------------------
+
+class Sizes:
+    """Raw and compressed size of each file, computed once however many routes use it."""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.cache = {}
+
+    def __call__(self, rel: str) -> dict:
+        entry = self.cache.get(rel)
+        if entry is None:
+            data = (self.root / rel).read_bytes()
+            entry = {'raw': len(data), 'gzip': len(data), 'br': None}
+            if is_compressible(self.root / rel):
+                entry['gzip'] = min(len(data), len(gzip.compress(data, 9, mtime=0)))
+                if brotli is not None:
+                    entry['br'] = min(len(data), len(brotli.compress(data, quality=11)))
+            self.cache[rel] = entry
+        return entry
+
+
+# --- what a page loads ---------------------------------------------------------
+
+def slot_width(sizes: str, viewport: int = REFERENCE_VIEWPORT) -> float:
+    """The CSS width a sizes attribute gives at viewport; 100vw when nothing applies."""
+    for entry in (sizes or '').split(','):
+        entry = entry.strip()
+        m = SIZES_MEDIA.match(entry)
+        if m:
+            limit = float(m.group(2))
+            if viewport < limit if m.group(1) == 'min' else viewport > limit:
+                continue
+            entry = m.group(3).strip()
+        m = SIZES_LENGTH.match(entry)
+        if m:
+            return float(m.group(1)) * (viewport / 100 if m.group(2) == 'vw' else 1)
+    return float(viewport)
+
+
+def pick_candidate(srcset: str, sizes: str = None, viewport: int = REFERENCE_VIEWPORT):
+    """The srcset URL a browser at viewport and 1x would fetch, or None for an empty srcset.
+
+    Width descriptors are matched against the sizes slot: the smallest
+    candidate at least that wide, else the widest. Density descriptors pick
+    1x (the smallest density at least 1).
+    """
+    widths, densities = [], []
+    for part in srcset.split(','):
+        bits = part.split()
+        if not bits:
+            continue
+        descriptor = bits[1] if len(bits) > 1 else '1x'
+        try:
+            value = float(descriptor[:-1])
+        except ValueError:
+            continue
+        (widths if descriptor.endswith('w') else densities).append((value, bits[0]))
+    if widths:
+        candidates, need = sorted(widths), slot_width(sizes, viewport)
+    elif densities:
+        candidates, need = sorted(densities), 1.0
+    else:
+        return None
+    return next((url for value, url in candidates if value >= need), candidates[-1][1])
+
+
+def page_requests(text: str):
+    """(url, kind hint, eager) for everything a page fetches directly."""
+    found = []
+    in_style = False
+    picture = None      # inside a <picture>: attrs of its first usable <source>, else {}
+    for tok in tokenize(text):
+        if tok.kind == 'raw' and in_style:
+            found.extend((url, None, True) for url in css_refs(tok.data))
+            continue
+        if tok.kind == 'tag' and tok.name == '/picture':
+            picture = None
+        if tok.kind not in ('tag', 'open_raw') or tok.name.startswith(('/', '!')):
+            continue
+        in_style = tok.kind == 'open_raw' and tok.name == 'style'
+        attrs = {k: html.unescape(v) for k, v in tag_attrs(tok.data).items() if v}
+        if attrs.get('style'):
+            found.extend((url, None, True) for url in css_refs(attrs['style']))
+        if tok.name == 'link':
+            rels = set(attrs.get('rel', '').lower().split())
+            href = pick_candidate(attrs.get('imagesrcset', ''), attrs.get('imagesizes')) or attrs.get('href')
+            if not href:
+                continue
+            if 'stylesheet' in rels:
+                found.append((href, 'css', True))
+            elif 'modulepreload' in rels:
+                found.append((href, 'script', True))
+            elif 'preload' in rels:
+                found.append((href, PRELOAD_KINDS.get(attrs.get('as', '').lower()), True))
+            elif rels & ICON_RELS:
+                found.append((href, 'image', True))
+        elif tok.name == 'script' and attrs.get('src'):
+            found.append((attrs['src'], 'script', True))
+        elif tok.name == 'picture':
+            picture = {}
+        elif (tok.name == 'source' and picture == {} and attrs.get('srcset') and not attrs.get('media')
+              and attrs.get('type', '').lower() in SOURCE_TYPES):
+            # The first source without a media query wins in a browser that takes its type.
+            picture = attrs
+        elif tok.name == 'img':
+            chosen = picture or attrs
+            src = pick_candidate(chosen.get('srcset', ''), chosen.get('sizes')) or attrs.get('src')
+            if src:
+                found.append((src, 'image', attrs.get('loading', '').lower() != 'lazy'))
+        elif tok.name == 'video' and attrs.get('poster'):
+            found.append((attrs['poster'], 'image', True))
+    return found
+
+
+def is_external(url: str) -> bool:
+    return url.startswith(('http://', 'https://', '//'))
+
+
+class Route:
+    def __init__(self, route: str, page: str):
+        self.route = route
+        self.page = page
+        self.assets = {}      # rel -> kind, fetched
+        self.deferred = {}    # rel -> kind, lazy
+        self.external = []
+        self.missing = []
+
+    def metrics(self, sizes: Sizes) -> dict:
+        # A missing asset still costs its (failed) request.
+        m = {'requests': len(self.assets) + len(self.external) + len(self.missing), 'raw': 0, 'transfer': 0}
+        m.update({kind: 0 for kind in KINDS})
+        for rel, kind in self.assets.items():
+            s = sizes(rel)
+            m['raw'] += s['raw']
+            m['transfer'] += s['gzip']
+            m[kind] += s['gzip']
+        m['brotli'] = sum((sizes(rel)['br'] or sizes(rel)['gzip']) for rel in self.assets) if brotli else None
+        m['deferred'] = sum(sizes(rel)['gzip'] for rel in self.deferred)
+        return m
+
+
+def route_name(page: str) -> str:
+    if page == 'index.html':
+        return '/'
+    if page.endswith('/index.html'):
+        return '/' + page[:-len('index.html')]
+    return '/' + page
+
+
+def analyze(root: Path, only=None):
+    files, _ = scan(root)
+    resolver = Resolver(files, site_host(root))
+    pages = sorted(f for f in files if f.endswith(('.html', '.htm')) and is_site_file(f) and not is_artifact(f))
+    routes = []
+    for page in pages:
+        route = Route(route_name(page), page)
+        if only and route.route not in only:
+            continue
+        route.assets[page] = 'html'
+        pending = [(url, hint, eager, page) for url, hint, eager in
+                   page_requests((root / page).read_text(encoding='utf-8', errors='replace'))]
+        while pending:
+            url, hint, eager, source = pending.pop(0)
+            path = resolver.url_path(url, source)
+            if path is None:
+                if is_external(url) and url not in route.external:
+                    route.external.append(url)
+                continue
+            rel = resolver.resolve(path)
+            if rel is None:
+                if path not in route.missing:
+                    route.missing.append(path)
+                continue
+            kind = kind_of(rel, hint)
+            if not eager:
+                if rel not in route.assets:
+                    route.deferred[rel] = kind
+                continue
+            route.deferred.pop(rel, None)
+            if rel in route.assets:
+                continue
+            route.assets[rel] = kind
+            if kind == 'css':
+                text = (root / rel).read_text(encoding='utf-8', errors='replace')
+                pending.extend((u, None, True, rel) for u in css_refs(text))
+        routes.append(route)
+    return routes
+
+
+# --- budgets -----------------------------------------------------------------
+
+def budget_for(budgets: dict, route: str) -> dict:
+    budget = dict(budgets.get('default', {}))
+    budget.update(budgets.get('routes', {}).get(route, {}))
+    return budget
+
+
+def over_budget(metrics: dict, budget: dict) -> list:
+    """[(key, actual, limit)] for every exceeded budget key."""
+    over = []
+    for key, limit in sorted(budget.items()):
+        if key == 'requests':
+            actual = metrics['requests']
+        elif key.endswith('_kib') and key[:-4] in metrics:
+            actual = metrics[key[:-4]] / 1024
+        else:
+            raise ValueError(f"unknown budget key {key!r}")
+        if actual > limit:
+            over.append((key, actual, limit))
+    return over
+
+
+# --- reports -----------------------------------------------------------------
+
+def route_report(route: Route, sizes: Sizes, budget: dict) -> dict:
+    metrics = route.metrics(sizes)
+    assets = sorted(route.assets.items(), key=lambda item: (-sizes(item[0])['gzip'], item[0]))
+    return {
+        'route': route.route,
+        'page': route.page,
+        'metrics': metrics,
+        'budget': budget,
+        'over': [{'key': k, 'actual': round(a, 1), 'limit': limit} for k, a, limit in over_budget(metrics, budget)],
+        'assets': [{'path': rel, 'kind': kind, **sizes(rel),
+                    'share': round(sizes(rel)['gzip'] / metrics['transfer'] * 100, 1) if metrics['transfer'] else 0}
+                   for rel, kind in assets],
+        'deferred': [{'path': rel, 'kind': kind, **sizes(rel)} for rel, kind in sorted(route.deferred.items())],
+        'external': route.external,
+        'missing': route.missing,
+    }
+
+
+def kib(n) -> str:
+    return '-' if n is None else f"{n / 1024:.1f}"
+
+
+def html_report(reports: list) -> str:
+    esc = html.escape
+    rows, details = [], []
+    for r in reports:
+        m = r['metrics']
+        status = 'over' if r['over'] else 'ok'
+        rows.append(f"<tr class={status}><td><a href='#{esc(r['route'])}'>{esc(r['route'])}</a></td>"
+                    f"<td>{m['requests']}</td><td>{kib(m['raw'])}</td><td>{kib(m['transfer'])}</td>"
+                    + ''.join(f"<td>{kib(m[k])}</td>" for k in KINDS[:-1])
+                    + f"<td>{kib(m['deferred'])}</td><td>{'OVER' if r['over'] else 'ok'}</td></tr>")
+        items = ''.join(
+            f"<tr><td>{esc(a['path'])}</td><td>{a['kind']}</td><td>{kib(a['raw'])}</td><td>{kib(a['gzip'])}</td>"
+            f"<td><span class=bar style='width:{a['share']:.0f}%'></span> {a['share']:.1f}%</td></tr>"
+            for a in r['assets'])
+        notes = ''.join(f"<li class=over>{esc(o['key'])}: {o['actual']} &gt; {o['limit']}</li>" for o in r['over'])
+        notes += ''.join(f"<li>external: {esc(u)}</li>" for u in r['external'])
+        notes += ''.join(f"<li>missing: {esc(p)}</li>" for p in r['missing'])
+        notes += ''.join(f"<li>deferred: {esc(d['path'])} ({kib(d['gzip'])} KiB)</li>" for d in r['deferred'])
+        details.append(f"<h2 id='{esc(r['route'])}'>{esc(r['route'])}</h2><ul>{notes}</ul>"
+                       f"<table><tr><th>asset</th><th>type</th><th>raw KiB</th><th>transfer KiB</th><th>share</th></tr>"
+                       f"{items}</table>")
+    head = ''.join(f"<th>{k} KiB</th>" for k in KINDS[:-1])
+    return f"""<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8"><title>Page weight</title>
+<style>
+body{{font:14px system-ui,sans-serif;margin:2em;color:#222}}table{{border-collapse:collapse;margin-bottom:1em}}
+td,th{{padding:2px 8px;border-bottom:1px solid #ddd;text-align:right}}td:first-child,th:first-child{{text-align:left}}
+tr.over td{{background:#fde8e8}}li.over{{color:#b00}}.bar{{display:inline-block;height:8px;background:#4a7}}
+</style></head><body>
+<h1>Page weight per route</h1>
+<table><tr><th>route</th><th>requests</th><th>raw KiB</th><th>transfer KiB</th>{head}<th>deferred KiB</th><th>budget</th></tr>
+{''.join(rows)}</table>
+{''.join(details)}
+</body></html>
+"""
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--root', type=Path, default=ROOT, help='tree to analyze (default: repository root)')
+    parser.add_argument('--budgets', type=Path, default=BUDGETS_PATH,
+                        help=f'budget file (default: tools/{BUDGETS_PATH.name})')
+    parser.add_argument('--route', action='append', help='only this route, e.g. /about/ (repeatable)')
+    parser.add_argument('--top', type=int, default=TOP_ASSETS, help=f'assets listed per route (default: {TOP_ASSETS})')
+    parser.add_argument('--json', type=Path, metavar='FILE', help='write the report as JSON')
+    parser.add_argument('--html', type=Path, metavar='FILE', help='write the report as HTML')
+    args = parser.parse_args(argv)
+
+    root = args.root.resolve()
+    budgets = json.loads(args.budgets.read_text(encoding='utf-8'))
+    sizes = Sizes(root)
+    try:
+        reports = [route_report(r, sizes, budget_for(budgets, r.route)) for r in analyze(root, args.route)]
+    except ValueError as e:
+        parser.error(f"{args.budgets}: {e}")
+
+    failed = 0
+    for r in reports:
+        m = r['metrics']
+        status = 'OVER' if r['over'] else 'OK'
+        failed += bool(r['over'])
+        print(f"{status} {r['route']} ({m['requests']} requests, {kib(m['raw'])} KiB raw, "
+              f"{kib(m['transfer'])} KiB transfer" + (f", {kib(m['brotli'])} KiB brotli" if m['brotli'] else '')
+              + (f", {kib(m['deferred'])} KiB deferred" if m['deferred'] else '') + ')')
+        for o in r['over']:
+            print(f"    over budget: {o['key']} {o['actual']:g} > {o['limit']:g}")
+        for a in r['assets'][:args.top]:
+            print(f"    {kib(a['gzip']):>8} KiB {a['share']:5.1f}%  {a['path']}")
+        for path in r['missing']:
+            print(f"    missing: {path}")
+
+    found = {r['route'] for r in reports}
+    unknown = [route for route in args.route or () if route not in found]
+    for route in unknown:
+        print(f"UNKNOWN {route} (no such route" + (f"; did you mean {route}/?" if (root / route.strip('/') / 'index.html').is_file() else '') + ')')
+
+    print('\nSummary:')
+    print(f"Routes: {len(reports)}, over budget: {failed}"
+          + (f", unknown: {len(unknown)}" if unknown else '')
+          + ('' if brotli else ' (Brotli sizes need: pip install brotli)'))
+
+    if args.json:
+        args.json.write_text(json.dumps({'routes': reports}, indent=1) + '\n', encoding='utf-8')
+    if args.html:
+        args.html.write_text(html_report(reports), encoding='utf-8')
+    return 1 if failed or unknown else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""Single-pass post-export rewrite engine.
+
+Each of the fix-up scripts in tools/ is registered here as a transform stage.
+The engine walks the tree once, reads each file once, runs every applicable
+stage over the text in memory, and writes the file back only if the final
+bytes differ from what was read. Per-stage timings are reported at the end.
+The originals of rewritten files are kept in one backup snapshot per run
+(see snapshot.py).
+
+Usage:
+    python tools/pipeline.py                      # default stages
+    python tools/pipeline.py --stages next-runtime,logo
+    python tools/pipeline.py --list
+    python tools/pipeline.py --dry-run
+    python tools/pipeline.py --jobs 0             # one worker per CPU core
+    python tools/pipeline.py --incremental        # skip files unchanged since the last run
+    python tools/pipeline.py --report run.json    # per-file/stage timings, regex counts (instrument.py)
+
+The standalone scripts keep working; they share the transform functions used
+by the stages below.
+"""
+import argparse
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional, Pattern
+
+import instrument
+from manifest import Manifest, add_incremental_arguments, sha256_bytes
+from snapshot import Session, Store
+from treeio import (ROOT, add_jobs_argument, is_artifact, is_site_file, iter_files, parallel_map, rel_path,
+                    resolve_jobs, scan_file, write_if_changed)
+
+HTML_TXT_EXTS = ('.html', '.htm', '.txt')
+
+
+@dataclass
+class Stage:
+    name: str
+    transform: Callable[[str], str]
+    applies: Callable[[str], bool]
+    description: str = ''
+    # Recorded in the incremental manifest; bump when the output changes.
+    version: int = 1
+    # Bytes pattern that must occur in a file for the stage to change it; files
+    # it does not match skip the stage without being decoded.
+    probe: Optional[Pattern[bytes]] = None
+
+
+STAGES = {}
+
+
+def register(name: str, applies: Callable[[str], bool], description: str = '', version: int = 1,
+             probe: Optional[Pattern[bytes]] = None):
+    def decorator(func: Callable[[str], str]):
+        STAGES[name] = Stage(name, func, applies, description, version, probe)
+        return func
+    return decorator
+
+
+def _html_or_txt(rel: str) -> bool:
+    return rel.lower().endswith(HTML_TXT_EXTS)
+
+
+def _index_html(rel: str) -> bool:
+    return rel.rsplit('/', 1)[-1] == 'index.html'
+
+
+# --- stages ---------------------------------------------------------------
+
+import clean_next_runtime  # noqa: E402
+import minify_html  # noqa: E402
+import pretty_index_html_no_bs4  # noqa: E402
+import replace_auc  # noqa: E402
+import replace_ece_role  # noqa: E402
+import replace_outside_blocks  # noqa: E402
+import resource_hints  # noqa: E402
+import update_logo  # noqa: E402
+from multireplace import load_rule_sets  # noqa: E402
+
+
+register(clean_next_runtime.TRANSFORM_NAME, _html_or_txt, 'strip Next.js client runtime scripts',
+         version=clean_next_runtime.TRANSFORM_VERSION, probe=clean_next_runtime.PROBE)(clean_next_runtime.clean_text)
+register(update_logo.TRANSFORM_NAME, update_logo.RULES.applies, update_logo.RULES.description,
+         version=update_logo.TRANSFORM_VERSION, probe=update_logo.RULES.probe)(update_logo.replace_logo)
+register(replace_auc.TRANSFORM_NAME, replace_auc.RULES.applies, replace_auc.RULES.description,
+         version=replace_auc.TRANSFORM_VERSION, probe=replace_auc.RULES.probe)(replace_auc.replace_auc)
+register(replace_ece_role.TRANSFORM_NAME, replace_ece_role.RULES.applies, replace_ece_role.RULES.description,
+         version=replace_ece_role.TRANSFORM_VERSION, probe=replace_ece_role.RULES.probe)(replace_ece_role.replace_role)
+
+for _module, _func in ((replace_outside_blocks, replace_outside_blocks.prettify_text),
+                       (pretty_index_html_no_bs4, pretty_index_html_no_bs4.prettify_html)):
+    register(_module.TRANSFORM_NAME, _index_html, f'{_module.__name__}.py',
+             version=_module.TRANSFORM_VERSION)(_func)
+
+
+register(minify_html.TRANSFORM_NAME, lambda rel: rel.lower().endswith(minify_html.HTML_EXTS),
+         'minify_html.py in place (instead of a prettifier)', version=minify_html.TRANSFORM_VERSION)(minify_html.minify_text)
+register(resource_hints.TRANSFORM_NAME, lambda rel: rel.lower().endswith(resource_hints.HTML_EXTS),
+         'image loading/priority hints and preloads', version=resource_hints.TRANSFORM_VERSION)(resource_hints.hint_text)
+
+
+@register('pretty-bs4', _index_html, 'pretty_index_html.py (needs beautifulsoup4)')
+def _pretty_bs4(text: str) -> str:
+    import pretty_index_html
+    return pretty_index_html.prettify_html(text)
+
+
+# Any other rule set in replace_rules.json becomes a stage of the same name,
+# so a new batch of content edits needs a JSON entry rather than a new script.
+for _rules in load_rule_sets().values():
+    if _rules.name not in STAGES:
+        register(_rules.name, _rules.applies, _rules.description, version=_rules.version,
+                 probe=_rules.probe)(_rules.sub)
+
+
+DEFAULT_STAGES = ('next-runtime', 'logo', 'auc', 'ece-role', 'pretty-blocks')
+
+
+# --- engine ---------------------------------------------------------------
+
+class StageStats:
+    def __init__(self):
+        self.files = 0
+        self.changed = 0
+        self.seconds = 0.0
+
+
+class FileResult:
+    """What happened to one file; built in a worker, reported by the parent."""
+
+    def __init__(self, rel: str):
+        self.rel = rel
+        self.status = 'UNCHANGED'
+        self.error = ''
+        self.applied = []
+        self.stage_seconds = {}
+        self.bytes_read = 0
+        self.read_seconds = 0.0
+        self.write_seconds = 0.0
+        # sha256 of the original bytes, stored in the backup store before writing.
+        self.backup = None
+        self.decoded = False
+        self.bytes_out = 0
+        self.decode_seconds = 0.0
+        # sha256 of the file as left, when asked for and the file was read (see Manifest.record).
+        self.digest = None
+        # Regex counts from this process while instrumented (see instrument.py).
+        self.patterns = {}
+
+
+def process_file(path: Path, root: Path, stage_names, dry_run: bool = False, digest: bool = False) -> FileResult:
+    """Read path once, run the applicable stages, write back if the bytes differ.
+
+    With digest set, result.digest hashes the bytes already in hand for the
+    manifest.
+    """
+    result = _process_file(path, root, stage_names, dry_run, digest)
+    result.patterns = instrument.drain_pattern_stats()
+    return result
+
+
+def _process_file(path: Path, root: Path, stage_names, dry_run: bool, digest: bool) -> FileResult:
+    rel = rel_path(path, root)
+    result = FileResult(rel)
+    stages = [STAGES[n] for n in stage_names if STAGES[n].applies(rel)]
+    for stage in stages:
+        result.stage_seconds[stage.name] = 0.0
+
+    t0 = time.perf_counter()
+    if stages and all(s.probe is not None for s in stages):
+        # Nothing to do unless some probe matches; large files are searched via mmap.
+        if not any(scan_file(path, s.probe) for s in stages):
+            result.read_seconds = time.perf_counter() - t0
+            return result
+    raw = path.read_bytes()
+    result.read_seconds = time.perf_counter() - t0
+    result.bytes_read = len(raw)
+    stages = [s for s in stages if s.probe is None or s.probe.search(raw)]
+    if digest:
+        result.digest = sha256_bytes(raw)
+    if not stages:
+        return result
+    result.decoded = True
+    t0 = time.perf_counter()
+    try:
+        text = raw.decode('utf-8')
+    except UnicodeDecodeError as e:
+        result.status = 'SKIP'
+        result.error = f"read error: {e}"
+        return result
+    result.decode_seconds = time.perf_counter() - t0
+
+    applied = []
+    for stage in stages:
+        t0 = time.perf_counter()
+        new_text = stage.transform(text)
+        result.stage_seconds[stage.name] = time.perf_counter() - t0
+        if new_text != text:
+            applied.append(stage)
+            text = new_text
+    result.applied = [s.name for s in applied]
+
+    data = text.encode('utf-8')
+    result.bytes_out = len(data)
+    if data == raw:
+        return result
+    if dry_run:
+        result.status = 'WOULD UPDATE'
+        return result
+
+    t0 = time.perf_counter()
+    result.backup = Store(root).put(raw)
+    write_if_changed(path, data, raw)
+    result.write_seconds = time.perf_counter() - t0
+    result.status = 'UPDATED'
+    if digest:
+        result.digest = sha256_bytes(data)
+    return result
+
+
+def _process_job(job) -> FileResult:
+    return process_file(*job)
+
+
+def wanted(rel: str, stages) -> bool:
+    """True if rel is a site file (not tools/, backups or leftovers) that some stage applies to.
+
+    The pipeline walk and watch.py's daemon both go through this.
+    """
+    return is_site_file(rel) and not is_artifact(rel) and any(s.applies(rel) for s in stages)
+
+
+def transforms_for(rel: str, stages) -> dict:
+    return {s.name: s.version for s in stages if s.applies(rel)}
+
+
+def _record_result(recorder: instrument.Recorder, result: FileResult):
+    entry = recorder.file(result.rel)
+    entry['status'] = result.status
+    entry['bytes_in'] += result.bytes_read
+    entry['bytes_out'] += result.bytes_out or result.bytes_read
+    recorder.add('read', result.read_seconds, result.rel)
+    if result.decoded:
+        recorder.add('decode', result.decode_seconds, result.rel)
+    for name, seconds in result.stage_seconds.items():
+        recorder.add(f"stage:{name}", seconds, result.rel)
+    if result.write_seconds:
+        recorder.add('write', result.write_seconds, result.rel)
+    recorder.merge_patterns(result.patterns)
+
+
+def run(stage_names, root: Path = ROOT, dry_run: bool = False, jobs: int = 1, manifest: Manifest = None,
+        recorder: instrument.Recorder = None) -> int:
+    stages = [STAGES[n] for n in stage_names]
+    if recorder is not None:
+        recorder.meta.update(stages=list(stage_names), jobs=jobs, dry_run=dry_run, root=str(root))
+        for stage in stages:
+            # Before the pool forks, so workers count probe matches too.
+            stage.probe = instrument.count(f"probe:{stage.name}", stage.probe)
+    stats = {s.name: StageStats() for s in stages}
+    files_read = 0
+    files_decoded = 0
+    files_written = 0
+    bytes_read = 0
+    read_seconds = 0.0
+    write_seconds = 0.0
+    started = time.perf_counter()
+
+    files_current = 0
+    session = Session('pipeline', root)
+    t0 = time.perf_counter()
+    paths = [p for p in iter_files(root) if wanted(rel_path(p, root), stages)]
+    walk_seconds = time.perf_counter() - t0
+    if manifest is not None:
+        t0 = time.perf_counter()
+        todo = [p for p in paths if not manifest.is_current(p, transforms_for(rel_path(p, root), stages))]
+        files_current = len(paths) - len(todo)
+        paths = todo
+        if recorder is not None:
+            recorder.add('manifest', time.perf_counter() - t0)
+    if recorder is not None:
+        recorder.add('walk', walk_seconds)
+    job_args = [(p, root, stage_names, dry_run, manifest is not None) for p in paths]
+    for path, result in zip(paths, parallel_map(_process_job, job_args, jobs, chunksize=4)):
+        if manifest is not None and result.status in ('UPDATED', 'UNCHANGED'):
+            manifest.record(path, transforms_for(result.rel, stages), result.status == 'UPDATED', result.digest)
+        if result.backup:
+            session.record_digest(result.rel, result.backup, result.bytes_read)
+        files_read += 1
+        files_decoded += result.decoded
+        bytes_read += result.bytes_read
+        read_seconds += result.read_seconds
+        write_seconds += result.write_seconds
+        for name, seconds in result.stage_seconds.items():
+            st = stats[name]
+            st.files += 1
+            st.seconds += seconds
+            st.changed += name in result.applied
+        if recorder is not None:
+            _record_result(recorder, result)
+
+        if result.status == 'SKIP':
+            print(f"SKIP {result.rel} ({result.error})")
+        elif result.status == 'UNCHANGED':
+            print(f"UNCHANGED {result.rel}")
+        else:
+            files_written += 1
+            print(f"{result.status} {result.rel} ({', '.join(result.applied)})")
+
+    if manifest is not None and not dry_run:
+        manifest.save()
+    t0 = time.perf_counter()
+    snapshot_id = session.close()
+    if recorder is not None:
+        recorder.add('backup', time.perf_counter() - t0)
+
+    elapsed = time.perf_counter() - started
+    print('\nSummary:')
+    if manifest is not None:
+        print(f"Files skipped as up to date: {files_current}")
+    print(f"Files scanned: {files_read} ({bytes_read / 1024:.1f} KiB read, {read_seconds * 1000:.1f} ms), "
+          f"decoded: {files_decoded}")
+    print(f"Files {'to update' if dry_run else 'updated'}: {files_written} ({write_seconds * 1000:.1f} ms writing)")
+    print(f"Wall time: {elapsed * 1000:.1f} ms with {jobs} job(s)")
+    if snapshot_id:
+        print(f"Backup snapshot: {snapshot_id} (restore with: python tools/snapshot.py restore {snapshot_id})")
+    print('Per stage (summed over workers):')
+    for stage in stages:
+        st = stats[stage.name]
+        print(f"  {stage.name:<18} files={st.files:<4} changed={st.changed:<4} {st.seconds * 1000:8.1f} ms")
+    return files_written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stages', default=','.join(DEFAULT_STAGES),
+                        help='comma-separated stage names, run in the given order')
+    parser.add_argument('--root', type=Path, default=ROOT, help='tree to process (default: repository root)')
+    parser.add_argument('--dry-run', action='store_true', help='report what would change without writing')
+    parser.add_argument('--list', action='store_true', help='list registered stages and exit')
+    add_jobs_argument(parser)
+    add_incremental_arguments(parser)
+    instrument.add_instrument_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for stage in STAGES.values():
+            marker = '*' if stage.name in DEFAULT_STAGES else ' '
+            print(f"{marker} {stage.name:<18} {stage.description}")
+        return 0
+
+    names = [n.strip() for n in args.stages.split(',') if n.strip()]
+    unknown = [n for n in names if n not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)} (see --list)")
+
+    root = args.root.resolve()
+    manifest = Manifest(root, args.manifest) if args.incremental else None
+    recorder = instrument.start(args, 'pipeline')
+    with instrument.profiled(args.profile):
+        run(names, root, args.dry_run, resolve_jobs(args.jobs), manifest, recorder)
+    instrument.finish(recorder, args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
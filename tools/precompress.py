@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""Write pre-compressed .gz and .br siblings for every compressible static asset.
+
+A server or CDN configured for pre-compressed files (nginx gzip_static /
+brotli_static, `serve`, most CDNs) can then send these bytes directly instead
+of compressing each response.
+
+- Compressible: HTML, RSC .txt payloads, JS, CSS, JSON, SVG, XML, ICO
+  anywhere in the published tree (tools/, scripts/ and public/ are skipped).
+- gzip at level 9 with a zero timestamp (reproducible), Brotli at quality 11.
+- A sidecar newer than its source is left alone; one that would not be
+  smaller than the source is not written (and a stale one is removed).
+  Such no-gain results are remembered by size and mtime in
+  .tools-precompress.json, so reruns do not compress those files again.
+- Sidecars are written to a temporary file and renamed into place, so an
+  interrupted run never leaves a truncated .gz/.br for a server to send.
+- Files are compressed in parallel (one worker per core by default).
+
+Brotli needs the optional `brotli` package (pip install brotli); without it
+only .gz files are written.
+
+Usage:
+    python tools/precompress.py
+    python tools/precompress.py --clean     # delete all .gz/.br sidecars
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+from functools import partial
+from pathlib import Path
+
+from treeio import ROOT, add_jobs_argument, is_site_file, iter_files, parallel_map, rel_path, resolve_jobs
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+COMPRESSIBLE_EXTS = {'.html', '.htm', '.txt', '.js', '.mjs', '.css', '.json', '.svg', '.xml', '.ico', '.map', '.webmanifest'}
+SIDECAR_EXTS = ('.gz', '.br')
+# Below this a compressed response saves less than its own framing overhead.
+MIN_SIZE = 256
+# Files whose sidecars would not be smaller: {rel: {'size', 'mtime_ns', 'exts'}}.
+STATE_NAME = '.tools-precompress.json'
+
+
+def _gzip(data: bytes) -> bytes:
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _brotli(data: bytes) -> bytes:
+    return brotli.compress(data, quality=11)
+
+
+def is_compressible(path: Path) -> bool:
+    return path.suffix.lower() in COMPRESSIBLE_EXTS
+
+
+def load_state(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(path: Path, state: dict):
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(json.dumps(dict(sorted(state.items())), indent=1) + '\n', encoding='utf-8')
+    os.replace(tmp, path)
+
+
+def write_atomic(path: Path, data: bytes):
+    tmp = path.with_name(path.name + '.tmp')
+    try:
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def compress_file(formats, path: Path, known=None):
+    """Bring the sidecars of one file up to date; returns (size, {ext: (sidecar size or None, status)}).
+
+    known is the file's STATE_NAME entry, if any: formats it lists as giving
+    no gain at the same size and mtime are not compressed again.
+    """
+    st = path.stat()
+    no_gain = ()
+    if known and (known['size'], known['mtime_ns']) == (st.st_size, st.st_mtime_ns):
+        no_gain = known['exts']
+    data = None
+    results = {}
+    for ext in formats:
+        sidecar = path.with_name(path.name + ext)
+        if ext in no_gain and not sidecar.exists():
+            results[ext] = (None, 'no gain')
+            continue
+        if sidecar.exists() and sidecar.stat().st_mtime_ns >= st.st_mtime_ns:
+            results[ext] = (sidecar.stat().st_size, 'fresh')
+            continue
+        if data is None:
+            data = path.read_bytes()
+        packed = _gzip(data) if ext == '.gz' else _brotli(data)
+        if len(packed) >= len(data):
+            sidecar.unlink(missing_ok=True)
+            results[ext] = (None, 'no gain')
+            continue
+        write_atomic(sidecar, packed)
+        results[ext] = (len(packed), 'written')
+    return st.st_size, results
+
+
+def _compress_job(formats, job):
+    return compress_file(formats, *job)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--root', type=Path, default=ROOT, help='tree to process (default: repository root)')
+    parser.add_argument('--no-brotli', action='store_true', help='only write .gz sidecars')
+    parser.add_argument('--clean', action='store_true', help='remove all .gz/.br sidecars and exit')
+    parser.add_argument('--verbose', action='store_true', help='list every file, not just rewritten ones')
+    add_jobs_argument(parser, default=0)
+    args = parser.parse_args(argv)
+    root = args.root.resolve()
+
+    if args.clean:
+        removed = 0
+        for path in iter_files(root):
+            if path.suffix in SIDECAR_EXTS and is_compressible(path.with_suffix('')):
+                path.unlink()
+                removed += 1
+        (root / STATE_NAME).unlink(missing_ok=True)
+        print(f"Removed {removed} sidecar(s).")
+        return 0
+
+    formats = ['.gz']
+    if not args.no_brotli:
+        if brotli is None:
+            print('brotli package not installed (pip install brotli); writing .gz only.')
+        else:
+            formats.append('.br')
+
+    paths = [p for p in iter_files(root)
+             if is_site_file(rel_path(p, root)) and is_compressible(p) and p.stat().st_size >= MIN_SIZE]
+    state_path = root / STATE_NAME
+    state = load_state(state_path)
+    jobs = [(p, state.get(rel_path(p, root))) for p in paths]
+    new_state = {}
+    totals = {'raw': 0}
+    totals.update({ext: 0 for ext in formats})
+    written = 0
+    for path, (size, results) in zip(paths, parallel_map(partial(_compress_job, formats), jobs,
+                                                         resolve_jobs(args.jobs), chunksize=8)):
+        no_gain = [ext for ext, (_, status) in results.items() if status == 'no gain']
+        if no_gain:
+            st = path.stat()
+            new_state[rel_path(path, root)] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'exts': no_gain}
+        totals['raw'] += size
+        for ext, (packed, _) in results.items():
+            totals[ext] += size if packed is None else packed
+        changed = any(status == 'written' for _, status in results.values())
+        written += changed
+        if changed or args.verbose:
+            cols = '  '.join(f"{ext} {'-' if packed is None else f'{packed / 1024:8.1f} KiB'} ({status})"
+                             for ext, (packed, status) in results.items())
+            print(f"{rel_path(path, root):<60} {size / 1024:8.1f} KiB  {cols}")
+
+    if new_state != state:
+        save_state(state_path, new_state)
+
+    print('\nSummary:')
+    print(f"Compressible files: {len(paths)} ({written} with new sidecars, {len(new_state)} not worth compressing)")
+    raw = totals['raw'] or 1
+    print(f"  raw  {totals['raw'] / 1024:10.1f} KiB")
+    for ext in formats:
+        print(f"  {ext:<4} {totals[ext] / 1024:10.1f} KiB ({100 * totals[ext] / raw:.1f}% of raw)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
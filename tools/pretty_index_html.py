@@ -6,19 +6,21 @@ Usage: python tools/pretty_index_html.py
 This script uses BeautifulSoup4 to prettify HTML and preserves a leading <!DOCTYPE html> if present.
 It will only overwrite files when the content actually changes.
 """
+import argparse
 import sys
 from pathlib import Path
 from bs4 import BeautifulSoup
+from manifest import Manifest, add_incremental_arguments
+from treeio import add_jobs_argument, resolve_jobs, rewrite_index_html
 
 ROOT = Path(__file__).resolve().parents[1]
-changed = []
-
-for path in sorted(ROOT.rglob('index.html')):
-    try:
-        text = path.read_text(encoding='utf-8')
-    except Exception as e:
-        print(f"SKIP {path} (read error: {e})")
-        continue
+
+# Manifest key for --incremental; bump the version whenever the output changes.
+TRANSFORM_NAME = 'pretty-bs4'
+TRANSFORM_VERSION = 1
+
+
+def prettify_html(text: str) -> str:
     doctype = ''
     stripped = text.lstrip()
     if stripped.lower().startswith('<!doctype'):
@@ -33,22 +35,27 @@ for path in sorted(ROOT.rglob('index.html')):
     pretty = soup.prettify()
     new_text = (doctype + '\n' if doctype else '') + pretty + '\n'
     # Normalize line endings
-    new_text = new_text.replace('\r\n', '\n')
-    if new_text != text.replace('\r\n','\n'):
-        path.write_text(new_text, encoding='utf-8')
-        changed.append(str(path))
-        print(f"UPDATED {path}")
-    else:
-        print(f"UNCHANGED {path}")
+    return new_text.replace('\r\n', '\n')
+
 
-print('\nSummary:')
-print(f"Total files checked: {len(list(ROOT.rglob('index.html')))}")
-print(f"Total updated: {len(changed)}")
-if changed:
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_jobs_argument(parser)
+    add_incremental_arguments(parser)
+    args = parser.parse_args(argv)
+
+    manifest = Manifest(ROOT, args.manifest) if args.incremental else None
+    paths, changed = rewrite_index_html(prettify_html, ROOT, resolve_jobs(args.jobs), manifest,
+                                        {TRANSFORM_NAME: TRANSFORM_VERSION})
+
+    print('\nSummary:')
+    print(f"Total files checked: {len(paths)}")
+    print(f"Total updated: {len(changed)}")
     for p in changed:
         print(' -', p)
 
-if len(changed) == 0:
-    sys.exit(0)
-else:
     sys.exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,12 +5,19 @@ This avoids depending on BeautifulSoup/VS Code selected interpreter. It's a cons
 reformatter: it will add line breaks and indentation for tags but preserves all text
 and won't try to alter attribute order or minified JS/CSS inside script/style tags.
 """
+import argparse
 import sys
 from pathlib import Path
 from html.parser import HTMLParser
+from manifest import Manifest, add_incremental_arguments
+from treeio import add_jobs_argument, resolve_jobs, rewrite_index_html
 
 ROOT = Path(__file__).resolve().parents[1]
 
+# Manifest key for --incremental; bump the version whenever the output changes.
+TRANSFORM_NAME = 'pretty-stdlib'
+TRANSFORM_VERSION = 1
+
 class SimplePrettyHTMLParser(HTMLParser):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -77,28 +84,22 @@ def prettify_html(text: str) -> str:
     return new_text
 
 
-def main():
-    changed = []
-    for path in sorted(ROOT.rglob('index.html')):
-        try:
-            text = path.read_text(encoding='utf-8')
-        except Exception as e:
-            print(f"SKIP {path} (read error: {e})")
-            continue
-        new_text = prettify_html(text)
-        if new_text != text.replace('\r\n','\n'):
-            path.write_text(new_text, encoding='utf-8')
-            changed.append(str(path))
-            print(f"UPDATED {path}")
-        else:
-            print(f"UNCHANGED {path}")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_jobs_argument(parser)
+    add_incremental_arguments(parser)
+    args = parser.parse_args(argv)
+
+    manifest = Manifest(ROOT, args.manifest) if args.incremental else None
+    paths, changed = rewrite_index_html(prettify_html, ROOT, resolve_jobs(args.jobs), manifest,
+                                        {TRANSFORM_NAME: TRANSFORM_VERSION})
 
     print('\nSummary:')
-    print(f"Total files checked: {len(list(ROOT.rglob('index.html'))) }")
+    print(f"Total files checked: {len(paths)}")
     print(f"Total updated: {len(changed)}")
-    if changed:
-        for p in changed:
-            print(' -', p)
+    for p in changed:
+        print(' -', p)
+
 
 if __name__ == '__main__':
     main()
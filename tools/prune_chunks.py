@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""Find (and optionally remove) JS chunks nothing in the static export can load.
+
+The graph:
+- roots are the scripts each page references: <script src> and
+  <link rel="preload"/"modulepreload"> under /_next/static/;
+- a page that still executes a chunk script has a live Next.js runtime, so its
+  route index.txt payload is loaded too, and with it every chunk named by the
+  payload's I[...] rows (parsed with flight.py);
+- a reachable main-*.js (pages router runtime) loads the build's
+  _buildManifest.js / _ssgManifest.js, which name more chunks;
+- any reachable chunk that spells out another chunk path links to it.
+
+By default every payload and build manifest also counts as a root, so nothing
+Next.js could still ask for is reported; --html-only follows only what the
+pages load today (clean_next_runtime.py strips the runtime scripts).
+
+Stale .orig/.bak/.fixed/.tmp siblings anywhere in the site are reported as
+well. --remove deletes both, recording them in a backup snapshot first (see
+snapshot.py).
+
+Usage:
+    python tools/prune_chunks.py                 # report
+    python tools/prune_chunks.py --html-only     # what the pages load now
+    python tools/prune_chunks.py --remove
+"""
+import argparse
+import json
+import re
+import sys
+from pathlib import Path
+
+import flight
+from htmltok import tag_attrs
+from snapshot import Session
+from treeio import ROOT, is_artifact, is_site_file, iter_files, rel_path
+
+STATIC_DIR = '_next/static'
+CHUNKS_DIR = STATIC_DIR + '/chunks'
+SCRIPT_TAG = re.compile(r'<(?:script|link)\b[^>]*>', re.I)
+# Chunk paths spelled out in payloads, manifests and other chunks.
+CHUNK_PATH = re.compile(r'(?:/?_next/)?(static/(?:chunks|[\w-]+)/[\w./\[\]()@-]+?\.js)\b')
+RUNTIME_RE = re.compile(r'^_next/static/chunks/main-[0-9a-f]+\.js$')
+MANIFEST_NAMES = ('_buildManifest.js', '_ssgManifest.js')
+SIDECAR_EXTS = ('.gz', '.br')
+
+
+def _url_to_rel(url: str):
+    url = url.split('?', 1)[0].split('#', 1)[0]
+    if url.startswith('/'):
+        url = url[1:]
+    return url if url.startswith(STATIC_DIR + '/') else None
+
+
+def page_scripts(text: str) -> set:
+    """Site-relative paths of the scripts a page loads or preloads."""
+    found = set()
+    for m in SCRIPT_TAG.finditer(text):
+        tag = m.group(0)
+        attrs = tag_attrs(tag)
+        if tag[1:7].lower() == 'script':
+            url = attrs.get('src')
+        else:
+            rel = (attrs.get('rel') or '').lower()
+            if rel not in ('preload', 'modulepreload') or (rel == 'preload' and (attrs.get('as') or '') != 'script'):
+                continue
+            url = attrs.get('href')
+        rel = _url_to_rel(url or '')
+        if rel and rel.endswith('.js'):
+            found.add(rel)
+    return found
+
+
+def has_runtime(text: str) -> bool:
+    """True if the page executes (not just preloads) a Next.js chunk."""
+    for m in SCRIPT_TAG.finditer(text):
+        tag = m.group(0)
+        if tag[1:7].lower() == 'script':
+            src = _url_to_rel(tag_attrs(tag).get('src') or '')
+            if src and src.startswith(CHUNKS_DIR + '/'):
+                return True
+    return False
+
+
+def payload_chunks(payload: Path) -> set:
+    found = set()
+    with open(payload, encoding='utf-8', errors='replace') as f:
+        if not flight.is_payload(f.read(64)):
+            return found
+    for row in flight.iter_rows(flight.read_chunks(payload)):
+        if row.tag == 'I':
+            found.update(f'_next/{c}' for c in row.chunks)
+    return found
+
+
+def text_chunks(text: str) -> set:
+    return {f'_next/{m.group(1)}' for m in CHUNK_PATH.finditer(text)}
+
+
+class Graph:
+    def __init__(self, root: Path, html_only: bool = False):
+        self.root = root
+        self.edges = {}    # node -> set of nodes
+        self.roots = {}    # node -> why it is a root
+        self.chunks = sorted(rel_path(p, root) for p in iter_files(root / STATIC_DIR)
+                             if p.suffix == '.js' and not is_artifact(p.name))
+        manifests = [c for c in self.chunks if c.rsplit('/', 1)[-1] in MANIFEST_NAMES]
+
+        for path in iter_files(root):
+            rel = rel_path(path, root)
+            if not is_site_file(rel) or is_artifact(rel):
+                continue
+            if path.suffix.lower() == '.html':
+                text = path.read_text(encoding='utf-8', errors='replace')
+                for script in page_scripts(text):
+                    self.roots.setdefault(script, rel)
+                if has_runtime(text) and path.name == 'index.html':
+                    self.edge(rel, rel_path(path.with_name('index.txt'), root))
+                    for script in page_scripts(text):
+                        self.edge(rel, script)
+            elif path.name == 'index.txt':
+                chunks = payload_chunks(path)
+                for chunk in chunks:
+                    self.edge(rel, chunk)
+                if chunks and not html_only:
+                    self.roots.setdefault(rel, 'RSC payload')
+
+        for chunk in self.chunks:
+            text = (root / chunk).read_text(encoding='utf-8', errors='replace')
+            for ref in text_chunks(text):
+                if ref != chunk:
+                    self.edge(chunk, ref)
+            if RUNTIME_RE.match(chunk):
+                for manifest in manifests:
+                    self.edge(chunk, manifest)
+        if not html_only:
+            for manifest in manifests:
+                self.roots.setdefault(manifest, 'build manifest')
+
+    def edge(self, src: str, dst: str):
+        self.edges.setdefault(src, set()).add(dst)
+
+    def reachable(self) -> dict:
+        """node -> the node it was first reached from (or its root reason)."""
+        seen = dict(self.roots)
+        queue = list(self.roots)
+        while queue:
+            node = queue.pop()
+            for nxt in sorted(self.edges.get(node, ())):
+                if nxt not in seen:
+                    seen[nxt] = node
+                    queue.append(nxt)
+        return seen
+
+
+def stale_siblings(root: Path) -> list:
+    return [p for p in iter_files(root) if is_artifact(rel_path(p, root)) and is_site_file(rel_path(p, root))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--root', type=Path, default=ROOT, help='tree to analyze (default: repository root)')
+    parser.add_argument('--html-only', action='store_true',
+                        help='only count what the pages load now, not payloads or build manifests')
+    parser.add_argument('--remove', action='store_true', help='delete unreachable chunks and stale siblings')
+    parser.add_argument('--verbose', action='store_true', help='also list reachable chunks and why')
+    parser.add_argument('--json', type=Path, metavar='FILE', help='write the report as JSON')
+    args = parser.parse_args(argv)
+
+    root = args.root.resolve()
+    graph = Graph(root, args.html_only)
+    reached = graph.reachable()
+    dead = [c for c in graph.chunks if c not in reached]
+    stale = stale_siblings(root)
+    missing = sorted(n for n in reached if n.startswith(STATIC_DIR + '/') and not (root / n).exists())
+
+    def size(rel):
+        return (root / rel).stat().st_size
+
+    if args.verbose:
+        for chunk in graph.chunks:
+            if chunk in reached:
+                print(f"KEEP {chunk} (via {reached[chunk]})")
+    for chunk in dead:
+        print(f"UNREACHABLE {chunk} ({size(chunk) / 1024:.1f} KiB)")
+    for path in stale:
+        print(f"STALE {rel_path(path, root)} ({path.stat().st_size / 1024:.1f} KiB)")
+    for rel in missing:
+        print(f"MISSING {rel} (referenced from {reached[rel]})")
+
+    dead_bytes = sum(size(c) for c in dead)
+    stale_bytes = sum(p.stat().st_size for p in stale)
+    print('\nSummary:')
+    print(f"Chunks: {len(graph.chunks)}, reachable {len(graph.chunks) - len(dead)}, "
+          f"unreachable {len(dead)} ({dead_bytes / 1024:.1f} KiB)")
+    print(f"Stale siblings: {len(stale)} ({stale_bytes / 1024:.1f} KiB)")
+
+    if args.json:
+        report = {
+            'html_only': args.html_only,
+            'reachable': {c: reached[c] for c in graph.chunks if c in reached},
+            'unreachable': {c: size(c) for c in dead},
+            'stale': {rel_path(p, root): p.stat().st_size for p in stale},
+            'missing': missing,
+        }
+        args.json.write_text(json.dumps(report, indent=1) + '\n', encoding='utf-8')
+
+    if args.remove and (dead or stale):
+        session = Session('prune_chunks', root)
+        doomed = [root / c for c in dead] + stale
+        # Pre-compressed sidecars (precompress.py) go with their chunk.
+        doomed += [p.with_name(p.name + ext) for p in doomed for ext in SIDECAR_EXTS
+                   if p.with_name(p.name + ext).exists()]
+        for path in doomed:
+            session.record(path)
+            path.unlink()
+        snapshot_id = session.close()
+        print(f"Removed {len(doomed)} file(s); originals in backup snapshot {snapshot_id}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
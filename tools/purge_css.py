@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""Purge unused rules from the Tailwind stylesheet and inline each page's critical CSS.
+
+What it does:
+- Collects the class names each page uses: class attributes in the .html,
+  string literals in its inline scripts (the menu script toggles `hidden`,
+  `opacity-0`, ...), and className strings in the route's index.txt payload.
+- Writes one purged copy of every linked _next/static/css/ stylesheet, keeping
+  only rules whose selectors can match the union of those classes, under a
+  content-hashed name next to the original.
+- Inlines, per page, the purged rules needed above the fold (everything up to
+  the end of the first <section> or <header> in <body>) as
+  <style data-critical> in <head>, and turns the stylesheet <link> into an
+  async preload (with a <noscript> fallback) of the purged file.
+
+Rules whose classes appear only inside :not()/:is()/:where()/:has(), and rules
+without any class selector (preflight, element styles), are always kept.
+@keyframes, @font-face, @import and /*! license */ comments are kept in the
+purged file; @media and @supports blocks are purged recursively.
+_next/static/css/purge-manifest.json maps each purged file back to its
+source, so reruns start from the original.
+
+Usage:
+    python tools/purge_css.py --dry-run
+    python tools/purge_css.py --safelist dark,open
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import re
+import sys
+from pathlib import Path
+
+import flight
+from htmltok import tag_attrs, tokenize
+from treeio import ROOT, is_artifact, is_site_file, iter_files, rel_path
+
+CSS_URL = '/_next/static/css/'
+MANIFEST_NAME = 'purge-manifest.json'
+FOLD_BYTES = 16384
+FOLD_TAGS = ('/section', '/header')
+CONDITIONAL_AT_RULES = ('@media', '@supports')
+
+# Functional pseudo-classes whose arguments do not have to match anything.
+FUNCTIONAL_PSEUDO = re.compile(r':(?:not|is|where|has|matches)\((?:[^()]|\([^()]*\))*\)')
+ATTRIBUTE_SELECTOR = re.compile(r'(?<!\\)\[(?:\\.|[^\]\\])*\]')
+CLASS_SELECTOR = re.compile(r'\.((?:\\[0-9a-fA-F]{1,6}\s?|\\.|[\w-]|[^\x00-\x7f])+)')
+CSS_ESCAPE = re.compile(r'\\([0-9a-fA-F]{1,6}\s?|.)')
+# Quoted strings in inline scripts that look like lists of class names.
+JS_STRING = re.compile(r'''(['"`])([\w:/.\[\]%#-]+(?:\s+[\w:/.\[\]%#-]+)*)\1''')
+STYLE_LINK = re.compile(r'<link\b[^>]*>', re.I)
+CRITICAL_STYLE = re.compile(r'<style data-critical[^>]*>.*?</style>\s*', re.S)
+NOSCRIPT_LINK = re.compile(r'\s*<noscript><link rel="stylesheet" href="[^"]*"\s*/?></noscript>')
+
+
+# --- CSS ------------------------------------------------------------------
+
+class Rule:
+    """A style rule, an at-rule statement, a block at-rule (children set for @media/@supports),
+    or a preserved /*! ... */ comment."""
+
+    def __init__(self, prelude: str, body: str = None, children: list = None):
+        self.prelude = prelude
+        self.body = body
+        self.children = children
+
+    @property
+    def is_style(self) -> bool:
+        return not self.prelude.startswith(('@', '/*'))
+
+    def css(self) -> str:
+        if self.prelude.startswith('/*'):
+            return self.prelude
+        if self.children is not None:
+            return self.prelude + '{' + ''.join(r.css() for r in self.children) + '}'
+        if self.body is None:
+            return self.prelude + ';'
+        return self.prelude + '{' + self.body + '}'
+
+
+def _skip(css: str, i: int, stop: str) -> int:
+    """Index of the first character in stop at nesting depth 0, skipping strings and comments."""
+    depth = 0
+    n = len(css)
+    while i < n:
+        c = css[i]
+        if c in '"\'':
+            i += 1
+            while i < n and css[i] != c:
+                i += 2 if css[i] == '\\' else 1
+        elif c == '/' and css.startswith('/*', i):
+            i = css.find('*/', i + 2)
+            if i < 0:
+                return n
+            i += 1
+        elif c == '\\':
+            i += 1
+        elif depth == 0 and c in stop:
+            return i
+        elif c in '{(':
+            depth += 1
+        elif c in '})':
+            depth -= 1
+        i += 1
+    return n
+
+
+def parse_css(css: str) -> list:
+    rules = []
+    i = 0
+    n = len(css)
+    while i < n:
+        while i < n and css[i].isspace():
+            i += 1
+        if css.startswith('/*', i):
+            end = css.find('*/', i + 2)
+            end = n if end < 0 else end + 2
+            if css[i + 2:end].lstrip().startswith('!'):
+                # License banner (Tailwind's "/*! tailwindcss v3 ..." ).
+                rules.append(Rule(css[i:end]))
+            i = end
+            continue
+        if i >= n:
+            break
+        j = _skip(css, i, '{;}')
+        prelude = css[i:j].strip()
+        if j >= n or css[j] in ';}':
+            if prelude:
+                rules.append(Rule(prelude))
+            i = j + 1
+            continue
+        end = _skip(css, j + 1, '}')
+        inner = css[j + 1:end]
+        if prelude.lower().startswith(CONDITIONAL_AT_RULES):
+            rules.append(Rule(prelude, children=parse_css(inner)))
+        else:
+            rules.append(Rule(prelude, inner))
+        i = end + 1
+    return rules
+
+
+def split_selectors(prelude: str) -> list:
+    parts = []
+    i = 0
+    while i <= len(prelude):
+        j = _skip(prelude, i, ',')
+        parts.append(prelude[i:j].strip())
+        i = j + 1
+    return parts
+
+
+def _unescape(match) -> str:
+    value = match.group(1)
+    if len(value) > 1 or value in '0123456789abcdefABCDEF':
+        return chr(int(value.strip(), 16))
+    return value
+
+
+def required_classes(selector: str) -> set:
+    selector = ATTRIBUTE_SELECTOR.sub('', selector)
+    selector = FUNCTIONAL_PSEUDO.sub('', selector)
+    return {CSS_ESCAPE.sub(_unescape, m.group(1)) for m in CLASS_SELECTOR.finditer(selector)}
+
+
+def purge(rules: list, used: set, keep_at_rules: bool = True) -> list:
+    """Rules (and selectors of rules) that can match the used classes."""
+    out = []
+    for rule in rules:
+        if rule.children is not None:
+            children = purge(rule.children, used, keep_at_rules)
+            if children:
+                out.append(Rule(rule.prelude, children=children))
+        elif rule.is_style:
+            selectors = [s for s in split_selectors(rule.prelude) if required_classes(s) <= used]
+            if selectors:
+                out.append(Rule(','.join(selectors), rule.body))
+        elif keep_at_rules:
+            out.append(rule)
+    return out
+
+
+def serialize(rules: list) -> str:
+    return ''.join(r.css() for r in rules)
+
+
+# --- class collection -------------------------------------------------------
+
+def _payload_classes(value, classes: set):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key == 'className' and isinstance(item, str):
+                classes.update(item.split())
+            else:
+                _payload_classes(item, classes)
+    elif isinstance(value, list):
+        for item in value:
+            _payload_classes(item, classes)
+
+
+def payload_classes(payload: Path) -> set:
+    classes = set()
+    if not payload.exists():
+        return classes
+    with open(payload, encoding='utf-8', errors='replace') as f:
+        if not flight.is_payload(f.read(64)):
+            return classes
+    for row in flight.iter_rows(flight.read_chunks(payload)):
+        if not row.is_blank and not row.is_text and b'className' in row.body:
+            _payload_classes(row.value, classes)
+    return classes
+
+
+class PageClasses:
+    """Classes used on one page, and the subset used above the fold."""
+
+    def __init__(self, text: str, fold_bytes: int = FOLD_BYTES):
+        self.all = set()
+        self.critical = set()
+        in_body = False
+        folded = False
+        body_start = None
+        offset = 0
+        for tok in tokenize([text]):
+            if tok.kind == 'tag' and not tok.name.startswith('/'):
+                if tok.name == 'body':
+                    in_body = True
+                    body_start = offset
+                classes = (tag_attrs(tok.data).get('class') or '').split()
+                self.all.update(classes)
+                if not folded:
+                    self.critical.update(classes)
+            elif tok.kind == 'raw' and tok.name == 'script':
+                found = {c for m in JS_STRING.finditer(tok.data) for c in m.group(2).split()}
+                self.all.update(found)
+                if not folded:
+                    self.critical.update(found)
+            offset += len(tok.data)
+            if in_body and not folded:
+                folded = tok.name in FOLD_TAGS or offset - body_start > fold_bytes
+
+
+# --- pages ----------------------------------------------------------------
+
+def stylesheet_links(text: str):
+    """(match, href) for each <link> loading a _next/static/css/ stylesheet."""
+    for m in STYLE_LINK.finditer(text):
+        attrs = tag_attrs(m.group(0))
+        rel = (attrs.get('rel') or '').lower()
+        href = attrs.get('href') or ''
+        is_style = rel == 'stylesheet' or (rel == 'preload' and (attrs.get('as') or '').lower() == 'style')
+        if is_style and href.startswith(CSS_URL) and href.endswith('.css'):
+            yield m, href
+
+
+def rewrite_page(text: str, hrefs: dict, critical_css: str) -> str:
+    """Inline critical_css and load each stylesheet asynchronously from hrefs[old href]."""
+    text = CRITICAL_STYLE.sub('', text)
+    text = NOSCRIPT_LINK.sub('', text)
+    parts = []
+    last = 0
+    inlined = False
+    for m, href in list(stylesheet_links(text)):
+        new = hrefs.get(href, href)
+        line_start = text.rfind('\n', 0, m.start()) + 1
+        indent = text[line_start:m.start()]
+        newline = '\r\n' if text[line_start - 2:line_start] == '\r\n' else '\n'
+        sep = newline + indent if not indent.strip() and line_start else ''
+        pieces = []
+        if not inlined and critical_css:
+            pieces.append(f'<style data-critical="">{critical_css}</style>')
+            inlined = True
+        pieces.append(f'<link rel="preload" as="style" href="{new}" '
+                      f'onload="this.onload=null;this.rel=\'stylesheet\'" />')
+        pieces.append(f'<noscript><link rel="stylesheet" href="{new}" /></noscript>')
+        parts.append(text[last:m.start()])
+        parts.append(sep.join(pieces))
+        last = m.end()
+    parts.append(text[last:])
+    return ''.join(parts)
+
+
+def gz_size(data: bytes) -> int:
+    return len(gzip.compress(data, 9, mtime=0))
+
+
+def load_manifest(css_dir: Path) -> dict:
+    path = css_dir / MANIFEST_NAME
+    if path.exists():
+        return json.loads(path.read_text(encoding='utf-8'))
+    return {}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--root', type=Path, default=ROOT, help='tree to process (default: repository root)')
+    parser.add_argument('--dry-run', action='store_true', help='report sizes without writing anything')
+    parser.add_argument('--safelist', default='', help='comma-separated classes to keep even if unused')
+    parser.add_argument('--fold-bytes', type=int, default=FOLD_BYTES,
+                        help=f'body markup treated as above the fold when no <section> ends first (default: {FOLD_BYTES})')
+    parser.add_argument('--no-critical', action='store_true', help='only purge and relink; inline nothing')
+    args = parser.parse_args(argv)
+
+    root = args.root.resolve()
+    css_dir = root / CSS_URL.strip('/')
+    manifest = load_manifest(css_dir)
+    safelist = {c for c in args.safelist.split(',') if c}
+
+    pages = {}
+    for path in iter_files(root):
+        rel = rel_path(path, root)
+        if path.suffix.lower() != '.html' or not is_site_file(rel) or is_artifact(rel):
+            continue
+        text = path.read_bytes().decode('utf-8')
+        links = [href for _, href in stylesheet_links(text)]
+        if not links:
+            continue
+        classes = PageClasses(text, args.fold_bytes)
+        if path.name == 'index.html':
+            classes.all |= payload_classes(path.with_name('index.txt'))
+        pages[path] = (text, links, classes)
+
+    # Purged files map back to their source, so every run purges the original.
+    sources = {}
+    for _, links, _ in pages.values():
+        for href in links:
+            name = href[len(CSS_URL):]
+            sources[href] = CSS_URL + manifest.get(name, name)
+    used = set(safelist).union(*(c.all for _, _, c in pages.values())) if pages else set(safelist)
+
+    hrefs = {}
+    parsed = {}
+    outputs = {}
+    for source in sorted(set(sources.values())):
+        path = css_dir / source[len(CSS_URL):]
+        if not path.exists():
+            print(f"Missing stylesheet: {source}")
+            continue
+        original = path.read_bytes()
+        parsed[source] = parse_css(original.decode('utf-8'))
+        purged = serialize(purge(parsed[source], used)).encode('utf-8')
+        name = hashlib.sha256(purged).hexdigest()[:16] + '.css'
+        outputs[source] = (name, purged)
+        print(f"{source}: {len(original)} -> {len(purged)} bytes "
+              f"(gzip {gz_size(original)} -> {gz_size(purged)}), {len(used)} classes in use")
+    for href, source in sources.items():
+        if source in outputs:
+            hrefs[href] = CSS_URL + outputs[source][0]
+
+    if not args.dry_run:
+        current = set()
+        for source, (name, purged) in outputs.items():
+            (css_dir / name).write_bytes(purged)
+            manifest[name] = source[len(CSS_URL):]
+            current.add(name)
+        # Earlier outputs are deleted but stay in the manifest, so a page still
+        # linking one resolves to its source on the next run.
+        for name in set(manifest) - current:
+            (css_dir / name).unlink(missing_ok=True)
+        (css_dir / MANIFEST_NAME).write_text(json.dumps(manifest, indent=1, sort_keys=True) + '\n', encoding='utf-8')
+
+    print()
+    changed = 0
+    for path, (text, links, classes) in pages.items():
+        critical = ''
+        if not args.no_critical:
+            page_sources = {sources[h] for h in links if sources[h] in parsed}
+            critical = ''.join(serialize(purge(parsed[s], classes.critical | safelist, keep_at_rules=False))
+                               for s in sorted(page_sources))
+        new_text = rewrite_page(text, hrefs, critical)
+        blocking = sum(len(outputs[s][1]) for s in {sources[h] for h in links} if s in outputs)
+        if new_text != text:
+            changed += 1
+            if not args.dry_run:
+                path.write_bytes(new_text.encode('utf-8'))
+        status = 'UNCHANGED' if new_text == text else ('WOULD UPDATE' if args.dry_run else 'UPDATED')
+        print(f"{status} {rel_path(path, root)} (critical {len(critical.encode('utf-8'))} bytes inline, "
+              f"{blocking} bytes deferred)")
+
+    print('\nSummary:')
+    print(f"Pages {'to update' if args.dry_run else 'updated'}: {changed} of {len(pages)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
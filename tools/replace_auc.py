@@ -2,46 +2,51 @@
 import sys
 from pathlib import Path
 
-# Files to update
-files = [
-    Path(__file__).resolve().parents[1] / 'carefuse' / 'index.html',
-    Path(__file__).resolve().parents[1] / 'index.html',
-    Path(__file__).resolve().parents[1] / 'carefuse' / 'index.txt',
-    Path(__file__).resolve().parents[1] / 'index.txt',
-]
-
-replacements = [
-    ('Achieved ~0.87 AUC with robust calibration techniques', 'Achieved ~0.93 AUC with robust calibration techniques'),
-    ('Achieved ~0.87 AUC', 'Achieved ~0.93 AUC'),
-    ('~0.87', '~0.93'),
-    ('≈ 0.87', '≈ 0.93'),
-    ('AUC ≈ 0.87', 'AUC ≈ 0.93'),
-    ('AUC ≈0.87', 'AUC ≈0.93'),
-    ('0.87 AUC', '0.93 AUC'),
-]
-
-changed = []
-for fp in files:
-    if not fp.exists():
-        print(f"Missing: {fp}")
-        continue
-    text = fp.read_text(encoding='utf-8')
-    original = text
-    for a,b in replacements:
-        text = text.replace(a,b)
-    if text != original:
-        fp.write_text(text, encoding='utf-8')
-        changed.append(str(fp))
-        print(f"Updated: {fp}")
+from multireplace import load_rule_set
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Target files and (old, new) pairs live in replace_rules.json under "auc".
+RULES = load_rule_set('auc')
+
+# Manifest key for pipeline --incremental; bump the rule set's version whenever the output changes.
+TRANSFORM_NAME = 'auc'
+TRANSFORM_VERSION = RULES.version
+
+# Files to update, relative to the repository root
+FILES = RULES.files
+
+
+def replace_auc(text: str) -> str:
+    return RULES.sub(text)
+
+
+def main():
+    changed = []
+    for fp in (ROOT / f for f in FILES):
+        if not fp.exists():
+            print(f"Missing: {fp}")
+            continue
+        text = fp.read_text(encoding='utf-8')
+        original = text
+        text = replace_auc(text)
+        if text != original:
+            fp.write_text(text, encoding='utf-8')
+            changed.append(str(fp))
+            print(f"Updated: {fp}")
+        else:
+            print(f"No changes for: {fp}")
+
+    print('\nSummary:')
+    print(f"Files changed: {len(changed)}")
+    for p in changed:
+        print(' -', p)
+
+    if not changed:
+        sys.exit(2)
     else:
-        print(f"No changes for: {fp}")
+        sys.exit(0)
 
-print('\nSummary:')
-print(f"Files changed: {len(changed)}")
-for p in changed:
-    print(' -', p)
 
-if not changed:
-    sys.exit(2)
-else:
-    sys.exit(0)
+if __name__ == '__main__':
+    main()
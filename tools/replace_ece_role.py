@@ -1,28 +1,39 @@
 #!/usr/bin/env python3
 from pathlib import Path
 
+from multireplace import load_rule_set
+
 workspace = Path(__file__).resolve().parents[1]
-files = [
-    workspace / 'campus-involvement' / 'index.txt',
-    workspace / 'campus-involvement' / 'index.html',
-    workspace / 'images' / 'pasted_content.txt',
-]
-replacements = [
-    ('Ambassador and Mentor', 'President and Mentor'),
-    ('Ambassador and mentor', 'President and mentor'),
-    ('Your role: Ambassador', 'Your role: President'),
-]
-
-for fp in files:
-    if not fp.exists():
-        print('Missing:', fp)
-        continue
-    text = fp.read_text(encoding='utf-8')
-    orig = text
-    for a,b in replacements:
-        text = text.replace(a,b)
-    if text != orig:
-        fp.write_text(text, encoding='utf-8')
-        print('Updated:', fp)
-    else:
-        print('No change:', fp)
+
+# Target files and (old, new) pairs live in replace_rules.json under "ece-role".
+RULES = load_rule_set('ece-role')
+
+# Manifest key for pipeline --incremental; bump the rule set's version whenever the output changes.
+TRANSFORM_NAME = 'ece-role'
+TRANSFORM_VERSION = RULES.version
+
+# Files to update, relative to the repository root
+FILES = RULES.files
+
+
+def replace_role(text: str) -> str:
+    return RULES.sub(text)
+
+
+def main():
+    for fp in (workspace / f for f in FILES):
+        if not fp.exists():
+            print('Missing:', fp)
+            continue
+        text = fp.read_text(encoding='utf-8')
+        orig = text
+        text = replace_role(text)
+        if text != orig:
+            fp.write_text(text, encoding='utf-8')
+            print('Updated:', fp)
+        else:
+            print('No change:', fp)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,74 +1,46 @@
 #!/usr/bin/env python3
-"""Replace '><' with '>\n<' outside of script/style blocks using span tracking.
+"""Replace '><' with '>\n<' outside of script/style blocks using the shared tokenizer.
 
-This is conservative and only touches text outside <script>...</script> and <style>...</style>.
+This is conservative and only touches text outside <script>...</script> and <style>...</style>;
+block boundaries come from htmltok.py rather than a DOTALL regex over the whole page.
+A leading DOCTYPE line is kept as is, CRLF is normalized, and each file is
+streamed through in one pass. fix_index_html_by_state.py and
+force_pretty_index_html.py are aliases for this script.
 """
-import re
+import argparse
 from pathlib import Path
 
-ROOT = Path(__file__).resolve().parents[1]
-
-BLOCK_RE = re.compile(r'(?i)(<script\b[^>]*?>.*?</script\s*>|<style\b[^>]*?>.*?</style\s*>)', re.DOTALL)
+from htmltok import prettify_chunks
+from manifest import Manifest, add_incremental_arguments
+from treeio import add_jobs_argument, resolve_jobs, rewrite_index_html
 
+ROOT = Path(__file__).resolve().parents[1]
 
-def process(text: str) -> str:
-    out_parts = []
-    last = 0
-    for m in BLOCK_RE.finditer(text):
-        start, end = m.span()
-        # process outside block
-        outside = text[last:start]
-        outside = outside.replace('><', '>' + '\n' + '<')
-        out_parts.append(outside)
-        # append the block unchanged
-        out_parts.append(text[start:end])
-        last = end
-    # tail
-    tail = text[last:]
-    tail = tail.replace('><', '>' + '\n' + '<')
-    out_parts.append(tail)
-    return ''.join(out_parts)
+# Manifest key for --incremental; bump the version whenever the output changes.
+TRANSFORM_NAME = 'pretty-blocks'
+TRANSFORM_VERSION = 1
 
 
-def prettify_file(path: Path) -> bool:
-    try:
-        raw = path.read_text(encoding='utf-8')
-    except Exception as e:
-        print(f"SKIP {path} (read error: {e})")
-        return False
-    # Keep DOCTYPE line at top if present
-    stripped = raw.lstrip()
-    prefix = ''
-    if stripped.lower().startswith('<!doctype'):
-        first_line, _, rest = stripped.partition('\n')
-        prefix = first_line.strip() + '\n'
-        body = rest
-    else:
-        body = raw
+def prettify_text(raw: str) -> str:
+    return ''.join(prettify_chunks(raw))
 
-    new_body = process(body)
-    new_text = prefix + new_body
-    new_text = new_text.replace('\r\n', '\n')
 
-    if new_text != raw.replace('\r\n', '\n'):
-        path.write_text(new_text, encoding='utf-8')
-        print(f"UPDATED {path}")
-        return True
-    else:
-        print(f"UNCHANGED {path}")
-        return False
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_jobs_argument(parser)
+    add_incremental_arguments(parser)
+    args = parser.parse_args(argv)
 
+    manifest = Manifest(ROOT, args.manifest) if args.incremental else None
+    paths, changed = rewrite_index_html(prettify_chunks, ROOT, resolve_jobs(args.jobs), manifest,
+                                        {TRANSFORM_NAME: TRANSFORM_VERSION}, streaming=True)
 
-def main():
-    changed = []
-    for path in sorted(ROOT.rglob('index.html')):
-        if prettify_file(path):
-            changed.append(str(path))
     print('\nSummary:')
-    print(f"Total files checked: {len(list(ROOT.rglob('index.html'))) }")
+    print(f"Total files checked: {len(paths)}")
     print(f"Total updated: {len(changed)}")
     for p in changed:
         print(' -', p)
 
+
 if __name__ == '__main__':
     main()
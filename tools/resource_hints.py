@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""Give each page's images loading and priority hints that match where they render.
+
+Per page, images are taken in document order and split at the fold: the end
+of the first <section> or <header> in <body> (the same fold purge_css.py
+inlines critical CSS for), the first 16 KiB of body markup, or once the
+estimated height of the content so far (declared image heights, text at
+60 characters per 24px line, one line per block element) exceeds one
+viewport. At most two images count as above the fold.
+
+- The largest image above the fold (by declared width x height, at least
+  64x64) that the page does not already load lazily is the likely LCP
+  element: it gets fetchpriority="high", decoding="async" and a matching
+  <link rel="preload" as="image"> in <head> (with imagesrcset/imagesizes
+  when the <img> has srcset/sizes; none inside a <picture> with <source>s,
+  where a preload could fetch the wrong candidate).
+- Other images above the fold get decoding="async" and keep their loading
+  attribute.
+- Everything below the fold gets loading="lazy" and decoding="async", and
+  loses fetchpriority="high".
+- Image preloads in <head> that do not match the chosen image, or repeat
+  one, are removed.
+
+No image is made eager, so a page's first-visit transfer (as page_weight.py
+counts it) never goes up; main() refuses to write a page where it would.
+Images in <noscript> and images without a src are left alone. The transform
+is idempotent and is also the pipeline stage 'hints' (not run by default).
+
+Usage:
+    python tools/resource_hints.py --dry-run
+    python tools/resource_hints.py
+"""
+import argparse
+import html
+import re
+import sys
+from pathlib import Path
+
+from htmltok import remove_attr, set_attr, tag_attrs, tokenize
+from page_weight import page_requests
+from purge_css import FOLD_BYTES, FOLD_TAGS
+from snapshot import Session
+from treeio import ROOT, is_artifact, is_site_file, iter_files, rel_path
+
+# Manifest key for --incremental; bump the version whenever the output changes.
+TRANSFORM_NAME = 'hints'
+TRANSFORM_VERSION = 2
+
+HTML_EXTS = ('.html', '.htm')
+VIEWPORT_HEIGHT = 900
+MIN_HERO_AREA = 64 * 64
+MAX_ABOVE_FOLD = 2
+LINE_HEIGHT = 24
+CHARS_PER_LINE = 60
+BLOCK_TAGS = frozenset(('p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'tr', 'br', 'hr', 'blockquote', 'figcaption'))
+TRAILING_INDENT = re.compile(r'\n?[ \t]*$')
+
+
+def _dimension(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_image_preload(attrs: dict) -> bool:
+    rels = (attrs.get('rel') or '').lower().split()
+    return 'preload' in rels and (attrs.get('as') or '').lower() == 'image'
+
+
+class Image:
+    def __init__(self, index: int, attrs: dict, in_picture: bool):
+        self.index = index
+        self.src = html.unescape(attrs.get('src') or '')
+        self.srcset = attrs.get('srcset')
+        self.sizes = attrs.get('sizes')
+        self.width = _dimension(attrs.get('width'))
+        self.height = _dimension(attrs.get('height'))
+        self.in_picture = in_picture
+        self.lazy = (attrs.get('loading') or '').lower() == 'lazy'
+        self.above = False
+
+    @property
+    def area(self) -> int:
+        return (self.width or 0) * (self.height or 0)
+
+
+def plan(tokens):
+    """(images keyed by token index, hero image or None, [(token index, attrs)] of head image preloads)."""
+    images = {}
+    preloads = []
+    in_head = in_body = folded = False
+    in_noscript = 0
+    picture_sources = []
+    body_start = offset = 0
+    height = above = 0
+    for i, tok in enumerate(tokens):
+        if tok.kind == 'tag':
+            name = tok.name
+            if name == 'head':
+                in_head = True
+            elif name in ('/head', 'body'):
+                in_head = False
+                if name == 'body':
+                    in_body, body_start = True, offset
+            elif name == 'noscript':
+                in_noscript += 1
+            elif name == '/noscript':
+                in_noscript = max(0, in_noscript - 1)
+            elif name == 'picture':
+                picture_sources.append(False)
+            elif name == '/picture' and picture_sources:
+                picture_sources.pop()
+            elif name == 'source' and picture_sources:
+                picture_sources[-1] = True
+            elif name == 'link' and in_head:
+                attrs = tag_attrs(tok.data)
+                if _is_image_preload(attrs):
+                    preloads.append((i, attrs))
+            elif name == 'img' and in_body and not in_noscript:
+                img = Image(i, tag_attrs(tok.data), bool(picture_sources and picture_sources[-1]))
+                if img.src:
+                    img.above = not folded
+                    if img.above:
+                        above += 1
+                        height += img.height or 0
+                    images[i] = img
+            elif name in BLOCK_TAGS and in_body:
+                height += LINE_HEIGHT
+        elif tok.kind == 'text' and in_body and not in_noscript:
+            chars = len(' '.join(tok.data.split()))
+            height += -(-chars // CHARS_PER_LINE) * LINE_HEIGHT
+        offset += len(tok.data)
+        if in_body and not folded:
+            folded = (tok.name in FOLD_TAGS or offset - body_start > FOLD_BYTES
+                      or height >= VIEWPORT_HEIGHT or above >= MAX_ABOVE_FOLD)
+    candidates = [img for img in images.values() if img.above and not img.lazy and img.area >= MIN_HERO_AREA]
+    # max() keeps the first of equally large images.
+    hero = max(candidates, key=lambda img: img.area) if candidates else None
+    return images, hero, preloads
+
+
+def image_tag(tag: str, img: Image, hero: Image) -> str:
+    if img is hero:
+        tag = set_attr(tag, 'fetchpriority', 'high')
+    elif not img.above:
+        tag = set_attr(tag, 'loading', 'lazy')
+    if img is not hero and (tag_attrs(tag).get('fetchpriority') or '').lower() == 'high':
+        tag = remove_attr(tag, 'fetchpriority')
+    return set_attr(tag, 'decoding', 'async')
+
+
+def preload_tag(hero: Image, tag: str = None) -> str:
+    """A preload for hero: the existing tag updated, or a new one."""
+    if tag is None:
+        tag = '<link rel="preload" as="image" />'
+    tag = set_attr(tag, 'href', html.escape(hero.src))
+    for name, value in (('imagesrcset', hero.srcset), ('imagesizes', hero.sizes)):
+        tag = set_attr(tag, name, value) if value else remove_attr(tag, name)
+    return set_attr(tag, 'fetchpriority', 'high')
+
+
+def hint_page(text: str):
+    """(new text, report dict) for one page."""
+    tokens = list(tokenize([text]))
+    images, hero, preloads = plan(tokens)
+    report = {'hero': hero.src if hero else None, 'eager': 0, 'lazy': 0, 'preloads_removed': 0, 'preload_added': False}
+    wanted = hero is not None and not hero.in_picture
+    keep = None
+    for i, attrs in preloads:
+        if wanted and keep is None and html.unescape(attrs.get('href') or '') == hero.src:
+            keep = i
+    if wanted and keep is None and preloads:
+        # Reuse the first stale preload's place for the new one.
+        keep = preloads[0][0]
+        report['preload_added'] = True
+    drop = {i for i, _ in preloads if i != keep}
+    report['preloads_removed'] = len(drop)
+    insert_at = None
+    if wanted and keep is None:
+        report['preload_added'] = True
+        insert_at = next((i for i, tok in enumerate(tokens)
+                          if tok.name == 'link' and 'stylesheet' in (tag_attrs(tok.data).get('rel') or '').lower().split()),
+                         next((i for i, tok in enumerate(tokens) if tok.name == '/head'), None))
+
+    out = []
+    for i, tok in enumerate(tokens):
+        if i == insert_at:
+            indent = TRAILING_INDENT.search(out[-1]).group(0) if out else ''
+            out.append(preload_tag(hero) + (indent if indent.startswith('\n') else ''))
+        if i in drop:
+            if out:
+                # Take the removed tag's line with it.
+                out[-1] = TRAILING_INDENT.sub('', out[-1])
+            continue
+        if i == keep:
+            out.append(preload_tag(hero, tok.data))
+        elif i in images:
+            img = images[i]
+            report['lazy' if img.lazy or not img.above else 'eager'] += 1
+            out.append(image_tag(tok.data, img, hero))
+        else:
+            out.append(tok.data)
+    return ''.join(out), report
+
+
+def hint_text(text: str) -> str:
+    return hint_page(text)[0]
+
+
+def eager_images(text: str) -> set:
+    """Image URLs a first visit to the page fetches, as page_weight.py counts them."""
+    return {url for url, kind, eager in page_requests(text) if kind == 'image' and eager}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--root', type=Path, default=ROOT, help='tree to process (default: repository root)')
+    parser.add_argument('--dry-run', action='store_true', help='report what would change without writing')
+    args = parser.parse_args(argv)
+
+    root = args.root.resolve()
+    session = Session('resource_hints', root)
+    pages = changed = 0
+    for path in iter_files(root):
+        rel = rel_path(path, root)
+        if not rel.lower().endswith(HTML_EXTS) or not is_site_file(rel) or is_artifact(rel):
+            continue
+        raw = path.read_bytes()
+        try:
+            text = raw.decode('utf-8')
+        except UnicodeDecodeError as e:
+            print(f"SKIP {rel} (read error: {e})")
+            continue
+        pages += 1
+        new_text, report = hint_page(text)
+        detail = (f"hero {report['hero'] or '-'}, {report['eager']} eager, {report['lazy']} lazy"
+                  + (', preload added' if report['preload_added'] else '')
+                  + (f", {report['preloads_removed']} preload(s) removed" if report['preloads_removed'] else ''))
+        if new_text == text:
+            print(f"UNCHANGED {rel} ({detail})")
+            continue
+        added = eager_images(new_text) - eager_images(text)
+        if added:
+            print(f"SKIP {rel} (would load {', '.join(sorted(added))} on first visit)")
+            continue
+        changed += 1
+        print(f"{'WOULD UPDATE' if args.dry_run else 'UPDATED'} {rel} ({detail})")
+        if not args.dry_run:
+            session.record(path, raw)
+            path.write_bytes(new_text.encode('utf-8'))
+    snapshot_id = session.close()
+
+    print('\nSummary:')
+    print(f"Pages {'to update' if args.dry_run else 'updated'}: {changed} of {pages}")
+    if snapshot_id:
+        print(f"Backup snapshot: {snapshot_id}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
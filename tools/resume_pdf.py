@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""Keep one canonical resume PDF, optimised for the web, and point every alias at it.
+
+The canonical file is the one site-config.json serves (resumePdfPath, with
+any fingerprint.py hash stripped): resume/Yuri_Braga_Resume.pdf. From it:
+
+- The PDF is linearized ("fast web view"), so viewers show the first page
+  while the rest downloads, and re-saved with object streams and maximum
+  Flate compression; JPEG images are re-encoded (--jpeg-quality) and kept
+  only when smaller. The result replaces the canonical file only if it is
+  smaller or newly linearized.
+- public/resume/ gets the same bytes (the source-tree mirror).
+- The aliases listed in site-config.json under resumeAliases (older copies
+  such as ML_resume.pdf) are overwritten with the canonical bytes, so old
+  external links get the current resume, or deleted with --remove-aliases.
+  Every page, payload and stylesheet reference to an alias is rewritten to
+  resumePdfPath in the same pass.
+
+Pass a new PDF to replace the resume first (scripts/update-resume.js does).
+Optimisation uses pikepdf (pip install pikepdf; Pillow for the JPEG step)
+or, failing that, the qpdf command; without either the file is copied as is.
+Rerun fingerprint.py afterwards if resumePdfPath is a hashed name.
+
+Usage:
+    python tools/resume_pdf.py --dry-run
+    python tools/resume_pdf.py ~/Downloads/resume.pdf
+"""
+import argparse
+import io
+import json
+import posixpath
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from check_links import LinkIndex, scan, site_host
+from fingerprint import Rewriter, rewrite_file
+from snapshot import Session
+from treeio import ROOT
+
+try:
+    import pikepdf
+except ImportError:  # optional dependency, qpdf or a plain copy otherwise
+    pikepdf = None
+
+try:
+    from PIL import Image
+except ImportError:  # optional dependency, JPEG re-encoding is skipped without it
+    Image = None
+
+CONFIG_NAME = 'site-config.json'
+DEFAULT_PDF_PATH = '/resume/Yuri_Braga_Resume.pdf'
+MIRROR_DIR = 'public/resume'
+JPEG_QUALITY = 85
+FINGERPRINT = re.compile(r'\.[0-9a-f]{12}(\.pdf)$', re.I)
+PDF_MAGIC = b'%PDF-'
+
+
+def load_config(root: Path) -> dict:
+    return json.loads((root / CONFIG_NAME).read_text(encoding='utf-8'))
+
+
+def canonical_rel(pdf_path: str) -> str:
+    """Repository path of the canonical file for a served resumePdfPath."""
+    return FINGERPRINT.sub(r'\1', pdf_path.strip().lstrip('/'))
+
+
+def is_linearized(data: bytes) -> bool:
+    # The linearization dictionary must be the first object in the file.
+    return b'/Linearized' in data[:1024]
+
+
+# --- optimisation ------------------------------------------------------------
+
+def recompress_jpegs(pdf, quality: int) -> int:
+    """Re-encode DCT images in place where that makes them smaller; returns bytes saved."""
+    saved = 0
+    for obj in pdf.objects:
+        if not isinstance(obj, pikepdf.Stream) or obj.get('/Subtype') != '/Image':
+            continue
+        if obj.get('/Filter') != '/DCTDecode' or '/SMask' in obj or '/Decode' in obj:
+            continue
+        raw = obj.read_raw_bytes()
+        try:
+            img = Image.open(io.BytesIO(raw))
+            if img.mode not in ('RGB', 'L'):
+                continue
+            out = io.BytesIO()
+            img.save(out, 'JPEG', quality=quality, optimize=True, progressive=True)
+        except OSError:
+            continue
+        if len(out.getvalue()) < len(raw):
+            obj.write(out.getvalue(), filter=pikepdf.Name.DCTDecode)
+            saved += len(raw) - len(out.getvalue())
+    return saved
+
+
+def optimize_pikepdf(data: bytes, quality: int) -> bytes:
+    with pikepdf.open(io.BytesIO(data)) as pdf:
+        if Image is not None and quality:
+            recompress_jpegs(pdf, quality)
+        pdf.remove_unreferenced_resources()
+        out = io.BytesIO()
+        pdf.save(out, linearize=True, compress_streams=True, recompress_flate=True,
+                 stream_decode_level=pikepdf.StreamDecodeLevel.generalized,
+                 object_stream_mode=pikepdf.ObjectStreamMode.generate)
+        return out.getvalue()
+
+
+def optimize_qpdf(data: bytes, qpdf: str) -> bytes:
+    with tempfile.TemporaryDirectory() as tmp:
+        src, dst = Path(tmp) / 'in.pdf', Path(tmp) / 'out.pdf'
+        src.write_bytes(data)
+        proc = subprocess.run([qpdf, '--linearize', '--object-streams=generate', '--recompress-flate',
+                               '--compression-level=9', '--remove-unreferenced-resources=yes',
+                               str(src), str(dst)], capture_output=True, text=True)
+        # Exit status 3 means success with warnings.
+        if proc.returncode not in (0, 3):
+            raise OSError(f"qpdf failed: {proc.stderr.strip()}")
+        return dst.read_bytes()
+
+
+def optimize(data: bytes, quality: int):
+    """(optimised bytes, method); the input unchanged if no optimiser is available."""
+    if pikepdf is not None:
+        return optimize_pikepdf(data, quality), 'pikepdf'
+    qpdf = shutil.which('qpdf')
+    if qpdf:
+        return optimize_qpdf(data, qpdf), 'qpdf'
+    return data, None
+
+
+# --- aliases -------------------------------------------------------------------
+
+def alias_references(root: Path, aliases, target: str):
+    """A Rewriter moving references to the aliases onto target, and the files to run it over."""
+    index = LinkIndex(root)
+    _, sources = scan(root)
+    index.update(sources)
+    index.save()
+    rewriter = Rewriter({'/' + a: target for a in aliases}, site_host(root))
+    # Payload refs in the index are root-relative only, so every source is
+    # offered to the rewriter; files without a match are not written.
+    return rewriter, sorted(index.entries) if aliases else []
+
+
+def write(path: Path, data: bytes, session: Session, dry_run: bool) -> bool:
+    if path.exists() and path.read_bytes() == data:
+        return False
+    if not dry_run:
+        if path.exists():
+            session.record(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('pdf', nargs='?', type=Path, help='new resume to install (default: re-process the current one)')
+    parser.add_argument('--root', type=Path, default=ROOT, help='tree to process (default: repository root)')
+    parser.add_argument('--dry-run', action='store_true', help='report what would change without writing')
+    parser.add_argument('--no-optimize', action='store_true', help='install the PDF as is')
+    parser.add_argument('--jpeg-quality', type=int, default=JPEG_QUALITY,
+                        help=f'quality for re-encoded JPEG images, 0 to keep them (default: {JPEG_QUALITY})')
+    parser.add_argument('--remove-aliases', action='store_true',
+                        help='delete the alias files instead of refreshing them')
+    args = parser.parse_args(argv)
+
+    root = args.root.resolve()
+    config = load_config(root)
+    pdf_path = (config.get('resumePdfPath') or DEFAULT_PDF_PATH).strip()
+    canonical = canonical_rel(pdf_path)
+    aliases = [a.lstrip('/') for a in config.get('resumeAliases', []) if a.lstrip('/') != canonical]
+
+    source = args.pdf.resolve() if args.pdf else root / canonical
+    if not source.is_file():
+        print(f"Resume not found: {source}")
+        return 1
+    original = source.read_bytes()
+    if not original.startswith(PDF_MAGIC):
+        print(f"Not a PDF: {source}")
+        return 1
+
+    data, method = original, None
+    if not args.no_optimize:
+        try:
+            optimized, method = optimize(original, args.jpeg_quality)
+        except (OSError, RuntimeError) as e:
+            # pikepdf.PdfError is a RuntimeError.
+            print(f"Could not optimise {source.name} ({e}); installing it unchanged")
+            optimized = original
+        if method is None:
+            print('No PDF optimiser found (pip install pikepdf, or install qpdf); installing unchanged')
+        elif len(optimized) < len(original) or (is_linearized(optimized) and not is_linearized(original)):
+            data = optimized
+    print(f"{source.name}: {len(original)} -> {len(data)} bytes, "
+          f"{'linearized' if is_linearized(data) else 'not linearized'}"
+          + (f" ({method})" if method else ''))
+
+    session = Session('resume-pdf', root)
+    status = 'WOULD UPDATE' if args.dry_run else 'UPDATED'
+    targets = [canonical, posixpath.join(MIRROR_DIR, posixpath.basename(canonical))]
+    if not args.remove_aliases:
+        targets += aliases
+    written = 0
+    for rel in targets:
+        if write(root / rel, data, session, args.dry_run):
+            written += 1
+            print(f"{status} {rel}")
+        else:
+            print(f"UNCHANGED {rel}")
+    removed = 0
+    if args.remove_aliases:
+        for rel in aliases:
+            if (root / rel).exists():
+                removed += 1
+                print(f"{'WOULD REMOVE' if args.dry_run else 'REMOVED'} {rel}")
+                if not args.dry_run:
+                    session.record(root / rel)
+                    (root / rel).unlink()
+
+    rewriter, files = alias_references(root, aliases, '/' + pdf_path.lstrip('/'))
+    updated = 0
+    for rel in files:
+        moved = rewrite_file(root / rel, rel, rewriter, session, args.dry_run)
+        if moved:
+            updated += 1
+            print(f"{status} {rel} ({moved} alias reference(s) -> {pdf_path})")
+    snapshot_id = session.close()
+
+    print('\nSummary:')
+    print(f"Resume files written: {written}, aliases removed: {removed}, "
+          f"alias references moved: {rewriter.count} in {updated} file(s)")
+    if snapshot_id:
+        print(f"Originals saved in backup snapshot {snapshot_id}")
+    if written and pdf_path.lstrip('/') != canonical:
+        print(f"{pdf_path} is a fingerprinted name; run tools/fingerprint.py to publish the new bytes")
+    if args.dry_run:
+        print('Dry run: nothing was written.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""Serve the static export locally the way it is served in production.
+
+- GitHub Pages routing: /about and /about/ serve about/index.html (the former
+  via a 301), /x serves x.html if present, misses get 404.html with a 404.
+- .br / .gz siblings (see precompress.py) are sent when the client accepts
+  them and the sibling is not older than the file, with Vary: Accept-Encoding.
+- Cache-Control: hashed assets (_next/static/, images/_opt/, any name carrying
+  a content hash) are immutable for a year; HTML and RSC payloads must
+  revalidate; everything else may be cached for 10 minutes.
+- ETag / If-None-Match and Last-Modified / If-Modified-Since give 304s.
+- Single byte ranges (Range, If-Range) give 206s, e.g. for the resume PDFs.
+- HTTP/1.1 keep-alive; every connection is an asyncio task, so concurrent
+  clients (load tests) are handled without threads. Files go out with
+  loop.sendfile (os.sendfile where the platform has it).
+
+Only site files are served: tools/, scripts/, backups/, dotfiles and
+.bak/.orig leftovers are 404s.
+
+Usage:
+    python tools/serve.py                    # http://127.0.0.1:3000
+    python tools/serve.py --port 8080 --quiet
+"""
+import argparse
+import asyncio
+import email.utils
+import mimetypes
+import re
+import sys
+import time
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from treeio import ROOT, SKIP_DIRS, is_artifact, is_site_file
+
+DEFAULT_PORT = 3000
+KEEP_ALIVE_TIMEOUT = 5.0
+MAX_HEADER_BYTES = 64 * 1024
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, max-age=0, must-revalidate'
+SHORT = 'public, max-age=600'
+HASHED_RE = re.compile(r'^(?:_next/static/|images/_opt/)|[.-][0-9a-f]{8,}\.\w+$')
+REVALIDATE_EXTS = ('.html', '.htm', '.txt', '.json', '.xml')
+# The service worker (service_worker.py) must never be served stale.
+REVALIDATE_NAMES = ('sw.js',)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+mimetypes.add_type('application/javascript', '.js')
+mimetypes.add_type('image/webp', '.webp')
+mimetypes.add_type('font/woff2', '.woff2')
+mimetypes.add_type('application/manifest+json', '.webmanifest')
+
+REASONS = {200: 'OK', 206: 'Partial Content', 301: 'Moved Permanently', 304: 'Not Modified',
+           400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           416: 'Range Not Satisfiable', 500: 'Internal Server Error'}
+
+
+def cache_control(rel: str) -> str:
+    if HASHED_RE.search(rel):
+        return IMMUTABLE
+    if rel.lower().endswith(REVALIDATE_EXTS) or rel in REVALIDATE_NAMES:
+        return REVALIDATE
+    return SHORT
+
+
+def content_type(rel: str) -> str:
+    ctype = mimetypes.guess_type(rel)[0] or 'application/octet-stream'
+    if ctype.startswith('text/') or ctype in ('application/javascript', 'application/json'):
+        ctype += '; charset=utf-8'
+    return ctype
+
+
+def http_date(ts: float) -> str:
+    return email.utils.formatdate(ts, usegmt=True)
+
+
+def etag_for(st, suffix: str = '') -> str:
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}{suffix}"'
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == '*':
+        return True
+    tags = [t.strip() for t in header.split(',')]
+    return any(t.removeprefix('W/') == etag for t in tags)
+
+
+def accepted_encodings(header: str) -> set:
+    accepted = set()
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def parse_range(header: str, size: int):
+    """(start, end) inclusive for a single satisfiable range, 'invalid' if unsatisfiable, None to ignore."""
+    m = RANGE_RE.match(header.strip())
+    if not m or (not m.group(1) and not m.group(2)):
+        return None  # multi-range or malformed: send the whole file
+    if not m.group(1):
+        length = int(m.group(2))
+        if length == 0:
+            return 'invalid'
+        return max(0, size - length), size - 1
+    start = int(m.group(1))
+    end = int(m.group(2)) if m.group(2) else size - 1
+    if start >= size or end < start:
+        return 'invalid'
+    return start, min(end, size - 1)
+
+
+class Request:
+    def __init__(self, method: str, target: str, version: str, headers: dict):
+        self.method = method
+        self.target = target
+        self.version = version
+        self.headers = headers
+
+    @property
+    def keep_alive(self) -> bool:
+        conn = self.headers.get('connection', '').lower()
+        if self.version == 'HTTP/1.0':
+            return conn == 'keep-alive'
+        return conn != 'close'
+
+
+async def read_request(reader: asyncio.StreamReader):
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError:
+        return None
+    lines = head.decode('latin-1').split('\r\n')
+    parts = lines[0].split()
+    if len(parts) != 3 or not parts[2].startswith('HTTP/1.'):
+        raise ValueError(f'bad request line: {lines[0]!r}')
+    headers = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, sep, value = line.partition(':')
+        if not sep:
+            raise ValueError(f'bad header line: {line!r}')
+        headers[name.strip().lower()] = value.strip()
+    return Request(*parts, headers)
+
+
+class StaticSite:
+    def __init__(self, root: Path, compression: bool = True, quiet: bool = False):
+        self.root = root.resolve()
+        self.compression = compression
+        self.quiet = quiet
+
+    def resolve(self, url_path: str):
+        """Map a URL path to (status, file, redirect location)."""
+        rel = unquote(url_path).lstrip('/')
+        parts = [p for p in rel.split('/') if p]
+        if any(p in ('.', '..') or p.startswith('.') for p in parts) or (parts and parts[0] in SKIP_DIRS):
+            return 404, None, None
+        rel = '/'.join(parts)
+        path = self.root / rel if rel else self.root
+        if path.is_dir():
+            if rel and not url_path.endswith('/'):
+                return 301, None, url_path + '/'
+            path = path / 'index.html'
+        elif not path.exists() and path.with_name(path.name + '.html').is_file():
+            path = path.with_name(path.name + '.html')
+        if not path.is_file():
+            return 404, None, None
+        rel = path.relative_to(self.root).as_posix()
+        if not is_site_file(rel) or is_artifact(rel):
+            return 404, None, None
+        return 200, path, None
+
+    def pick_encoding(self, path: Path, st, accept: str):
+        if not self.compression or not accept:
+            return None, path, st
+        accepted = accepted_encodings(accept)
+        for name, ext in ENCODINGS:
+            if name not in accepted:
+                continue
+            sidecar = path.with_name(path.name + ext)
+            try:
+                sst = sidecar.stat()
+            except OSError:
+                continue
+            if sst.st_mtime_ns >= st.st_mtime_ns:
+                return name, sidecar, sst
+        return None, path, st
+
+    async def handle(self, req: Request, writer: asyncio.StreamWriter) -> tuple:
+        """Write one response; returns (status, bytes sent, encoding)."""
+        if req.method not in ('GET', 'HEAD'):
+            return await self.send_simple(writer, 405, req, extra={'Allow': 'GET, HEAD'})
+        url_path = urlsplit(req.target).path or '/'
+        status, path, location = self.resolve(url_path)
+        if status == 301:
+            return await self.send_simple(writer, 301, req, extra={'Location': location})
+        if status == 404:
+            page = self.root / '404.html'
+            if not page.is_file():
+                return await self.send_simple(writer, 404, req)
+            path = page
+        rel = path.relative_to(self.root).as_posix()
+
+        st = path.stat()
+        headers = {
+            'Content-Type': content_type(rel),
+            'Cache-Control': REVALIDATE if status == 404 else cache_control(rel),
+            'Last-Modified': http_date(st.st_mtime),
+            'Accept-Ranges': 'bytes',
+        }
+        has_variants = any(path.with_name(path.name + ext).exists() for _, ext in ENCODINGS)
+        if has_variants:
+            headers['Vary'] = 'Accept-Encoding'
+        # Ranges apply to the identity representation only.
+        range_header = req.headers.get('range') if status == 200 else None
+        encoding, body, bst = self.pick_encoding(path, st, '' if range_header else req.headers.get('accept-encoding', ''))
+        etag = etag_for(st, '-' + encoding if encoding else '')
+        headers['ETag'] = etag
+        if encoding:
+            headers['Content-Encoding'] = encoding
+
+        if status == 200:
+            inm = req.headers.get('if-none-match')
+            ims = req.headers.get('if-modified-since')
+            fresh = False
+            if inm is not None:
+                fresh = etag_matches(inm, etag)
+            elif ims:
+                try:
+                    fresh = int(st.st_mtime) <= email.utils.parsedate_to_datetime(ims).timestamp()
+                except (TypeError, ValueError):
+                    fresh = False
+            if fresh:
+                return await self.send_head(writer, 304, headers, req), 0, encoding
+
+        start, end = 0, bst.st_size - 1
+        if range_header:
+            if_range = req.headers.get('if-range')
+            if if_range is None or if_range == etag or if_range == headers['Last-Modified']:
+                rng = parse_range(range_header, bst.st_size)
+                if rng == 'invalid':
+                    return await self.send_simple(writer, 416, req, extra={'Content-Range': f'bytes */{bst.st_size}'})
+                if rng is not None:
+                    status = 206
+                    start, end = rng
+                    headers['Content-Range'] = f'bytes {start}-{end}/{bst.st_size}'
+        length = max(0, end - start + 1)
+        headers['Content-Length'] = str(length)
+        await self.send_head(writer, status, headers, req)
+        if req.method == 'HEAD' or not length:
+            return status, 0, encoding
+        loop = asyncio.get_running_loop()
+        with open(body, 'rb') as f:
+            await loop.sendfile(writer.transport, f, start, length)
+        return status, length, encoding
+
+    async def send_head(self, writer, status: int, headers: dict, req: Request) -> int:
+        lines = [f'HTTP/1.1 {status} {REASONS.get(status, "")}',
+                 f'Date: {http_date(time.time())}', 'Server: tools/serve.py']
+        lines += [f'{k}: {v}' for k, v in headers.items()]
+        lines.append('Connection: keep-alive' if req.keep_alive else 'Connection: close')
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        await writer.drain()
+        return status
+
+    async def send_simple(self, writer, status: int, req: Request, extra: dict = None) -> tuple:
+        body = f'{status} {REASONS.get(status, "")}\n'.encode()
+        headers = {'Content-Type': 'text/plain; charset=utf-8', 'Content-Length': str(len(body)),
+                   'Cache-Control': 'no-store'}
+        headers.update(extra or {})
+        await self.send_head(writer, status, headers, req)
+        if req.method == 'HEAD':
+            return status, 0, None
+        writer.write(body)
+        await writer.drain()
+        return status, len(body), None
+
+    async def connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info('peername')
+        host = peer[0] if peer else '-'
+        try:
+            while True:
+                try:
+                    req = await asyncio.wait_for(read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                except ValueError:
+                    writer.write(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                    break
+                if req is None:
+                    break
+                try:
+                    status, sent, encoding = await self.handle(req, writer)
+                except ConnectionError:
+                    break
+                if not self.quiet:
+                    print(f'{host} "{req.method} {req.target} {req.version}" {status} {sent}'
+                          f'{" " + encoding if encoding else ""}', flush=True)
+                if not req.keep_alive:
+                    break
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+async def serve(site: StaticSite, host: str, port: int):
+    server = await asyncio.start_server(site.connection, host, port, limit=MAX_HEADER_BYTES)
+    addrs = ', '.join(f'http://{s.getsockname()[0]}:{s.getsockname()[1]}' for s in server.sockets)
+    print(f'Serving {site.root} on {addrs} (Ctrl-C to stop)', flush=True)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--root', type=Path, default=ROOT, help='tree to serve (default: repository root)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'(default: {DEFAULT_PORT})')
+    parser.add_argument('--no-compression', action='store_true', help='ignore .br/.gz siblings')
+    parser.add_argument('--quiet', action='store_true', help='no access log')
+    args = parser.parse_args(argv)
+
+    site = StaticSite(args.root, not args.no_compression, args.quiet)
+    try:
+        asyncio.run(serve(site, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
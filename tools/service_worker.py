@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""Generate a precache manifest and a small service worker for repeat visits.
+
+What it writes:
+- precache-manifest.json at the site root: every route's HTML ("/about/")
+  and the assets its first visit fetches (stylesheets and their url()s,
+  scripts, eager and preloaded images, icons; found the way page_weight.py
+  finds them), each with a revision. Fingerprinted URLs (_next/static/,
+  images/_opt/, fingerprint.py names) carry no revision: the URL is the
+  version. Everything else gets the first 12 hex digits of its SHA-256.
+  The manifest's own version hashes the sorted entries, so it changes only
+  when an asset's content does.
+- sw.js, which holds nothing but that version and so changes (and gets
+  re-installed by browsers) exactly when the manifest does. On install it
+  stages the precache in a cache of its own (precache-<version>): entries
+  whose revision is unchanged are copied from the cache the previous worker
+  serves, the rest are fetched, and any that is not a 2xx fails the install
+  (the browser retries it). The old worker keeps serving its own, untouched
+  cache until activate, which swaps over by deleting every other precache
+  and the runtime cache of the old version. Pages are served
+  stale-while-revalidate, fingerprinted assets cache-first (also ones not
+  precached, such as lazy images, kept in a runtime cache of at most
+  RUNTIME_LIMIT entries), other precached assets from the cache with a
+  network fallback. Range requests (the resume PDF) and other origins are
+  not intercepted.
+- A registration snippet before </body> in every page (--no-register skips
+  it); it is a plain inline script, so clean_next_runtime.py leaves it.
+
+Run it last, after fingerprint.py and the HTML transforms.
+
+Usage:
+    python tools/service_worker.py --dry-run
+    python tools/service_worker.py
+"""
+import argparse
+import hashlib
+import json
+import re
+import sys
+from pathlib import Path
+
+from page_weight import analyze
+from serve import HASHED_RE, REVALIDATE_NAMES
+from snapshot import Session
+from treeio import ROOT
+
+MANIFEST_NAME = 'precache-manifest.json'
+WORKER_NAME = REVALIDATE_NAMES[0]
+REVISION_LENGTH = 12
+RUNTIME_LIMIT = 60
+REGISTER_MARKER = 'data-sw-register'
+REGISTER_SNIPPET = (f'<script {REGISTER_MARKER}>'
+                    f"if('serviceWorker' in navigator)addEventListener('load',function(){{"
+                    f"navigator.serviceWorker.register('/{WORKER_NAME}')}})</script>")
+REGISTER_RE = re.compile(rf'[ \t]*<script {REGISTER_MARKER}>.*?</script>\n?', re.S)
+BODY_END = re.compile(r'</body>', re.I)
+
+WORKER_TEMPLATE = """\
+// Generated by tools/service_worker.py; do not edit.
+const VERSION = '%(version)s';
+const MANIFEST = '/%(manifest)s';
+const PRECACHE = 'precache-' + VERSION;
+const RUNTIME = 'runtime-' + VERSION;
+const RUNTIME_LIMIT = %(runtime_limit)d;
+const REVISIONS = '/__precache-revisions';
+const HASHED = /^\\/(?:_next\\/static\\/|images\\/_opt\\/)|[.-][0-9a-f]{8,}\\.\\w+$/;
+
+async function readRevisions(cache) {
+  const stored = await cache.match(REVISIONS);
+  return stored ? stored.json() : null;
+}
+
+// The complete precache of an earlier version: REVISIONS is written last, so
+// a half-staged cache from a failed install never qualifies.
+async function previousPrecache() {
+  for (const name of await caches.keys()) {
+    if (name === PRECACHE || !name.startsWith('precache-')) continue;
+    const cache = await caches.open(name);
+    const revisions = await readRevisions(cache);
+    if (revisions) return [cache, revisions];
+  }
+  return [null, {}];
+}
+
+self.addEventListener('install', (event) => {
+  event.waitUntil((async () => {
+    const manifest = await (await fetch(MANIFEST + '?v=' + VERSION, { cache: 'no-store' })).json();
+    const [old, oldRevisions] = await previousPrecache();
+    const cache = await caches.open(PRECACHE);
+    const revisions = {};
+    await Promise.all(manifest.entries.map(async ({ url, revision }) => {
+      const rev = revision || url;
+      const kept = old && oldRevisions[url] === rev ? await old.match(url) : null;
+      if (kept) {
+        await cache.put(url, kept);
+      } else {
+        const response = await fetch(url, { cache: 'reload' });
+        // Fail the install (the browser retries later) rather than cache an error page.
+        if (!response.ok) throw new Error(`precache ${url}: HTTP ${response.status}`);
+        await cache.put(url, response);
+      }
+      revisions[url] = rev;
+    }));
+    await cache.put(REVISIONS, new Response(JSON.stringify(revisions)));
+    await self.skipWaiting();
+  })());
+});
+
+self.addEventListener('activate', (event) => {
+  event.waitUntil((async () => {
+    for (const name of await caches.keys()) {
+      if (name !== PRECACHE && name !== RUNTIME) await caches.delete(name);
+    }
+    await self.clients.claim();
+  })());
+});
+
+async function putRuntime(key, response) {
+  const cache = await caches.open(RUNTIME);
+  await cache.put(key, response);
+  const keys = await cache.keys();
+  // Keys come back in insertion order: drop the oldest beyond the limit.
+  for (const request of keys.slice(0, Math.max(0, keys.length - RUNTIME_LIMIT))) await cache.delete(request);
+}
+
+async function cached(path) {
+  const candidates = [path];
+  if (!path.endsWith('/') && !/\\.\\w+$/.test(path)) candidates.push(path + '/');
+  for (const name of [PRECACHE, RUNTIME]) {
+    const cache = await caches.open(name);
+    for (const key of candidates) {
+      const response = await cache.match(key);
+      if (response) return [response, cache, key];
+    }
+  }
+  return [null, null, path];
+}
+
+async function staleWhileRevalidate(event, path) {
+  const [response, cache, key] = await cached(path);
+  const refresh = fetch(event.request).then(async (fresh) => {
+    if (fresh.ok) await (cache ? cache.put(key, fresh.clone()) : putRuntime(key, fresh.clone()));
+    return fresh;
+  });
+  if (response) {
+    event.waitUntil(refresh.catch(() => {}));
+    return response;
+  }
+  return refresh;
+}
+
+async function cacheFirst(event, path, store) {
+  const [response] = await cached(path);
+  if (response) return response;
+  const fresh = await fetch(event.request);
+  if (store && fresh.ok) await putRuntime(path, fresh.clone());
+  return fresh;
+}
+
+self.addEventListener('fetch', (event) => {
+  const { request } = event;
+  const url = new URL(request.url);
+  if (request.method !== 'GET' || url.origin !== self.location.origin || request.headers.has('range')) return;
+  if (url.pathname === '/' + '%(worker)s' || url.pathname === MANIFEST) return;
+  if (request.mode === 'navigate' || /\\.html?$/.test(url.pathname)) {
+    event.respondWith(staleWhileRevalidate(event, url.pathname));
+  } else if (HASHED.test(url.pathname)) {
+    event.respondWith(cacheFirst(event, url.pathname, true));
+  } else {
+    event.respondWith(cacheFirst(event, url.pathname, false));
+  }
+});
+"""
+
+
+def revision(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:REVISION_LENGTH]
+
+
+def build_manifest(root: Path, pending: dict = None) -> dict:
+    """The manifest for the tree, with pending (rel -> bytes) standing in for unwritten files."""
+    pending = pending or {}
+    entries = {}
+    for route in analyze(root):
+        for rel, kind in route.assets.items():
+            url = route.route if kind == 'html' and rel == route.page else '/' + rel
+            if HASHED_RE.search(rel):
+                entries[url] = None
+            else:
+                entries[url] = revision(pending[rel] if rel in pending else (root / rel).read_bytes())
+    items = [{'url': url, 'revision': rev} for url, rev in sorted(entries.items())]
+    version = hashlib.sha256(json.dumps(items, sort_keys=True).encode('utf-8')).hexdigest()[:REVISION_LENGTH]
+    return {'version': version, 'entries': items}
+
+
+def register_page(text: str, enabled: bool = True) -> str:
+    """The page with exactly one registration snippet before </body>, or none."""
+    text = REGISTER_RE.sub('', text)
+    if not enabled:
+        return text
+    matches = list(BODY_END.finditer(text))
+    if not matches:
+        return text
+    at = matches[-1].start()
+    line_start = text.rfind('\n', 0, at) + 1
+    if text[line_start:at].strip():
+        return text[:at] + REGISTER_SNIPPET + text[at:]
+    # A line of its own, indented like </body>.
+    return text[:line_start] + text[line_start:at] + REGISTER_SNIPPET + '\n' + text[line_start:]
+
+
+def write_if_different(path: Path, data: bytes, session: Session, dry_run: bool) -> bool:
+    if path.exists() and path.read_bytes() == data:
+        return False
+    if not dry_run:
+        if path.exists():
+            session.record(path)
+        path.write_bytes(data)
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--root', type=Path, default=ROOT, help='tree to process (default: repository root)')
+    parser.add_argument('--dry-run', action='store_true', help='report what would change without writing')
+    parser.add_argument('--no-register', action='store_true',
+                        help='do not add (and remove any) registration snippet in the pages')
+    args = parser.parse_args(argv)
+
+    root = args.root.resolve()
+    status = 'WOULD UPDATE' if args.dry_run else 'UPDATED'
+    session = Session('service_worker', root)
+    # Pages first: their revisions must cover the registration snippet.
+    pages = changed_pages = 0
+    pending = {}
+    for route in analyze(root):
+        pages += 1
+        path = root / route.page
+        raw = path.read_bytes()
+        new = register_page(raw.decode('utf-8'), not args.no_register).encode('utf-8')
+        if write_if_different(path, new, session, args.dry_run):
+            changed_pages += 1
+            pending[route.page] = new
+            print(f"{status} {route.page} (registration {'removed' if args.no_register else 'added'})")
+    # A dry run writes nothing, so hash the pages as a real run would leave them.
+    manifest = build_manifest(root, pending)
+    previous = {}
+    if (root / MANIFEST_NAME).exists():
+        previous = {e['url']: e['revision'] for e in json.loads((root / MANIFEST_NAME).read_text(encoding='utf-8'))['entries']}
+    current = {e['url']: e['revision'] for e in manifest['entries']}
+    for url in sorted(set(previous) | set(current)):
+        if url not in previous:
+            print(f"ADDED {url}")
+        elif url not in current:
+            print(f"DROPPED {url}")
+        elif previous[url] != current[url]:
+            print(f"CHANGED {url} ({previous[url]} -> {current[url]})")
+
+    outputs = (
+        (MANIFEST_NAME, json.dumps(manifest, indent=1) + '\n'),
+        (WORKER_NAME, WORKER_TEMPLATE % {'version': manifest['version'], 'manifest': MANIFEST_NAME,
+                                         'worker': WORKER_NAME, 'runtime_limit': RUNTIME_LIMIT}),
+    )
+    for name, text in outputs:
+        changed = write_if_different(root / name, text.encode('utf-8'), session, args.dry_run)
+        print(f"{status if changed else 'UNCHANGED'} {name}")
+    snapshot_id = session.close()
+
+    print('\nSummary:')
+    changes = sum(1 for url in current if previous.get(url, '') != current[url]) + len(set(previous) - set(current))
+    print(f"Manifest version {manifest['version']}: {len(current)} entries, {changes} changed since the last run; "
+          f"{changed_pages} of {pages} page(s) {'to update' if args.dry_run else 'updated'}")
+    if snapshot_id:
+        print(f"Backup snapshot: {snapshot_id}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""Content-addressed, deduplicated backups of the static export.
+
+Blobs are stored once per SHA-256 (zlib-compressed) under
+backups/store/objects/, and every snapshot is a small JSON manifest under
+backups/store/snapshots/ mapping repository paths to blob hashes. Taking a
+snapshot only writes blobs that are not already stored, and a stat cache
+avoids re-hashing unchanged files, so its cost is proportional to what
+changed since the last one.
+
+The rewriting tools record the pre-change contents of every file they modify
+as a partial snapshot (labelled with the tool name) instead of leaving
+sibling .bak files next to the pages.
+
+Usage:
+    python tools/snapshot.py snapshot [--label manual] [PATH ...]
+    python tools/snapshot.py list
+    python tools/snapshot.py diff SNAPSHOT [OTHER]        # OTHER defaults to the working tree
+    python tools/snapshot.py restore SNAPSHOT [PATH ...] [--dest DIR]
+    python tools/snapshot.py prune --keep 10 [--keep-partial 20]
+    python tools/snapshot.py adopt [--remove]             # import legacy .bak files and backups/<timestamp>/ copies
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+import zlib
+from pathlib import Path
+
+from treeio import ROOT, is_artifact, is_site_file, iter_files, rel_path
+
+STORE_DIRNAME = 'store'
+LEGACY_DIR_RE = re.compile(r'^\d{8}T\d{6}Z$')
+# Sibling backup suffixes written by earlier versions of the tools, longest first.
+LEGACY_SUFFIXES = ('.next-runtime.bak', '.yb-logo.bak', '.bak_clean', '.bak')
+KEEP_PARTIAL = 20
+
+
+class Store:
+    def __init__(self, root: Path = ROOT, base: Path = None):
+        self.root = root
+        self.base = base or root / 'backups' / STORE_DIRNAME
+        self.objects = self.base / 'objects'
+        self.snapshot_dir = self.base / 'snapshots'
+        self.stat_cache_path = self.base / 'stat-cache.json'
+        self._stat_cache = None
+        self.new_objects = 0
+        self.new_bytes = 0
+
+    # --- blobs -------------------------------------------------------------
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects / digest[:2] / digest[2:]
+
+    def put(self, data: bytes) -> str:
+        """Store data once; returns its SHA-256. Safe to call from worker processes."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            packed = zlib.compress(data, 6)
+            tmp.write_bytes(packed)
+            os.replace(tmp, path)
+            self.new_objects += 1
+            self.new_bytes += len(packed)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        return zlib.decompress(self._object_path(digest).read_bytes())
+
+    def _load_stat_cache(self) -> dict:
+        if self._stat_cache is None:
+            try:
+                self._stat_cache = json.loads(self.stat_cache_path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                self._stat_cache = {}
+        return self._stat_cache
+
+    def put_file(self, path: Path) -> dict:
+        """Store a working-tree file, skipping the hash when size and mtime are unchanged."""
+        rel = rel_path(path, self.root)
+        st = path.stat()
+        cache = self._load_stat_cache()
+        entry = cache.get(rel)
+        if (entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns
+                and self._object_path(entry['sha256']).exists()):
+            return {'sha256': entry['sha256'], 'size': st.st_size}
+        digest = self.put(path.read_bytes())
+        cache[rel] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest}
+        return {'sha256': digest, 'size': st.st_size}
+
+    def save_stat_cache(self):
+        if self._stat_cache is not None:
+            self.base.mkdir(parents=True, exist_ok=True)
+            self.stat_cache_path.write_text(json.dumps(self._stat_cache, sort_keys=True) + '\n', encoding='utf-8')
+
+    # --- snapshots ---------------------------------------------------------
+
+    def write_snapshot(self, files: dict, label: str, partial: bool, snapshot_id: str = None) -> str:
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        base_id = snapshot_id or time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())
+        slug = re.sub(r'[^A-Za-z0-9_.-]+', '-', label).strip('-')
+        snapshot_id = f"{base_id}-{slug}" if slug else base_id
+        n = 1
+        while (self.snapshot_dir / f"{snapshot_id}.json").exists():
+            n += 1
+            snapshot_id = f"{base_id}-{slug}-{n}" if slug else f"{base_id}-{n}"
+        payload = {
+            'id': snapshot_id,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'label': label,
+            'partial': partial,
+            'files': dict(sorted(files.items())),
+        }
+        (self.snapshot_dir / f"{snapshot_id}.json").write_text(json.dumps(payload, indent=1) + '\n', encoding='utf-8')
+        return snapshot_id
+
+    def snapshot_ids(self):
+        if not self.snapshot_dir.exists():
+            return []
+        return sorted(p.stem for p in self.snapshot_dir.glob('*.json'))
+
+    def load(self, snapshot_id: str) -> dict:
+        path = self.snapshot_dir / f"{snapshot_id}.json"
+        if not path.exists():
+            matches = [s for s in self.snapshot_ids() if s.startswith(snapshot_id)]
+            if len(matches) != 1:
+                raise SystemExit(f"Unknown or ambiguous snapshot: {snapshot_id}")
+            path = self.snapshot_dir / f"{matches[0]}.json"
+        return json.loads(path.read_text(encoding='utf-8'))
+
+
+class Session:
+    """Collects the pre-change contents of files one tool run modifies.
+
+    Call record() (or record_digest() for blobs stored by a worker process via
+    Store.put) before overwriting a file; close() writes one partial snapshot
+    if anything was recorded and returns its id.
+    """
+
+    def __init__(self, label: str, root: Path = ROOT):
+        self.store = Store(root)
+        self.root = root
+        self.label = label
+        self.files = {}
+
+    def record(self, path: Path, data: bytes = None):
+        if data is None:
+            data = path.read_bytes()
+        self.record_digest(rel_path(path, self.root), self.store.put(data), len(data))
+
+    def record_digest(self, rel: str, digest: str, size: int):
+        # Keep the oldest contents if a file is recorded twice in one run.
+        self.files.setdefault(rel, {'sha256': digest, 'size': size})
+
+    def close(self):
+        if not self.files:
+            return None
+        return self.store.write_snapshot(self.files, self.label, partial=True)
+
+
+def default_paths(root: Path):
+    """Everything in the published tree except backup artifacts and sidecars."""
+    for path in iter_files(root):
+        rel = rel_path(path, root)
+        if is_site_file(rel) and not is_artifact(rel) and path.suffix not in ('.gz', '.br'):
+            yield path
+
+
+def expand(root: Path, args_paths):
+    for arg in args_paths:
+        path = (root / arg).resolve()
+        if path.is_dir():
+            yield from iter_files(path)
+        elif path.is_file():
+            yield path
+        else:
+            print(f"Missing: {arg}")
+
+
+def working_state(root: Path, rels):
+    state = {}
+    for rel in rels:
+        path = root / rel
+        if path.is_file():
+            state[rel] = {'sha256': hashlib.sha256(path.read_bytes()).hexdigest(), 'size': path.stat().st_size}
+    return state
+
+
+def cmd_snapshot(store: Store, args):
+    paths = list(expand(store.root, args.paths)) if args.paths else list(default_paths(store.root))
+    files = {rel_path(p, store.root): store.put_file(p) for p in paths}
+    store.save_stat_cache()
+    snapshot_id = store.write_snapshot(files, args.label, partial=bool(args.paths))
+    total = sum(f['size'] for f in files.values())
+    print(f"Snapshot {snapshot_id}: {len(files)} files ({total / 1024:.1f} KiB), "
+          f"{store.new_objects} new blob(s) ({store.new_bytes / 1024:.1f} KiB stored)")
+    return 0
+
+
+def cmd_list(store: Store, args):
+    for snapshot_id in store.snapshot_ids():
+        snap = store.load(snapshot_id)
+        total = sum(f['size'] for f in snap['files'].values())
+        kind = 'partial' if snap.get('partial') else 'full'
+        print(f"{snapshot_id:<48} {kind:<8} {len(snap['files']):>5} files {total / 1024:10.1f} KiB")
+    return 0
+
+
+def cmd_diff(store: Store, args):
+    a = store.load(args.snapshot)['files']
+    if args.other:
+        b = store.load(args.other)['files']
+        other = args.other
+    else:
+        b = working_state(store.root, a)
+        other = 'working tree'
+    print(f"--- {args.snapshot}\n+++ {other}")
+    changes = 0
+    for rel in sorted(set(a) | set(b)):
+        if rel not in b:
+            print(f"D {rel}")
+        elif rel not in a:
+            print(f"A {rel}")
+        elif a[rel]['sha256'] != b[rel]['sha256']:
+            print(f"M {rel} ({a[rel]['size']} -> {b[rel]['size']} bytes)")
+        else:
+            continue
+        changes += 1
+    print(f"{changes} difference(s)")
+    return 0
+
+
+def cmd_restore(store: Store, args):
+    snap = store.load(args.snapshot)
+    files = snap['files']
+    if args.paths:
+        wanted = {p.strip('/') for p in args.paths}
+        files = {rel: f for rel, f in files.items()
+                 if rel in wanted or any(rel.startswith(w + '/') for w in wanted)}
+    dest = args.dest.resolve() if args.dest else store.root
+    if dest == store.root:
+        # Keep what is about to be overwritten, so a restore can itself be undone.
+        session = Session(f"pre-restore-{snap['id']}", store.root)
+        for rel in files:
+            if (store.root / rel).is_file():
+                session.record(store.root / rel)
+        undo = session.close()
+        if undo:
+            print(f"Current versions saved as snapshot {undo}")
+    restored = 0
+    for rel, f in files.items():
+        target = dest / rel
+        data = store.get(f['sha256'])
+        if target.is_file() and target.read_bytes() == data:
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(target.name + '.tmp')
+        tmp.write_bytes(data)
+        os.replace(tmp, target)
+        restored += 1
+        print(f"RESTORED {rel}")
+    print(f"Restored {restored} of {len(files)} file(s) from {snap['id']}")
+    return 0
+
+
+def prune_plan(store: Store, keep: int, keep_partial: int):
+    """Snapshot ids to drop: all but the newest keep full and keep_partial partial ones.
+
+    Full and partial snapshots are counted separately, so the small per-run
+    snapshots the tools write never push out a full backup, and the newest
+    full snapshot is kept whatever keep says.
+    """
+    full, partial = [], []
+    for snapshot_id in store.snapshot_ids():
+        (partial if store.load(snapshot_id).get('partial') else full).append(snapshot_id)
+    keep = max(keep, 1)
+    drop = full[:-keep]
+    drop += partial[:-keep_partial] if keep_partial else partial
+    return sorted(drop)
+
+
+def cmd_prune(store: Store, args):
+    drop = prune_plan(store, args.keep, args.keep_partial)
+    for snapshot_id in drop:
+        (store.snapshot_dir / f"{snapshot_id}.json").unlink()
+    live = set()
+    for snapshot_id in store.snapshot_ids():
+        live.update(f['sha256'] for f in store.load(snapshot_id)['files'].values())
+    freed = removed = 0
+    if store.objects.exists():
+        for blob in store.objects.glob('*/*'):
+            digest = blob.parent.name + blob.name
+            if digest not in live:
+                freed += blob.stat().st_size
+                blob.unlink()
+                removed += 1
+    cache = store._load_stat_cache()
+    for rel in [rel for rel, e in cache.items() if e['sha256'] not in live]:
+        del cache[rel]
+    store.save_stat_cache()
+    print(f"Removed {len(drop)} snapshot(s) and {removed} unreferenced blob(s), freed {freed / 1024:.1f} KiB")
+    return 0
+
+
+def cmd_adopt(store: Store, args):
+    """Import sibling .bak files and backups/<timestamp>/ copies as snapshots."""
+    root = store.root
+    siblings = {}
+    for path in iter_files(root):
+        rel = rel_path(path, root)
+        for suffix in LEGACY_SUFFIXES:
+            if rel.endswith(suffix):
+                siblings.setdefault(suffix, []).append((rel[:-len(suffix)], path))
+                break
+    removed = []
+    for suffix, entries in sorted(siblings.items()):
+        files = {}
+        for rel, path in entries:
+            files[rel] = {'sha256': store.put(path.read_bytes()), 'size': path.stat().st_size}
+            removed.append(path)
+        snapshot_id = store.write_snapshot(files, f"adopted{suffix}", partial=True)
+        print(f"Snapshot {snapshot_id}: {len(files)} file(s) from *{suffix}")
+
+    legacy_root = root / 'backups'
+    for legacy in sorted(legacy_root.iterdir()) if legacy_root.exists() else ():
+        if not (legacy.is_dir() and LEGACY_DIR_RE.match(legacy.name)):
+            continue
+        files = {}
+        for path in iter_files(legacy):
+            rel = rel_path(path, legacy)
+            if is_artifact(rel):
+                continue
+            files[rel] = {'sha256': store.put(path.read_bytes()), 'size': path.stat().st_size}
+        snapshot_id = store.write_snapshot(files, 'adopted', partial=True, snapshot_id=legacy.name)
+        print(f"Snapshot {snapshot_id}: {len(files)} file(s) from backups/{legacy.name}/")
+        removed.append(legacy)
+
+    if args.remove:
+        import shutil
+        for path in removed:
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink()
+        print(f"Removed {len(removed)} legacy backup file(s)/director(ies)")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--root', type=Path, default=ROOT, help='tree to back up (default: repository root)')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('snapshot', help='record a snapshot (default: the whole published tree)')
+    p.add_argument('--label', default='manual')
+    p.add_argument('paths', nargs='*', help='files or directories relative to the root')
+    p.set_defaults(func=cmd_snapshot)
+
+    p = sub.add_parser('list', help='list snapshots')
+    p.set_defaults(func=cmd_list)
+
+    p = sub.add_parser('diff', help='compare a snapshot with another one or the working tree')
+    p.add_argument('snapshot')
+    p.add_argument('other', nargs='?')
+    p.set_defaults(func=cmd_diff)
+
+    p = sub.add_parser('restore', help='restore files from a snapshot')
+    p.add_argument('snapshot')
+    p.add_argument('paths', nargs='*', help='limit to these files or directories')
+    p.add_argument('--dest', type=Path, help='restore into this directory instead of the tree')
+    p.set_defaults(func=cmd_restore)
+
+    p = sub.add_parser('prune', help='drop old snapshots and unreferenced blobs')
+    p.add_argument('--keep', type=int, required=True,
+                   help='number of newest full snapshots to keep (the newest one is always kept)')
+    p.add_argument('--keep-partial', type=int, default=KEEP_PARTIAL,
+                   help=f'number of newest partial (per-run) snapshots to keep (default: {KEEP_PARTIAL})')
+    p.set_defaults(func=cmd_prune)
+
+    p = sub.add_parser('adopt', help='import legacy sibling .bak files and backups/<timestamp>/ directories')
+    p.add_argument('--remove', action='store_true', help='delete the legacy copies once imported')
+    p.set_defaults(func=cmd_adopt)
+
+    args = parser.parse_args(argv)
+    return args.func(Store(args.root.resolve()), args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
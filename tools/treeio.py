@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""Shared tree walking and file I/O for the post-export tools.
+
+The individual scripts each grew their own ROOT.rglob() loop. New tooling goes
+through these helpers instead so the tree is walked once, every file is read
+once as bytes, and nothing is written back unless the bytes actually differ.
+Scans that only care about files containing some marker test the raw bytes
+first (through mmap for large files) and decode only the files that match.
+"""
+import mmap
+import os
+import re
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Minified output written by minify_html.py; a build product, not part of the tree.
+DEPLOY_DIR = 'deploy'
+
+# Directories that never hold deployable pages (tests/ holds fixture copies of some).
+SKIP_DIRS = {'.git', 'backups', DEPLOY_DIR, 'node_modules', '__pycache__', '.venv', 'venv', 'tests'}
+
+# Top-level directories holding tooling or source-tree mirrors rather than served files.
+NON_SITE_DIRS = {'tools', 'scripts', 'public', 'tests'}
+
+
+def iter_files(root: Path = ROOT):
+    """Yield every file under root in a stable (sorted) order, pruning SKIP_DIRS."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS)
+        for fn in sorted(filenames):
+            yield Path(dirpath) / fn
+
+
+# Leftovers of earlier hand edits and tool runs: index.html.bak, *.next-runtime.bak,
+# *.yb-logo.bak, index.html.bak_clean, page-*.js.orig / .fixed, interrupted *.tmp.
+ARTIFACT_RE = re.compile(r'\.(bak\w*|orig|fixed|tmp)$', re.IGNORECASE)
+
+
+def is_artifact(rel: str) -> bool:
+    return ARTIFACT_RE.search(rel) is not None
+
+
+def is_site_file(rel: str) -> bool:
+    """True if a repository-relative path is part of the published site."""
+    return rel.split('/', 1)[0] not in NON_SITE_DIRS and not rel.startswith('.')
+
+
+def rel_path(path: Path, root: Path = ROOT) -> str:
+    """Repository-relative path with forward slashes, e.g. 'carefuse/index.txt'."""
+    return path.relative_to(root).as_posix()
+
+
+# Below this size a plain read is cheaper than setting up a mapping.
+MMAP_MIN_SIZE = 1 << 16
+
+
+def byte_probe(needles):
+    """Compile literal byte strings into one pattern for scan_file / read_text_if."""
+    return re.compile(b'|'.join(re.escape(n) for n in sorted(set(needles), key=len, reverse=True)))
+
+
+def _search(path: Path, probe, keep: bool):
+    """(matched, data): data is the file's bytes when keep is set and probe matched."""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return False, b''
+        if size < MMAP_MIN_SIZE:
+            data = f.read()
+            return probe.search(data) is not None, data
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            if probe.search(m) is None:
+                return False, None
+            return True, m[:] if keep else None
+
+
+def scan_file(path: Path, probe) -> bool:
+    """True if probe (see byte_probe) matches the file's raw bytes."""
+    return _search(path, probe, keep=False)[0]
+
+
+def read_text_if(path: Path, probe):
+    """The file decoded as UTF-8 if probe matches its bytes, else None.
+
+    Line endings are left as they are. Files that match but are not valid
+    UTF-8 also give None; OSError propagates.
+    """
+    matched, data = _search(path, probe, keep=True)
+    if not matched:
+        return None
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+
+
+def write_if_changed(path: Path, data: bytes, original: bytes) -> bool:
+    if data == original:
+        return False
+    path.write_bytes(data)
+    return True
+
+
+def add_jobs_argument(parser, default: int = 1):
+    parser.add_argument('-j', '--jobs', type=int, default=default,
+                        help=f'worker processes for per-file work (0 = one per CPU core, default: {default})')
+
+
+def resolve_jobs(jobs: int) -> int:
+    if jobs <= 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def parallel_map(func, items, jobs: int = 1, chunksize: int = 1):
+    """Like map(func, items) but fanned out over a process pool when jobs > 1.
+
+    Results are yielded in input order, so callers can print UPDATED/UNCHANGED
+    lines and summaries exactly as the serial run would. func must be a
+    module-level function (or functools.partial of one) so it can be pickled.
+    """
+    if jobs <= 1:
+        yield from map(func, items)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        yield from pool.map(func, items, chunksize=chunksize)
+
+
+def rewrite_text_file(transform, path: Path):
+    """Apply transform to one file the way the index.html prettifiers do.
+
+    Returns (changed, report_line, sha256 of the file as left) instead of
+    printing so it can run in a worker process.
+    """
+    import hashlib
+    try:
+        data = path.read_bytes()
+        # Universal newlines, as read_text would give.
+        raw = data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+    except Exception as e:
+        return False, f"SKIP {path} (read error: {e})", None
+    new_text = transform(raw)
+    if new_text != raw:
+        path.write_text(new_text, encoding='utf-8')
+        return True, f"UPDATED {path}", hashlib.sha256(new_text.encode('utf-8')).hexdigest()
+    return False, f"UNCHANGED {path}", hashlib.sha256(data).hexdigest()
+
+
+def rewrite_text_file_streaming(transform, path: Path, chunk_size: int = 1 << 16):
+    """Streaming variant of rewrite_text_file for files that need not fit in memory.
+
+    transform takes an iterable of text chunks and yields output pieces. The
+    output goes to a sibling temp file which replaces path only if it differs
+    from the (CRLF-normalized) input, compared by hash. Returns what
+    rewrite_text_file does.
+    """
+    import hashlib
+    h_raw = hashlib.sha256()
+    h_in = hashlib.sha256()
+    h_out = hashlib.sha256()
+    tmp = path.with_name(path.name + '.tmp')
+
+    def source(f):
+        pending = ''
+        for chunk in iter(lambda: f.read(chunk_size), ''):
+            yield chunk
+            h_raw.update(chunk.encode('utf-8'))
+            data = pending + chunk
+            pending = '\r' if data.endswith('\r') else ''
+            h_in.update(data[:len(data) - len(pending)].replace('\r\n', '\n').encode('utf-8'))
+        h_in.update(pending.encode('utf-8'))
+
+    try:
+        with open(path, encoding='utf-8', newline='') as src, open(tmp, 'w', encoding='utf-8') as dst:
+            for piece in transform(source(src)):
+                h_out.update(piece.encode('utf-8'))
+                dst.write(piece)
+    except Exception as e:
+        tmp.unlink(missing_ok=True)
+        return False, f"SKIP {path} (read error: {e})", None
+    if h_in.digest() == h_out.digest():
+        tmp.unlink()
+        return False, f"UNCHANGED {path}", h_raw.hexdigest()
+    os.replace(tmp, path)
+    return True, f"UPDATED {path}", h_out.hexdigest()
+
+
+def rewrite_index_html(transform, root: Path = ROOT, jobs: int = 1, manifest=None, transforms=None,
+                       streaming: bool = False):
+    """Run transform over every index.html under root, printing results in path order.
+
+    With a manifest (see manifest.py) files already produced by the same
+    transform versions are skipped without being re-processed. With
+    streaming=True, transform is a chunk-stream transform and files are
+    rewritten through rewrite_text_file_streaming.
+    """
+    from functools import partial
+    paths = sorted(p for p in iter_files(root) if p.name == 'index.html')
+    todo = paths
+    if manifest is not None:
+        todo = [p for p in paths if not manifest.is_current(p, transforms)]
+    worker = rewrite_text_file_streaming if streaming else rewrite_text_file
+    results = dict(zip(todo, parallel_map(partial(worker, transform), todo, jobs)))
+
+    changed = []
+    for path in paths:
+        if path not in results:
+            print(f"UNCHANGED {path} (up to date)")
+            continue
+        was_changed, line, digest = results[path]
+        print(line)
+        if was_changed:
+            changed.append(str(path))
+        if manifest is not None and not line.startswith('SKIP'):
+            manifest.record(path, transforms, was_changed, digest)
+    if manifest is not None:
+        manifest.save()
+    return paths, changed
@@ -3,7 +3,8 @@
 Replace occurrences of 'carefuse_logo.png' with 'YB_logo.png' in HTML/TXT files
 across the workspace, excluding the `carefuse/` directory and `backups/`.
 
-Creates a backup for each changed file named <filename>.yb-logo.bak
+The original of each changed file is recorded in one backup snapshot per run
+(see snapshot.py).
 
 Usage: run this script from anywhere; it resolves the repo root relative to the
 script location.
@@ -11,23 +12,37 @@ script location.
 import os
 from pathlib import Path
 
+from multireplace import load_rule_set
+from snapshot import Session
+from treeio import SKIP_DIRS as TREE_SKIP_DIRS, read_text_if
+
 
 ROOT = Path(__file__).resolve().parents[1]
-SKIP_DIRS = {"carefuse", "backups"}
-EXTS = {".html", ".htm", ".txt"}
-OLD = "carefuse_logo.png"
-NEW = "YB_logo.png"
+# The old -> new logo pair, extensions and skipped directories live in
+# replace_rules.json under "logo".
+RULES = load_rule_set("logo")
+SKIP_DIRS = RULES.exclude_dirs
+EXTS = set(RULES.exts)
+
+# Manifest key for pipeline --incremental; bump the rule set's version whenever the output changes.
+TRANSFORM_NAME = "logo"
+TRANSFORM_VERSION = RULES.version
 
 
 def should_skip(path: Path) -> bool:
     parts = {p.lower() for p in path.parts}
-    if parts & SKIP_DIRS:
+    if parts & SKIP_DIRS or parts & TREE_SKIP_DIRS:
         return True
     return False
 
 
+def replace_logo(text: str) -> str:
+    return RULES.sub(text)
+
+
 def main():
     changed = []
+    session = Session("update_logo", ROOT)
     for dirpath, dirnames, filenames in os.walk(ROOT):
         # allow skipping entire directories early
         rel = Path(dirpath).relative_to(ROOT)
@@ -41,20 +56,21 @@ def main():
             if p.name.endswith('.yb-logo.bak') or '.next-runtime.bak' in p.name or p.name.endswith('.bak'):
                 continue
             try:
-                text = p.read_text(encoding='utf-8')
-            except Exception:
-                # skip files we can't read as utf-8
+                # only files whose bytes contain the old name get decoded
+                text = read_text_if(p, RULES.probe)
+            except OSError:
+                continue
+            if text is None:
                 continue
-            if OLD in text:
-                backup = p.with_name(p.name + '.yb-logo.bak')
-                if not backup.exists():
-                    backup.write_text(text, encoding='utf-8')
-                newtext = text.replace(OLD, NEW)
-                p.write_text(newtext, encoding='utf-8')
+            newtext, hits = RULES.replace(text)
+            if hits:
+                session.record(p, text.encode('utf-8'))
+                p.write_bytes(newtext.encode('utf-8'))
                 changed.append(str(p.relative_to(ROOT)))
 
+    snapshot_id = session.close()
     if changed:
-        print("Updated files (backups written with .yb-logo.bak):")
+        print(f"Updated files (originals in backup snapshot {snapshot_id}):")
         for c in changed:
             print(" -", c)
     else:
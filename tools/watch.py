@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""Watch the export and re-apply the pipeline stages to files as they change.
+
+Runs an incremental pipeline pass (see pipeline.py and manifest.py) on
+start-up, then waits for changes: inotify on Linux (through ctypes, no extra
+packages), otherwise stat polling. Events are debounced, so an editor's
+save-via-rename or a `git checkout` touching many files becomes one batch.
+Each changed file gets only the stages that apply to it, in the usual
+order, through the same process_file() the pipeline uses: probes, one read,
+one write, originals into a backup snapshot per batch.
+
+Everything expensive stays loaded between batches: the stage modules and
+their compiled patterns, the rule-set automata, and the manifest. The
+daemon's own writes are recognised by size and mtime and do not trigger
+another round.
+
+Usage:
+    python tools/watch.py                          # default stages
+    python tools/watch.py --stages next-runtime,logo,pretty-blocks
+    python tools/watch.py --poll --interval 0.5    # without inotify
+"""
+import argparse
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+
+import pipeline
+from manifest import Manifest
+from snapshot import Session
+from treeio import NON_SITE_DIRS, ROOT, SKIP_DIRS, iter_files, rel_path
+
+DEFAULT_DEBOUNCE = 0.1
+DEFAULT_INTERVAL = 1.0
+
+# <sys/inotify.h>
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT = struct.Struct('iIII')
+
+
+def _watched_dir(rel: str) -> bool:
+    parts = rel.split('/') if rel else []
+    return not any(p in SKIP_DIRS or p.startswith('.') for p in parts) and (not parts or parts[0] not in NON_SITE_DIRS)
+
+
+class Overflow(Exception):
+    """The kernel dropped events; the caller should rescan everything."""
+
+
+class InotifyWatcher:
+    def __init__(self, root: Path):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError('inotify is not available')
+        self.libc = libc
+        self.root = root
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.dirs = {}   # watch descriptor -> directory
+        self.add_tree(root)
+
+    def add_tree(self, top: Path):
+        for dirpath, dirnames, _ in os.walk(top):
+            rel = rel_path(Path(dirpath), self.root) if Path(dirpath) != self.root else ''
+            if not _watched_dir(rel):
+                dirnames[:] = []
+                continue
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(dirpath), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                raise OSError(err, f"inotify_add_watch {dirpath}: {os.strerror(err)}"
+                              + (' (raise fs.inotify.max_user_watches or use --poll)' if err == 28 else ''))
+            self.dirs[wd] = Path(dirpath)
+
+    def wait(self, timeout):
+        """Changed file paths, after waiting at most timeout seconds (None: forever)."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed = set()
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return changed
+        pos = 0
+        while pos < len(data):
+            wd, mask, _, size = EVENT.unpack_from(data, pos)
+            name = data[pos + EVENT.size:pos + EVENT.size + size].rstrip(b'\0')
+            pos += EVENT.size + size
+            if mask & IN_Q_OVERFLOW:
+                raise Overflow()
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            parent = self.dirs.get(wd)
+            if parent is None or not name:
+                continue
+            path = parent / os.fsdecode(name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and path.is_dir():
+                    # Files written before the watch existed are picked up by the walk.
+                    self.add_tree(path)
+                    changed.update(iter_files(path))
+                continue
+            if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    def __init__(self, root: Path, interval: float = DEFAULT_INTERVAL):
+        self.root = root
+        self.interval = interval
+        self.state = self.snapshot()
+
+    def snapshot(self) -> dict:
+        state = {}
+        for path in iter_files(self.root):
+            if not _watched_dir(rel_path(path.parent, self.root) if path.parent != self.root else ''):
+                continue
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            state[path] = (st.st_size, st.st_mtime_ns)
+        return state
+
+    def wait(self, timeout):
+        time.sleep(self.interval if timeout is None else min(self.interval, timeout))
+        state = self.snapshot()
+        changed = {p for p, sig in state.items() if self.state.get(p) != sig}
+        self.state = state
+        return changed
+
+    def close(self):
+        pass
+
+
+def make_watcher(root: Path, poll: bool, interval: float):
+    if not poll and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(root)
+        except OSError as e:
+            print(f"inotify unavailable ({e}); polling every {interval:g}s")
+    return PollingWatcher(root, interval)
+
+
+class Daemon:
+    def __init__(self, root: Path, stage_names, manifest: Manifest, dry_run: bool = False):
+        self.root = root
+        self.stage_names = stage_names
+        self.stages = [pipeline.STAGES[n] for n in stage_names]
+        self.manifest = manifest
+        self.dry_run = dry_run
+        # (size, mtime_ns) of files this process wrote, so their events are ignored.
+        self.written = {}
+
+    def wanted(self, path: Path) -> bool:
+        try:
+            rel = rel_path(path, self.root)
+        except ValueError:
+            return False
+        return path.is_file() and pipeline.wanted(rel, self.stages)
+
+    def is_own_write(self, path: Path) -> bool:
+        sig = self.written.get(path)
+        if sig is None:
+            return False
+        try:
+            st = path.stat()
+        except OSError:
+            return False
+        return (st.st_size, st.st_mtime_ns) == sig
+
+    def full_pass(self):
+        pipeline.run(self.stage_names, self.root, self.dry_run, 1, self.manifest)
+
+    def batch(self, paths) -> int:
+        paths = sorted(p for p in paths if self.wanted(p) and not self.is_own_write(p))
+        if not paths:
+            return 0
+        started = time.perf_counter()
+        session = Session('watch', self.root)
+        updated = 0
+        for path in paths:
+            result = pipeline.process_file(path, self.root, self.stage_names, self.dry_run, not self.dry_run)
+            transforms = pipeline.transforms_for(result.rel, self.stages)
+            if result.status == 'SKIP':
+                print(f"SKIP {result.rel} ({result.error})")
+                continue
+            if result.backup:
+                session.record_digest(result.rel, result.backup, result.bytes_read)
+            if result.status == 'UPDATED':
+                st = path.stat()
+                self.written[path] = (st.st_size, st.st_mtime_ns)
+            if result.status != 'UNCHANGED':
+                updated += 1
+                print(f"{result.status} {result.rel} ({', '.join(result.applied)})")
+            if not self.dry_run and result.status in ('UPDATED', 'UNCHANGED'):
+                self.manifest.record(path, transforms, result.status == 'UPDATED', result.digest)
+        if not self.dry_run:
+            self.manifest.save()
+        snapshot_id = session.close()
+        elapsed = (time.perf_counter() - started) * 1000
+        line = f"[{time.strftime('%H:%M:%S')}] {len(paths)} file(s) checked, {updated} updated in {elapsed:.1f} ms"
+        if snapshot_id:
+            line += f"; backup snapshot {snapshot_id}"
+        print(line, flush=True)
+        return updated
+
+
+def watch(daemon: Daemon, watcher, debounce: float):
+    pending = set()
+    while True:
+        try:
+            changed = watcher.wait(debounce if pending else None)
+        except Overflow:
+            print('Event queue overflowed; rescanning the tree', flush=True)
+            pending.clear()
+            daemon.full_pass()
+            continue
+        if changed:
+            pending |= changed
+            continue
+        if pending:
+            daemon.batch(pending)
+            pending = set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stages', default=','.join(pipeline.DEFAULT_STAGES),
+                        help='comma-separated stage names, run in the given order')
+    parser.add_argument('--root', type=Path, default=ROOT, help='tree to watch (default: repository root)')
+    parser.add_argument('--dry-run', action='store_true', help='report what would change without writing')
+    parser.add_argument('--poll', action='store_true', help='poll file stats instead of using inotify')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL,
+                        help=f'seconds between polls (default: {DEFAULT_INTERVAL:g})')
+    parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE,
+                        help=f'quiet period in seconds before a batch runs (default: {DEFAULT_DEBOUNCE:g})')
+    parser.add_argument('--no-initial', action='store_true', help='skip the start-up pass over the whole tree')
+    parser.add_argument('--manifest', type=Path, default=None,
+                        help='manifest location (default: <root>/.tools-manifest.json)')
+    args = parser.parse_args(argv)
+
+    names = [n.strip() for n in args.stages.split(',') if n.strip()]
+    unknown = [n for n in names if n not in pipeline.STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)} (see pipeline.py --list)")
+
+    root = args.root.resolve()
+    daemon = Daemon(root, names, Manifest(root, args.manifest), args.dry_run)
+    if not args.no_initial:
+        daemon.full_pass()
+    watcher = make_watcher(root, args.poll, args.interval)
+    kind = 'polling' if isinstance(watcher, PollingWatcher) else 'inotify'
+    print(f"\nWatching {root} ({kind}; stages: {', '.join(names)}); Ctrl-C to stop", flush=True)
+    try:
+        watch(daemon, watcher, args.debounce)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())